@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -20,6 +21,139 @@ class GlobalConfig(BaseConfig):
     # Additional global settings can be added here
     DATABASE_URL: Optional[str] = None
     DB_FORCE_ROLL_BACK: bool = False
+    # Apply pending migrations in the app lifespan instead of running them by hand
+    DB_MIGRATE_ON_STARTUP: bool = False
+
+    # Connection pool (asyncpg); size it against the number of server workers
+    DB_POOL_MIN_SIZE: int = 10
+    DB_POOL_MAX_SIZE: int = 10
+    # Seconds to wait for a free connection; None waits forever
+    DB_POOL_ACQUIRE_TIMEOUT: Optional[float] = None
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Close idle connections after this many seconds, recycle after N queries
+    DB_CONNECTION_MAX_IDLE_TIME: float = 300.0
+    DB_CONNECTION_MAX_QUERIES: int = 50000
+
+    # Read replicas, e.g. DATABASE_REPLICA_URLS='["postgresql://replica1/blog"]'.
+    # Post, comment and user reads go to them; a client that wrote reads from
+    # the primary for REPLICA_STICKY_SECONDS, so it sees its own writes. That
+    # is tracked in the redis CACHE_BACKEND when there is one, else only per
+    # worker. A replica failing REPLICA_MAX_FAILURES reads in a row is left
+    # out for REPLICA_EJECT_SECONDS
+    DATABASE_REPLICA_URLS: list[str] = []
+    REPLICA_STICKY_SECONDS: float = 5.0
+    REPLICA_MAX_FAILURES: int = 3
+    REPLICA_EJECT_SECONDS: float = 30.0
+
+    # Group commit for single-comment and single-post creates: inserts arriving
+    # within WRITE_BATCH_WINDOW seconds, up to WRITE_BATCH_MAX_ROWS, share one
+    # multi-row INSERT and one transaction. Each waits up to the window longer
+    WRITE_BATCH_COMMENTS: bool = False
+    WRITE_BATCH_POSTS: bool = False
+    WRITE_BATCH_WINDOW: float = 0.01
+    WRITE_BATCH_MAX_ROWS: int = 100
+
+    # Pagination
+    DEFAULT_PAGE_SIZE: int = 50
+    MAX_PAGE_SIZE: int = 500
+    # Largest list accepted by the bulk create endpoints
+    MAX_BULK_SIZE: int = 1000
+    # Serialize DB rows straight to JSON with orjson instead of via response_model
+    FAST_SERIALIZATION: bool = True
+
+    # Authenticated-user cache used by get_current_user
+    USER_CACHE_SIZE: int = 1024
+    USER_CACHE_TTL: float = 60.0
+    # Build the current user from the signed token claims without a DB lookup
+    TRUST_TOKEN_CLAIMS: bool = False
+
+    # Lifetime of access tokens, and of the refresh tokens that renew them
+    # without a password (and so without bcrypt). Each refresh rotates the
+    # refresh token; a rotated token presented again revokes its whole family
+    ACCESS_TOKEN_EXPIRE_MINUTES: float = 15.0
+    REFRESH_TOKEN_EXPIRE_DAYS: float = 30.0
+
+    # Read-through cache for post and comment reads ("memory" or "redis").
+    # Post rows, which ETags are built from, are cached in memory only with a
+    # single worker (SERVER_WORKERS), since a per-worker cache would miss other
+    # workers' invalidations; redis caches them for any number of workers
+    CACHE_ENABLED: bool = True
+    CACHE_BACKEND: str = "memory"
+    CACHE_TTL: float = 30.0
+    CACHE_MAX_ENTRIES: int = 10000
+    CACHE_REDIS_URL: Optional[str] = None
+
+    # Logging. LOG_LEVEL defaults to DEBUG in dev and INFO elsewhere; the rich
+    # console is used in dev only unless LOG_RICH_CONSOLE says otherwise
+    LOG_LEVEL: Optional[str] = None
+    LOG_FILE: str = "storeapi.log"
+    LOG_RICH_CONSOLE: Optional[bool] = None
+    # Hand records to a background thread through a bounded queue; when it is
+    # full, "drop" discards records and "block" waits
+    LOG_QUEUE_ENABLED: bool = True
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_QUEUE_OVERFLOW: str = "drop"
+
+    # Request/DB metrics served at /metrics. Requests issuing more queries than
+    # METRICS_QUERY_LOG_THRESHOLD are logged as a warning with their correlation id
+    METRICS_ENABLED: bool = True
+    METRICS_QUERY_LOG_THRESHOLD: int = 20
+
+    # Per-request cProfile dumps, for staging only. A request is profiled when
+    # it sends PROFILING_HEADER: 1 or is picked at PROFILING_SAMPLE_RATE; the
+    # profile is written to PROFILING_DIR/<correlation id>.prof
+    PROFILING_ENABLED: bool = False
+    PROFILING_HEADER: str = "X-Profile"
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_DIR: str = "profiles"
+
+    # Production server started by `python -m storeapi.serve`. Workers default
+    # to the CPU count and each opens its own DB pool, so the database sees up
+    # to SERVER_WORKERS * DB_POOL_MAX_SIZE connections. "auto" picks uvloop and
+    # httptools when they are installed
+    SERVER_HOST: str = "127.0.0.1"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: Optional[int] = None
+    SERVER_LOOP: str = "auto"
+    SERVER_HTTP: str = "auto"
+    SERVER_KEEP_ALIVE: int = 5
+    SERVER_BACKLOG: int = 2048
+    # Seconds to let in-flight requests finish on shutdown; None waits forever
+    SERVER_GRACEFUL_SHUTDOWN: Optional[float] = 30.0
+
+    # Worker pool for bcrypt hashing and verification ("thread" or "process")
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+
+    # Token buckets for the login and register endpoints, one per client IP and
+    # one per username: RATE_LIMIT_BURST requests at once, refilled at
+    # RATE_LIMIT_RATE per second. "memory" is per process; "redis" is shared
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_RATE: float = 1.0
+    RATE_LIMIT_BURST: int = 10
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_REDIS_URL: Optional[str] = None
+    # Proxies in front of the app that append the address they saw to
+    # X-Forwarded-For; the client IP is the entry the outermost one added.
+    # 0 ignores the header, which the client can set to anything
+    RATE_LIMIT_TRUSTED_PROXIES: int = 0
+
+    # Push feed (GET /feed/events, /feed/ws): events a client may fall behind
+    # before it is disconnected, and the keep-alive interval of idle streams.
+    # "memory" reaches the clients of this worker only; "redis" shares events
+    # between workers through pub/sub
+    FEED_BACKEND: str = "memory"
+    FEED_REDIS_URL: Optional[str] = None
+    FEED_BUFFER_SIZE: int = 100
+    FEED_HEARTBEAT: float = 15.0
+
+    # Load shedding: answer 503 with Retry-After instead of queueing once this
+    # many password hashes, or this many DB connection acquires, are waiting.
+    # None queues without bound
+    SHED_HASH_QUEUE_DEPTH: Optional[int] = 64
+    SHED_DB_WAITERS: Optional[int] = 100
+    SHED_RETRY_AFTER: int = 1
 
 
 class DevConfig(GlobalConfig):
@@ -33,6 +167,7 @@ class TestConfig(GlobalConfig):
 
     DATABASE_URL: str = "sqlite+aiosqlite:///./test.db"
     DB_FORCE_ROLL_BACK: bool = True
+    DB_MIGRATE_ON_STARTUP: bool = True
 
     model_config = SettingsConfigDict(env_prefix="TEST_", env_file_encoding="utf-8")
 
@@ -49,6 +184,13 @@ def get_config(env) -> BaseConfig:
         return GlobalConfig()
 
 
-print("Loading configuration...")
-print(f"Environment State: {BaseConfig().ENV_STATE}")
-config = get_config(BaseConfig().ENV_STATE)
+@lru_cache
+def load_config() -> GlobalConfig:
+    """
+    Build the configuration for the current ENV_STATE, once per process.
+    Reads the environment and .env only; nothing is printed or connected.
+    """
+    return get_config(BaseConfig().ENV_STATE)
+
+
+config = load_config()
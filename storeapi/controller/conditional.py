@@ -0,0 +1,59 @@
+from datetime import UTC, datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+
+def make_etag(*parts) -> str:
+    """
+    Build a weak ETag from the version and anything else that shapes the body.
+    """
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def _strip_weak(tag: str) -> str:
+    return tag.strip().removeprefix("W/")
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: Optional[datetime]
+) -> bool:
+    """
+    Evaluate If-None-Match, or If-Modified-Since when no If-None-Match is sent.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [_strip_weak(tag) for tag in if_none_match.split(",")]
+        return "*" in tags or _strip_weak(etag) in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=UTC)
+        return last_modified.replace(tzinfo=UTC, microsecond=0) <= since
+
+    return False
+
+
+def set_validators(
+    response: Response, etag: str, last_modified: Optional[datetime]
+) -> None:
+    response.headers["ETag"] = etag
+    if last_modified:
+        response.headers["Last-Modified"] = format_datetime(
+            last_modified.replace(tzinfo=UTC), usegmt=True
+        )
+
+
+def not_modified(response: Response) -> Response:
+    """
+    A 304 carrying the validators already set on `response`.
+    """
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED, headers=dict(response.headers)
+    )
@@ -1,10 +1,84 @@
 import logging
-
-from fastapi import APIRouter, Depends, HTTPException, Path, status
-from fastapi.responses import JSONResponse
-
-from storeapi.db.database import comment_table, database, post_table
-from storeapi.models.models import CommentIn, CommentOut, PostIn, PostOut
+from collections import Counter
+from typing import Awaitable, Callable, Optional
+
+import sqlalchemy
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Path,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import ORJSONResponse, StreamingResponse
+
+from storeapi.config import config
+from storeapi.controller.conditional import (
+    is_not_modified,
+    make_etag,
+    not_modified,
+    set_validators,
+)
+from storeapi.controller.pagination import (
+    decode_cursor,
+    decode_rank_cursor,
+    encode_cursor,
+    encode_rank_cursor,
+    page_limit,
+)
+from storeapi.controller.serialization import dump_row, respond
+from storeapi.db.batching import build_insert_batcher
+from storeapi.db.cache import (
+    comments_key,
+    page_key,
+    post_key,
+    read_cache,
+)
+from storeapi.db.database import (
+    comment_table,
+    database,
+    post_table,
+    row_to_dict,
+    rows_to_dicts,
+)
+from storeapi.db.replicas import replicas
+from storeapi.db.search import (
+    MAX_SEARCH_TERMS,
+    index_comments,
+    reindex_posts,
+    search_query,
+    search_terms,
+    unindex_comment,
+    unindex_post,
+)
+from storeapi.db.statements import (
+    comments_by_post,
+    post_by_id,
+    post_columns,
+    post_with_comments,
+    post_with_comments_page,
+    posts_page,
+    user_posts_page,
+)
+from storeapi.db.versions import (
+    bump_post,
+    fetch_page_version,
+    utcnow,
+)
+from storeapi.events import POSTS_TOPIC, broker, post_topic
+from storeapi.models.models import (
+    BulkCreated,
+    CommentIn,
+    CommentOut,
+    PostIn,
+    PostOut,
+    PostPage,
+    PostSummary,
+    PostWithComments,
+)
 from storeapi.security.security import get_current_user
 
 logger = logging.getLogger(__name__)
@@ -15,7 +89,7 @@ router = APIRouter()
 @router.post("/", response_model=PostOut)
 async def create_post(post: PostIn, current_user=Depends(get_current_user)):
     # Simulate creating a post and returning it with an ID
-    logger.info(f"Creating post for user: {current_user}")
+    logger.info("Creating post for user: %s", current_user["id"])
     new_post = {**post.model_dump(), "user_id": current_user["id"]}
 
     # In a real application, you would save this to a database
@@ -24,28 +98,219 @@ async def create_post(post: PostIn, current_user=Depends(get_current_user)):
     # new_post = {"id": post_id, **new_post}
     # posts[post_id] = new_post
 
-    query = post_table.insert().values(
-        title=new_post["title"],
-        content=new_post["content"],
-        user_id=new_post["user_id"],
+    row = {
+        "title": new_post["title"],
+        "content": new_post["content"],
+        "user_id": new_post["user_id"],
+        "updated_at": utcnow(),
+    }
+
+    if post_batcher is not None:
+        post_id = await post_batcher.insert(row)
+        # The batch was written from another task, so record this client's write
+        replicas.mark_write()
+    else:
+        async with database.transaction():
+            post_id = await database.execute(post_table.insert().values(**row))
+            await reindex_posts([post_id])
+    new_post["id"] = post_id
+    await broker.publish((POSTS_TOPIC,), "post.created", new_post)
+
+    return ORJSONResponse(content=new_post, status_code=status.HTTP_201_CREATED)
+
+
+def check_batch_size(items: list) -> None:
+    if not items:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Batch is empty"
+        )
+    if len(items) > config.MAX_BULK_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds the maximum of {config.MAX_BULK_SIZE} items",
+        )
+
+
+async def insert_many(
+    table,
+    rows: list[dict],
+    bumps: list,
+    index: Callable[[list[int]], Awaitable[None]],
+) -> list[int]:
+    """
+    Insert all rows in a single transaction, so they share one commit.
+    :param bumps: Version bump statements to run in the same transaction.
+    :param index: Adds the inserted rows to the search index, in the same
+        transaction.
+    :return: The new ids, in the order of `rows`. Each row is inserted with
+        its own RETURNING, as neither SQLite nor PostgreSQL promises that a
+        multi-row INSERT returns its ids in VALUES order.
+    """
+    ids = []
+    async with database.transaction():
+        for row in rows:
+            query = table.insert().values(**row).returning(table.c.id)
+            ids.append(await database.fetch_val(query))
+        for bump in bumps:
+            await database.execute(bump)
+        await index(ids)
+    return ids
+
+
+async def write_posts(rows: list[dict]) -> list[int]:
+    """
+    Write a batch of single-post creates; ids come back in row order.
+    """
+    return await insert_many(post_table, rows, [], reindex_posts)
+
+
+post_batcher = build_insert_batcher(config, write_posts, config.WRITE_BATCH_POSTS)
+
+
+@router.post("/bulk", response_model=BulkCreated, status_code=status.HTTP_201_CREATED)
+async def create_posts_bulk(
+    posts: list[PostIn], current_user=Depends(get_current_user)
+):
+    check_batch_size(posts)
+    logger.info("Creating %s posts for user: %s", len(posts), current_user["id"])
+
+    now = utcnow()
+    ids = await insert_many(
+        post_table,
+        [
+            {**post.model_dump(), "user_id": current_user["id"], "updated_at": now}
+            for post in posts
+        ],
+        [],
+        reindex_posts,
     )
+    await broker.publish(
+        (POSTS_TOPIC,), "posts.created", {"ids": ids, "user_id": current_user["id"]}
+    )
+    return {"ids": ids}
+
+
+async def stream_posts(after_id: Optional[int]):
+    """
+    Yield every post after `after_id` as newline-delimited JSON, one row at a time.
+    """
+    query = sqlalchemy.select(*post_columns).order_by(post_table.c.id)
+    if after_id is not None:
+        query = query.where(post_table.c.id > after_id)
+
+    async for row in database.iterate(query):
+        if config.FAST_SERIALIZATION:
+            yield dump_row(row) + b"\n"
+        else:
+            yield PostSummary.model_validate(row).model_dump_json() + "\n"
+
+
+async def fetch_posts_page(
+    limit: int, after_id: Optional[int], user_id: Optional[int] = None
+) -> dict:
+    # Fetch one extra row so we know whether another page exists
+    values = {"after_id": after_id or 0, "limit": limit + 1}
+    if user_id is None:
+        results = await replicas.fetch_all(posts_page, values)
+    else:
+        results = await replicas.fetch_all(
+            user_posts_page, {**values, "user_id": user_id}
+        )
 
-    post_id = await database.execute(query)
-    new_post["id"] = post_id
+    items = rows_to_dicts(results[:limit])
+    next_cursor = encode_cursor(items[-1]["id"]) if len(results) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
 
-    return JSONResponse(content=new_post, status_code=status.HTTP_201_CREATED)
 
+@router.get("/", response_model=PostPage)
+async def list_posts(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    after: Optional[str] = None,
+    stream: bool = False,
+):
+    after_id = decode_cursor(after) if after else None
 
-@router.get("/", response_model=list[PostOut])
-async def list_posts():
-    query = post_table.select()
-    results = await database.fetch_all(query)
-    return list(results)
+    if stream:
+        return StreamingResponse(
+            stream_posts(after_id), media_type="application/x-ndjson"
+        )
+
+    limit = page_limit(limit, config.DEFAULT_PAGE_SIZE, config.MAX_PAGE_SIZE)
+
+    # Read the version before the rows, so a concurrent write can only make
+    # the ETag older than the body, never newer. Listings send no
+    # Last-Modified: deleting a post can leave a page of only older rows.
+    version = await fetch_page_version(limit, after_id)
+    set_validators(response, make_etag("posts", version, limit, after_id), None)
+    if is_not_modified(request, response.headers["ETag"], None):
+        return not_modified(response)
+
+    page = await read_cache.get_or_load(
+        page_key(version, limit, after_id),
+        lambda: fetch_posts_page(limit, after_id),
+    )
+    return respond(page, response=response)
+
+
+async def fetch_search_page(
+    terms: list[str], limit: int, after: Optional[tuple[float, int]]
+) -> dict:
+    results = await database.fetch_all(search_query(terms, post_columns, limit, after))
+
+    items = rows_to_dicts(results[:limit])
+    next_cursor = (
+        encode_rank_cursor(items[-1]["rank"], items[-1]["id"])
+        if len(results) > limit
+        else None
+    )
+    for item in items:
+        del item["rank"]
+    return {"items": items, "next_cursor": next_cursor}
+
+
+# Declared before the /{post_id} routes, which would otherwise match "search"
+@router.get("/search", response_model=PostPage)
+async def search_posts(
+    q: str = Query(..., min_length=1),
+    limit: Optional[int] = Query(None, ge=1),
+    after: Optional[str] = None,
+):
+    """
+    Posts whose title, content or comments contain every word of `q`, best
+    match first.
+    """
+    after_key = decode_rank_cursor(after) if after else None
+    limit = page_limit(limit, config.DEFAULT_PAGE_SIZE, config.MAX_PAGE_SIZE)
+
+    terms = search_terms(q)
+    if len(terms) > MAX_SEARCH_TERMS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Search query has more than {MAX_SEARCH_TERMS} distinct words",
+        )
+    if not terms:
+        return respond({"items": [], "next_cursor": None})
+    return respond(await fetch_search_page(terms, limit, after_key))
+
+
+async def load_post(post_id: int) -> Optional[dict]:
+    row = await replicas.fetch_one(post_by_id, {"post_id": post_id})
+    return row_to_dict(row) if row else None
+
+
+async def cached_post(post_id: int) -> Optional[dict]:
+    """
+    The full post row, including its version, through the read cache.
+    """
+    return await read_cache.get_or_load(
+        post_key(post_id), lambda: load_post(post_id), versioned=True
+    )
 
 
 async def find_post(post_id: int = Path(...)):
-    query = post_table.select().where(post_table.c.id == post_id)
-    result = await database.fetch_one(query)
+    result = await cached_post(post_id)
     if not result:
         raise HTTPException(status_code=404, detail="Post not found")
 
@@ -64,7 +329,13 @@ async def delete_post(
         )
 
     query = post_table.delete().where(post_table.c.id == post_id)
-    await database.execute(query)
+    async with database.transaction():
+        await database.execute(query)
+        await unindex_post(post_id)
+    await read_cache.invalidate(post_key(post_id))
+    await broker.publish(
+        (POSTS_TOPIC, post_topic(post_id)), "post.deleted", {"id": post_id}
+    )
     return {"message": "Post deleted successfully"}
 
 
@@ -86,12 +357,16 @@ async def update_post(
             status_code=403, detail="You do not have permission to update this post"
         )
 
-    query = (
-        post_table.update()
-        .where(post_table.c.id == post_id)
-        .values(title=updated_post["title"], content=updated_post["content"])
+    query = bump_post(post_id).values(
+        title=updated_post["title"], content=updated_post["content"]
+    )
+    async with database.transaction():
+        await database.execute(query)
+        await reindex_posts([post_id])
+    await read_cache.invalidate(post_key(post_id))
+    await broker.publish(
+        (POSTS_TOPIC, post_topic(post_id)), "post.updated", updated_post
     )
-    await database.execute(query)
     return updated_post
 
 
@@ -123,56 +398,227 @@ async def add_comment(
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
-    logger.info(f"Adding comment to post {post_id} by user {current_user['id']}")
+    logger.info("Adding comment to post %s by user %s", post_id, current_user["id"])
 
     comment = {**comment.model_dump(), "user_id": current_user["id"]}
-    query = comment_table.insert().values(
-        post_id=post_id, content=comment["content"], user_id=comment["user_id"]
-    )
-    comment_id = await database.execute(query)
+    row = {
+        "post_id": post_id,
+        "content": comment["content"],
+        "user_id": comment["user_id"],
+    }
+
+    if comment_batcher is not None:
+        comment_id = await comment_batcher.insert(row)
+        # The batch was written from another task, so record this client's write
+        replicas.mark_write()
+    else:
+        async with database.transaction():
+            comment_id = await database.execute(comment_table.insert().values(**row))
+            await database.execute(bump_post(post_id, comments=1))
+            await index_comments([comment_id])
+    await read_cache.invalidate(post_key(post_id))
 
     comment = {"id": comment_id, **comment}
+    await broker.publish((post_topic(post_id),), "comment.created", comment)
+
+    return ORJSONResponse(content=comment, status_code=status.HTTP_201_CREATED)
+
+
+async def write_comments(rows: list[dict]) -> list[int]:
+    """
+    Write a batch of single-comment creates, which may be on different posts;
+    ids come back in row order.
+    """
+    counts = Counter(row["post_id"] for row in rows)
+    return await insert_many(
+        comment_table,
+        rows,
+        [bump_post(post_id, comments=n) for post_id, n in counts.items()],
+        index_comments,
+    )
+
+
+comment_batcher = build_insert_batcher(
+    config, write_comments, config.WRITE_BATCH_COMMENTS
+)
+
+
+@router.post(
+    "/{post_id}/comments/bulk",
+    response_model=BulkCreated,
+    status_code=status.HTTP_201_CREATED,
+)
+async def add_comments_bulk(
+    post_id: int,
+    comments: list[CommentIn],
+    post=Depends(find_post),
+    current_user=Depends(get_current_user),
+):
+    check_batch_size(comments)
+    logger.info(
+        "Adding %s comments to post %s by user %s",
+        len(comments),
+        post_id,
+        current_user["id"],
+    )
+
+    ids = await insert_many(
+        comment_table,
+        [
+            {
+                "post_id": post_id,
+                "content": comment.content,
+                "user_id": current_user["id"],
+            }
+            for comment in comments
+        ],
+        [bump_post(post_id, comments=len(comments))],
+        index_comments,
+    )
+    await read_cache.invalidate(post_key(post_id))
+    await broker.publish(
+        (post_topic(post_id),),
+        "comments.created",
+        {"post_id": post_id, "ids": ids, "user_id": current_user["id"]},
+    )
+    return {"ids": ids}
+
 
-    return JSONResponse(content=comment, status_code=status.HTTP_201_CREATED)
+async def load_comments(post_id: int) -> list[dict]:
+    return rows_to_dicts(
+        await replicas.fetch_all(comments_by_post, {"post_id": post_id})
+    )
 
 
 @router.get("/{post_id}/comments/", response_model=list[CommentOut])
-async def list_comments(post_id: int):
-    query = comment_table.select().where(comment_table.c.post_id == post_id)
-    results = await database.fetch_all(query)
+async def list_comments(post_id: int, request: Request, response: Response):
+    version = await cached_post(post_id)
+    if not version:
+        raise HTTPException(status_code=404, detail="Post/Comment not found")
+
+    set_validators(
+        response,
+        make_etag("comments", post_id, version["version"]),
+        version["updated_at"],
+    )
+    if is_not_modified(request, response.headers["ETag"], version["updated_at"]):
+        return not_modified(response)
+
+    # Keyed on the post version, so a write retires the cached list without
+    # an invalidation that other workers would miss
+    results = await read_cache.get_or_load(
+        comments_key(post_id, version["version"]), lambda: load_comments(post_id)
+    )
     if not results:
         raise HTTPException(status_code=404, detail="Post/Comment not found")
 
     # Return all comments for the specified post
-    return list(results)
+    return respond(results, response=response)
 
 
 @router.delete("/{post_id}/comments/{comment_id}", response_model=dict)
-async def delete_comment(
-    post_id: int,
-    comment_id: int,
-    posts=Depends(list_posts),
-    post_comments=Depends(list_comments),
-):
-    if not any(post["id"] == post_id for post in posts):
-        raise HTTPException(status_code=404, detail="Post not found")
-
-    if not any(comment["id"] == comment_id for comment in post_comments):
+async def delete_comment(post_id: int, comment_id: int):
+    # Delete by primary key and post in one statement; only fall back to a
+    # post lookup when nothing matched, to pick the right 404 message
+    query = (
+        comment_table.delete()
+        .where(
+            (comment_table.c.post_id == post_id) & (comment_table.c.id == comment_id)
+        )
+        .returning(comment_table.c.id)
+    )
+    async with database.transaction():
+        deleted = await database.fetch_one(query)
+        if deleted:
+            await database.execute(bump_post(post_id, comments=-1))
+            await unindex_comment(comment_id)
+    await read_cache.invalidate(post_key(post_id))
+
+    if not deleted:
+        await find_post(post_id)
         raise HTTPException(status_code=404, detail="Comment not found")
 
-    query = comment_table.delete().where(
-        (comment_table.c.post_id == post_id) & (comment_table.c.id == comment_id)
+    await broker.publish(
+        (post_topic(post_id),),
+        "comment.deleted",
+        {"id": comment_id, "post_id": post_id},
     )
-    await database.execute(query)
-
     return {"message": "Comment deleted successfully"}
 
 
-@router.get("/{post_id}")
-async def get_post_with_comments(post_id: int, post=Depends(find_post)):
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
+async def fetch_post_with_comments(
+    post_id: int, limit: Optional[int] = None, after_id: Optional[int] = None
+):
+    """
+    Fetch a post and its comments in one round-trip with a LEFT JOIN.
+    A post without comments comes back as a single row with NULL comment columns.
+    """
+    values = {"post_id": post_id, "after_id": after_id or 0}
+    if limit is None:
+        return await replicas.fetch_all(post_with_comments, values)
+    return await replicas.fetch_all(
+        post_with_comments_page, {**values, "limit": limit + 1}
+    )
 
-    post_comments = await list_comments(post_id)
 
-    return {"post": post, "comments": post_comments}
+@router.get("/{post_id}", response_model=PostWithComments)
+async def get_post_with_comments(
+    post_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    after: Optional[str] = None,
+):
+    after_id = decode_cursor(after) if after else None
+    if limit is not None or after_id is not None:
+        limit = page_limit(limit, config.DEFAULT_PAGE_SIZE, config.MAX_PAGE_SIZE)
+
+    # Only conditional requests pay for a separate version lookup; otherwise
+    # the version comes back with the post row
+    if "if-none-match" in request.headers or "if-modified-since" in request.headers:
+        version = await cached_post(post_id)
+        if version:
+            etag = make_etag("post", post_id, version["version"], limit, after_id)
+            if is_not_modified(request, etag, version["updated_at"]):
+                set_validators(response, etag, version["updated_at"])
+                return not_modified(response)
+
+    rows = await fetch_post_with_comments(post_id, limit, after_id)
+    if not rows:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    post = rows[0]
+    set_validators(
+        response,
+        make_etag("post", post_id, post["version"], limit, after_id),
+        post["updated_at"],
+    )
+    comments = [
+        {
+            "id": row["comment_id"],
+            "post_id": post_id,
+            "user_id": row["comment_user_id"],
+            "content": row["comment_content"],
+        }
+        for row in rows
+        if row["comment_id"] is not None
+    ]
+
+    next_cursor = None
+    if limit is not None and len(comments) > limit:
+        comments = comments[:limit]
+        next_cursor = encode_cursor(comments[-1]["id"])
+
+    return respond(
+        {
+            "post": {
+                "id": post["id"],
+                "title": post["title"],
+                "content": post["content"],
+                "user_id": post["user_id"],
+            },
+            "comments": comments,
+            "next_cursor": next_cursor,
+        },
+        response=response,
+    )
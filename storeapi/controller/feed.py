@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+
+from storeapi.config import config
+from storeapi.events import (
+    POSTS_TOPIC,
+    SlowConsumer,
+    Subscription,
+    broker,
+    post_topic,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def feed_topics(post_ids: Optional[list[int]]) -> set[str]:
+    """
+    The topics of the given posts, or the post-level topic when none are given.
+    """
+    if not post_ids:
+        return {POSTS_TOPIC}
+    return {post_topic(post_id) for post_id in post_ids}
+
+
+async def sse_events(subscription: Subscription) -> AsyncIterator[bytes]:
+    """
+    Server-sent events for a subscription, with a comment line every
+    FEED_HEARTBEAT seconds of silence to keep proxies from closing the stream.
+    """
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    subscription.get(), config.FEED_HEARTBEAT
+                )
+            except asyncio.TimeoutError:
+                yield b": heartbeat\n\n"
+                continue
+            yield b"event: " + event.type.encode() + b"\ndata: " + event.dumps() + b"\n\n"
+    except SlowConsumer:
+        yield b"event: overflow\ndata: {}\n\n"
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@router.get("/events")
+async def feed_events(post_id: Optional[list[int]] = Query(None)):
+    """
+    Stream new, updated and deleted posts as server-sent events, or with
+    `post_id`, everything that happens to those posts and their comments.
+    """
+    subscription = broker.subscribe(feed_topics(post_id))
+    return StreamingResponse(
+        sse_events(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def feed_websocket(
+    websocket: WebSocket, post_id: Optional[list[int]] = Query(None)
+):
+    """
+    The same events as `GET /feed/events`, as JSON WebSocket messages.
+    """
+    await websocket.accept()
+    subscription = broker.subscribe(feed_topics(post_id))
+    # Clients only listen; reading anyway is how their disconnect shows up
+    receiver = asyncio.create_task(websocket.receive())
+    try:
+        await websocket.send_json(
+            {"type": "subscribed", "data": {"topics": sorted(subscription.topics)}}
+        )
+        while True:
+            getter = asyncio.create_task(subscription.get())
+            done, _ = await asyncio.wait(
+                {getter, receiver}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if receiver in done:
+                if receiver.result()["type"] == "websocket.disconnect":
+                    getter.cancel()
+                    return
+                receiver = asyncio.create_task(websocket.receive())
+            if getter in done:
+                await websocket.send_text(getter.result().dumps().decode())
+            else:
+                getter.cancel()
+    except SlowConsumer:
+        logger.info("Dropping slow feed consumer")
+        await websocket.close(
+            code=status.WS_1013_TRY_AGAIN_LATER, reason="Too far behind"
+        )
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        broker.unsubscribe(subscription)
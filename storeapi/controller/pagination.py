@@ -0,0 +1,68 @@
+import base64
+import binascii
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+
+def _encode(value: str) -> str:
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> str:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return base64.urlsafe_b64decode(padded.encode()).decode()
+
+
+def invalid_cursor() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+    )
+
+
+def encode_cursor(last_id: int) -> str:
+    """
+    Encode the id of the last row on a page into an opaque cursor.
+    :param last_id: The primary key of the last row returned.
+    :return: A URL-safe cursor string.
+    """
+    return _encode(str(last_id))
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Decode a cursor produced by `encode_cursor` back into a row id.
+    :param cursor: The opaque cursor received from the client.
+    :return: The id to continue after.
+    """
+    try:
+        return int(_decode(cursor))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise invalid_cursor()
+
+
+def encode_rank_cursor(rank: float, last_id: int) -> str:
+    """
+    Encode the sort key of the last row on a ranked page (search results).
+    :param rank: The rank of the last row; repr keeps the float exact.
+    :param last_id: Its primary key, which breaks ties between equal ranks.
+    """
+    return _encode(f"{rank!r}:{last_id}")
+
+
+def decode_rank_cursor(cursor: str) -> tuple[float, int]:
+    """
+    Decode a cursor produced by `encode_rank_cursor` into (rank, id).
+    """
+    try:
+        rank, last_id = _decode(cursor).split(":")
+        return float(rank), int(last_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise invalid_cursor()
+
+
+def page_limit(limit: Optional[int], default: int, maximum: int) -> int:
+    """
+    Resolve the requested page size against the configured default and cap.
+    """
+    return min(limit or default, maximum)
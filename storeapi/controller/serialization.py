@@ -0,0 +1,31 @@
+from typing import Any, Optional
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+
+from storeapi.config import config
+from storeapi.db.database import row_to_dict
+
+
+def dump_row(row) -> bytes:
+    """
+    Serialize a single database record to JSON bytes.
+    """
+    return orjson.dumps(row_to_dict(row))
+
+
+def respond(
+    content: Any, status_code: int = 200, response: Optional[Response] = None
+) -> Any:
+    """
+    Return `content` as pre-rendered JSON when FAST_SERIALIZATION is on.
+    A Response returned from a route bypasses the response_model, so the rows
+    are not re-validated through Pydantic. With the mode off, `content` is
+    returned as-is and FastAPI validates it against the response_model.
+    :param response: The route's injected Response, whose headers are kept.
+    """
+    if config.FAST_SERIALIZATION:
+        headers = dict(response.headers) if response is not None else None
+        return ORJSONResponse(content, status_code=status_code, headers=headers)
+    return content
@@ -1,15 +1,35 @@
 import logging
+from typing import Optional
 
-from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse
 
+from storeapi.config import config
+from storeapi.controller.conditional import (
+    is_not_modified,
+    make_etag,
+    not_modified,
+    set_validators,
+)
+from storeapi.controller.controller import fetch_posts_page
+from storeapi.controller.pagination import decode_cursor, page_limit
+from storeapi.controller.serialization import respond
+from storeapi.db.cache import read_cache, user_page_key
 from storeapi.db.database import database, user_table
-from storeapi.models.models import User
+from storeapi.db.replicas import replicas
+from storeapi.db.statements import user_exists
+from storeapi.db.versions import fetch_page_version
+from storeapi.models.models import PostPage, RefreshTokenIn, User
+from storeapi.security.rate_limit import auth_limiter, client_ip
 from storeapi.security.security import (
     authenticate_user,
     create_access_token,
+    create_refresh_token,
     get_user,
     hash_password,
+    revoke_refresh_token,
+    rotate_refresh_token,
+    user_cache,
 )
 
 logger = logging.getLogger(__name__)
@@ -18,18 +38,21 @@ router = APIRouter()
 
 
 @router.post("/register")
-async def register_user(user: User):
+async def register_user(user: User, request: Request):
+    await auth_limiter.check(f"ip:{client_ip(request)}", f"user:{user.username}")
+
     # Simulate user registration
     new_user = user.model_dump()
 
-    existing_user = await get_user(new_user["username"])
+    # From the primary: a lagging replica would miss a user registered just now
+    existing_user = await get_user(new_user["username"], primary=True)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Username already exists"
         )
 
     # In a real application, you would save this to a database
-    logger.info(f"Registering user: {new_user['username']}")
+    logger.info("Registering user: %s", new_user["username"])
     query = user_table.insert().values(
         username=new_user["username"],
         email=new_user["email"],
@@ -38,36 +61,103 @@ async def register_user(user: User):
         ),  # Note: Password should be hashed in production
     )
 
-    logger.debug(f"Executing query: {query}")
+    logger.debug("Executing query: %s", query)
 
     await database.execute(query)
+    user_cache.invalidate(new_user["username"])
 
-    return JSONResponse(
+    return ORJSONResponse(
         content="User Created Successfully", status_code=status.HTTP_201_CREATED
     )
 
 
-@router.get("/login")
-async def login(username: str, password: str):
-    user = await authenticate_user(username, password)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-    # In a real application, you would generate a JWT token here
-    return JSONResponse(
+async def token_response(user: dict, refresh_token: str) -> ORJSONResponse:
+    return ORJSONResponse(
         content={
             "access_token": await create_access_token(
                 {
                     "id": user["id"],
                     "sub": user["username"],
                     "email": user["email"],
-                },
-                expires_delta=15,  # Token valid for 1 hour
+                }
             ),
+            "refresh_token": refresh_token,
             "token_type": "bearer",
+            "expires_in": int(config.ACCESS_TOKEN_EXPIRE_MINUTES * 60),
         }
     )
+
+
+@router.get("/login")
+async def login(username: str, password: str, request: Request):
+    await auth_limiter.check(f"ip:{client_ip(request)}", f"user:{username}")
+
+    user = await authenticate_user(username, password)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return await token_response(user, await create_refresh_token(user["id"]))
+
+
+@router.post("/token/refresh")
+async def refresh_token(body: RefreshTokenIn):
+    """
+    Exchange a refresh token for a new access token and a new refresh token.
+    No password is checked, so this costs no bcrypt work.
+    """
+    rotated = await rotate_refresh_token(body.refresh_token)
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return await token_response(*rotated)
+
+
+@router.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_token(body: RefreshTokenIn):
+    """
+    Log out: revoke the refresh token and every token rotated from its login.
+    """
+    await revoke_refresh_token(body.refresh_token)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/{user_id}/posts", response_model=PostPage)
+async def list_user_posts(
+    user_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    after: Optional[str] = None,
+):
+    """
+    A user's posts in id order, paginated like `GET /posts/`.
+    """
+    after_id = decode_cursor(after) if after else None
+    limit = page_limit(limit, config.DEFAULT_PAGE_SIZE, config.MAX_PAGE_SIZE)
+
+    version = await fetch_page_version(limit, after_id, user_id=user_id)
+    set_validators(
+        response, make_etag("user_posts", user_id, version, limit, after_id), None
+    )
+    if is_not_modified(request, response.headers["ETag"], None):
+        return not_modified(response)
+
+    page = await read_cache.get_or_load(
+        user_page_key(version, user_id, limit, after_id),
+        lambda: fetch_posts_page(limit, after_id, user_id=user_id),
+    )
+
+    # Only an empty first page needs to tell "no posts" from "no such user"
+    if not page["items"] and after_id is None:
+        if await replicas.fetch_val(user_exists, {"user_id": user_id}) is None:
+            raise HTTPException(status_code=404, detail="User not found")
+
+    return respond(page, response=response)
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from storeapi.config import GlobalConfig
+
+logger = logging.getLogger(__name__)
+
+# Writes a batch of rows in one transaction and returns their ids, in row order
+BatchWriter = Callable[[list[dict]], Awaitable[list[int]]]
+
+
+class InsertBatcher:
+    """
+    Group commit for single-row inserts. Rows arriving within `window`
+    seconds of the first pending one, or until `max_rows` are pending, are
+    written together by one `write` call, so concurrent inserts share one
+    round-trip and one commit. Each caller gets the id of its own row.
+
+    A batch that fails is retried row by row, so a bad row fails only its
+    own caller. One batch is written at a time; rows arriving meanwhile
+    form the next one, so batches grow with the load.
+    """
+
+    def __init__(self, write: BatchWriter, window: float, max_rows: int):
+        self.write = write
+        self.window = window
+        self.max_rows = max_rows
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+        self._lock = asyncio.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.retried_batches = 0
+        self.failed_rows = 0
+        self.largest_batch = 0
+
+    async def insert(self, row: dict) -> int:
+        """
+        Queue a row for the next batch.
+        :return: The id of the inserted row, once its batch has committed.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_rows:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        # A caller that goes away still has its row written, like any insert
+        # whose client disconnects mid-transaction
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._pending:
+            batch = self._pending[: self.max_rows]
+            del self._pending[: self.max_rows]
+            task = asyncio.create_task(self._write(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        async with self._lock:
+            rows = [row for row, _ in batch]
+            try:
+                ids = await self.write(rows)
+            except Exception:
+                logger.warning(
+                    "Batch of %s rows failed; writing them one by one",
+                    len(rows),
+                    exc_info=True,
+                )
+                self.retried_batches += 1
+                await self._write_each(batch)
+                return
+
+            self.batches += 1
+            self.rows += len(rows)
+            self.largest_batch = max(self.largest_batch, len(rows))
+            for (_, future), row_id in zip(batch, ids):
+                if not future.done():
+                    future.set_result(row_id)
+
+    async def _write_each(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        for row, future in batch:
+            try:
+                [row_id] = await self.write([row])
+            except Exception as exc:
+                self.failed_rows += 1
+                if not future.done():
+                    future.set_exception(exc)
+            else:
+                self.batches += 1
+                self.rows += 1
+                if not future.done():
+                    future.set_result(row_id)
+
+    async def close(self) -> None:
+        """
+        Write the pending rows now and wait for every batch in flight.
+        """
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "rows": self.rows,
+            "largest_batch": self.largest_batch,
+            "retried_batches": self.retried_batches,
+            "failed_rows": self.failed_rows,
+        }
+
+
+def build_insert_batcher(
+    config: GlobalConfig, write: BatchWriter, enabled: bool
+) -> Optional[InsertBatcher]:
+    """
+    A batcher for `write` with the configured window, or None when disabled.
+    """
+    if not enabled:
+        return None
+    return InsertBatcher(write, config.WRITE_BATCH_WINDOW, config.WRITE_BATCH_MAX_ROWS)
@@ -0,0 +1,328 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Optional
+
+import orjson
+
+from storeapi.config import GlobalConfig, config
+from storeapi.db.replicas import replicas
+
+# Cache keys. Listing pages are keyed on the page version, so a write retires
+# only the pages showing the posts it changed.
+
+
+def post_key(post_id: int) -> str:
+    return f"post:{post_id}"
+
+
+def comments_key(post_id: int, version: int) -> str:
+    return f"comments:{post_id}:{version}"
+
+
+def page_key(version: str, limit: int, after_id: Optional[int]) -> str:
+    return f"posts:{version}:{limit}:{after_id}"
+
+
+def user_page_key(
+    version: str, user_id: int, limit: int, after_id: Optional[int]
+) -> str:
+    return f"posts:{version}:user:{user_id}:{limit}:{after_id}"
+
+
+def generation_key(key: str) -> str:
+    return f"generation:{key}"
+
+
+def settling_key(key: str) -> str:
+    return f"settling:{key}"
+
+
+# orjson has no datetime type of its own, so datetimes are tagged on the way
+# in and revived on the way out
+_DATETIME_TAG = "$datetime"
+
+
+def _encode_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {_DATETIME_TAG: value.isoformat()}
+    raise TypeError(f"Cannot cache a {type(value).__name__}")
+
+
+def _revive(value: Any) -> Any:
+    if isinstance(value, dict):
+        if len(value) == 1 and _DATETIME_TAG in value:
+            return datetime.fromisoformat(value[_DATETIME_TAG])
+        return {key: _revive(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_revive(item) for item in value]
+    return value
+
+
+def encode(value: Any) -> bytes:
+    return orjson.dumps(
+        value, default=_encode_default, option=orjson.OPT_PASSTHROUGH_DATETIME
+    )
+
+
+def decode(data: bytes) -> Any:
+    """
+    The inverse of `encode`. Cached data is only ever parsed as JSON, so a
+    shared cache server cannot feed the application anything but plain values.
+    """
+    value = orjson.loads(data)
+    if _DATETIME_TAG.encode() in data:
+        return _revive(value)
+    return value
+
+
+class CacheBackend(ABC):
+    """
+    Byte-oriented key/value store with per-key TTL. The method set mirrors
+    Redis GET/SET PX/DEL/INCR so a Redis-compatible server can stand in.
+    """
+
+    # Whether every worker process sees the same entries
+    shared = False
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float) -> None: ...
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None: ...
+
+    @abstractmethod
+    async def incr(self, key: str) -> int: ...
+
+    @abstractmethod
+    async def clear(self) -> None: ...
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryCache(CacheBackend):
+    """
+    In-process LRU with TTL, bounded by entry count. `incr` counters are kept
+    apart from the LRU, so evicting one cannot reset it.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._counters: dict[str, int] = {}
+        self.evictions = 0
+        self.memory_bytes = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        counter = self._counters.get(key)
+        if counter is not None:
+            return str(counter).encode()
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self.memory_bytes += len(key) + len(value)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._remove(key)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def clear(self) -> None:
+        self._entries.clear()
+        self._counters.clear()
+        self.memory_bytes = 0
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.memory_bytes -= len(key) + len(entry[1])
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+            "memory_bytes": self.memory_bytes,
+        }
+
+
+class RedisCache(CacheBackend):
+    """
+    Backend for a Redis-compatible server, given a `redis.asyncio` style client.
+    Keys are namespaced so `clear` only touches this application's entries.
+    """
+
+    shared = True
+
+    def __init__(self, client, prefix: str = "storeapi:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.client.set(self.prefix + key, value, px=int(ttl * 1000))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(self.prefix + key)
+
+    async def clear(self) -> None:
+        async for key in self.client.scan_iter(match=self.prefix + "*"):
+            await self.client.delete(key)
+
+
+class ReadThroughCache:
+    """
+    Serves reads from a `CacheBackend`, loading from the database on a miss.
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        ttl: float,
+        enabled: bool = True,
+        bypass: Optional[Callable[[], Awaitable[bool]]] = None,
+        replica_lag: float = 0.0,
+        single_worker: bool = False,
+    ):
+        """
+        :param bypass: When it returns True, reads skip the cache and refresh
+            it from the loader, e.g. for a client that must see its own writes.
+        :param replica_lag: Seconds a replica may take to catch up with a write.
+            For that long after a versioned key is invalidated, only loads that
+            `bypass` the cache (and so read the primary) may refill it.
+        :param single_worker: The app runs in one process, so even a per-process
+            backend sees every invalidation and may hold versioned values.
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.bypass = bypass
+        self.replica_lag = replica_lag
+        self.caches_versioned = backend.shared or single_worker
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        versioned: bool = False,
+    ) -> Any:
+        """
+        Return the cached value for `key`, or await `loader` and cache its result.
+        None results are not cached.
+        :param versioned: The value carries a version that ETags are built from,
+            and writes `invalidate` it. It is only cached where every worker
+            sees the invalidation: in a shared backend, or in a single worker.
+            A copy loaded before an invalidation is never served after it.
+        """
+        if not self.enabled or (versioned and not self.caches_versioned):
+            return await loader()
+
+        generation = await self._generation(key) if versioned else None
+        bypassed = self.bypass is not None and await self.bypass()
+        if bypassed:
+            self.bypassed += 1
+        else:
+            data = await self.backend.get(key)
+            if data is not None:
+                filled_at, value = decode(data)
+                if filled_at == generation:
+                    self.hits += 1
+                    return value
+            self.misses += 1
+
+        value = await loader()
+        if value is None:
+            return value
+        # A replica may not have the write behind a recent invalidation yet
+        if versioned and self.replica_lag and not bypassed:
+            if await self.backend.get(settling_key(key)) is not None:
+                return value
+        await self.backend.set(key, encode([generation, value]), self.ttl)
+        return value
+
+    async def _generation(self, key: str) -> int:
+        return int(await self.backend.get(generation_key(key)) or 0)
+
+    async def invalidate(self, *keys: str) -> None:
+        """
+        Drop `keys`. Bumping their generation first also retires any copy a
+        concurrent reader loaded before the write and stores after this.
+        """
+        if not self.enabled:
+            return
+        if self.caches_versioned:
+            for key in keys:
+                if self.replica_lag:
+                    await self.backend.set(settling_key(key), b"1", self.replica_lag)
+                await self.backend.incr(generation_key(key))
+        await self.backend.delete(*keys)
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            **self.backend.stats(),
+        }
+
+
+def build_read_cache(config: GlobalConfig) -> ReadThroughCache:
+    if config.CACHE_BACKEND == "redis":
+        # Optional dependency, only needed when a shared cache is configured
+        import redis.asyncio
+
+        backend = RedisCache(redis.asyncio.from_url(config.CACHE_REDIS_URL))
+    elif config.CACHE_BACKEND == "memory":
+        backend = MemoryCache(config.CACHE_MAX_ENTRIES)
+    else:
+        raise ValueError(f"Unknown cache backend: {config.CACHE_BACKEND}")
+
+    return ReadThroughCache(
+        backend,
+        config.CACHE_TTL,
+        enabled=config.CACHE_ENABLED,
+        # A client that just wrote reads the primary, and nobody refills an
+        # invalidated entry from a replica that may not have the write yet
+        bypass=replicas.sticky,
+        replica_lag=config.REPLICA_STICKY_SECONDS if replicas.replicas else 0.0,
+        # `python -m storeapi.serve` tells its workers how many there are
+        single_worker=(config.SERVER_WORKERS or 1) == 1,
+    )
+
+
+read_cache = build_read_cache(config)
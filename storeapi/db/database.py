@@ -1,8 +1,11 @@
+from typing import Optional
+
 import databases
 import sqlalchemy
-from sqlalchemy import MetaData, create_engine
+from sqlalchemy import MetaData
 
-from storeapi.config import config
+from storeapi.config import GlobalConfig, config
+from storeapi.db.pool import PoolMonitor
 
 metadata = MetaData()
 
@@ -13,7 +16,17 @@ post_table = sqlalchemy.Table(
     sqlalchemy.Column("title", sqlalchemy.String, nullable=False),
     sqlalchemy.Column("content", sqlalchemy.String, nullable=False),
     sqlalchemy.Column("user_id", sqlalchemy.Integer, nullable=False),
+    # Bumped on every change to the post or its comments; drives the ETag
+    sqlalchemy.Column(
+        "version", sqlalchemy.Integer, nullable=False, server_default="1"
+    ),
+    sqlalchemy.Column("updated_at", sqlalchemy.DateTime),
+    # Maintained by the comment endpoints, in the same transaction as the write
+    sqlalchemy.Column(
+        "comment_count", sqlalchemy.Integer, nullable=False, server_default="0"
+    ),
     sqlalchemy.ForeignKeyConstraint(["user_id"], ["users.id"]),
+    sqlalchemy.Index("ix_posts_user_id_id", "user_id", "id"),
 )
 
 comment_table = sqlalchemy.Table(
@@ -25,6 +38,7 @@ comment_table = sqlalchemy.Table(
     sqlalchemy.Column("content", sqlalchemy.String, nullable=False),
     sqlalchemy.ForeignKeyConstraint(["post_id"], ["posts.id"]),
     sqlalchemy.ForeignKeyConstraint(["user_id"], ["users.id"]),
+    sqlalchemy.Index("ix_comments_post_id_id", "post_id", "id"),
 )
 
 user_table = sqlalchemy.Table(
@@ -36,12 +50,72 @@ user_table = sqlalchemy.Table(
     sqlalchemy.Column("hashed_password", sqlalchemy.String, nullable=False),
 )
 
-# Create a database engine using the database URL from the configuration
-print("Creating database engine with URL:", config.DATABASE_URL)
-engine = create_engine(config.DATABASE_URL)
+# Only a SHA-256 of each refresh token is stored. Every rotation issues a new
+# token in the same family, so a replayed token can revoke the whole chain.
+refresh_token_table = sqlalchemy.Table(
+    "refresh_tokens",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True, autoincrement=True),
+    sqlalchemy.Column("user_id", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("family_id", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("token_hash", sqlalchemy.String, unique=True, nullable=False),
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column("expires_at", sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column("revoked_at", sqlalchemy.DateTime),
+    sqlalchemy.ForeignKeyConstraint(["user_id"], ["users.id"]),
+    sqlalchemy.Index("ix_refresh_tokens_family_id", "family_id"),
+)
+
+
+def row_to_dict(row) -> dict:
+    """
+    Copy a database record into a plain dict with plain string keys.
+    Record keys can be SQLAlchemy name objects, which orjson does not serialize
+    with its default options. Precompiled statements already return dicts.
+    """
+    if isinstance(row, dict):
+        return row
+    mapping = row._mapping
+    return dict(zip(map(str, mapping.keys()), mapping))
 
-metadata.create_all(engine)
-# Create a database instance using the engine
+
+def rows_to_dicts(rows) -> list[dict]:
+    """
+    `row_to_dict` for a whole result set, resolving the column names once.
+    """
+    if not rows:
+        return []
+    if isinstance(rows[0], dict):
+        return list(rows)
+    keys = [str(key) for key in rows[0]._mapping.keys()]
+    return [dict(zip(keys, row._mapping)) for row in rows]
+
+
+def pool_options(config: GlobalConfig, url: Optional[str] = None) -> dict:
+    """
+    asyncpg pool settings passed through `databases` to `asyncpg.create_pool`.
+    The SQLite backend opens a connection per acquire and takes none of them.
+    :param url: The database the pool is for; defaults to DATABASE_URL.
+    """
+    if not str(url or config.DATABASE_URL).startswith("postgres"):
+        return {}
+
+    return {
+        "min_size": config.DB_POOL_MIN_SIZE,
+        "max_size": config.DB_POOL_MAX_SIZE,
+        "statement_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+        "max_inactive_connection_lifetime": config.DB_CONNECTION_MAX_IDLE_TIME,
+        "max_queries": config.DB_CONNECTION_MAX_QUERIES,
+    }
+
+
+# The schema is managed by storeapi.db.migrations, not created at import
 database = databases.Database(
-    config.DATABASE_URL, force_rollback=config.DB_FORCE_ROLL_BACK
+    config.DATABASE_URL,
+    force_rollback=config.DB_FORCE_ROLL_BACK,
+    **pool_options(config),
+)
+
+pool_monitor = PoolMonitor(
+    acquire_timeout=config.DB_POOL_ACQUIRE_TIMEOUT, max_waiters=config.SHED_DB_WAITERS
 )
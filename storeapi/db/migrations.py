@@ -0,0 +1,296 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, NamedTuple
+
+import databases
+import sqlalchemy
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+logger = logging.getLogger(__name__)
+
+schema_version_table = sqlalchemy.Table(
+    "schema_version",
+    sqlalchemy.MetaData(),
+    sqlalchemy.Column("version", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("description", sqlalchemy.String, nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[databases.Database], Awaitable[None]]
+
+
+# Migrations build their tables from these frozen definitions rather than the
+# live ones in storeapi.db.database, so replaying them on an empty database
+# gives the schema each version actually shipped with.
+_v1 = sqlalchemy.MetaData()
+
+_v1_users = sqlalchemy.Table(
+    "users",
+    _v1,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True, autoincrement=True),
+    sqlalchemy.Column("username", sqlalchemy.String, unique=True, nullable=False),
+    sqlalchemy.Column("email", sqlalchemy.String, unique=True, nullable=False),
+    sqlalchemy.Column("hashed_password", sqlalchemy.String, nullable=False),
+)
+
+_v1_posts = sqlalchemy.Table(
+    "posts",
+    _v1,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True, autoincrement=True),
+    sqlalchemy.Column("title", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("content", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("user_id", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.ForeignKeyConstraint(["user_id"], ["users.id"]),
+)
+
+_v1_comments = sqlalchemy.Table(
+    "comments",
+    _v1,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True, autoincrement=True),
+    sqlalchemy.Column("post_id", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("user_id", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("content", sqlalchemy.String, nullable=False),
+    sqlalchemy.ForeignKeyConstraint(["post_id"], ["posts.id"]),
+    sqlalchemy.ForeignKeyConstraint(["user_id"], ["users.id"]),
+)
+
+_v3_versions = sqlalchemy.Table(
+    "resource_versions",
+    _v1,
+    sqlalchemy.Column("name", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("version", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("updated_at", sqlalchemy.DateTime),
+)
+
+_v6_refresh_tokens = sqlalchemy.Table(
+    "refresh_tokens",
+    _v1,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True, autoincrement=True),
+    sqlalchemy.Column("user_id", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("family_id", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("token_hash", sqlalchemy.String, unique=True, nullable=False),
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column("expires_at", sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column("revoked_at", sqlalchemy.DateTime),
+    sqlalchemy.ForeignKeyConstraint(["user_id"], ["users.id"]),
+)
+
+
+async def create_tables(database: databases.Database) -> None:
+    # if_not_exists keeps this safe on databases built by the old create_all
+    for table in (_v1_users, _v1_posts, _v1_comments):
+        await database.execute(CreateTable(table, if_not_exists=True))
+
+
+async def create_indexes(database: databases.Database) -> None:
+    for index in (
+        sqlalchemy.Index("ix_posts_user_id", _v1_posts.c.user_id),
+        sqlalchemy.Index(
+            "ix_comments_post_id_id", _v1_comments.c.post_id, _v1_comments.c.id
+        ),
+    ):
+        await database.execute(CreateIndex(index, if_not_exists=True))
+
+
+async def add_post_versions(database: databases.Database) -> None:
+    await database.execute(
+        "ALTER TABLE posts ADD COLUMN version INTEGER NOT NULL DEFAULT 1"
+    )
+    await database.execute("ALTER TABLE posts ADD COLUMN updated_at TIMESTAMP")
+    await database.execute(CreateTable(_v3_versions, if_not_exists=True))
+    await database.execute(_v3_versions.insert().values(name="posts", version=1))
+
+
+async def create_search_index(database: databases.Database) -> None:
+    # Backfilled in SQL of its own, like the frozen tables above, so later
+    # changes to storeapi.db.search do not change what this migration does
+    if database.url.dialect.startswith("postgres"):
+        await database.execute(
+            "CREATE TABLE post_search ("
+            " post_id INTEGER PRIMARY KEY REFERENCES posts (id) ON DELETE CASCADE,"
+            " document TSVECTOR NOT NULL)"
+        )
+        await database.execute(
+            "CREATE INDEX ix_post_search_document ON post_search USING GIN (document)"
+        )
+        await database.execute(
+            "INSERT INTO post_search (post_id, document) "
+            "SELECT p.id,"
+            " setweight(to_tsvector('english', p.title), 'A') ||"
+            " setweight(to_tsvector('english', p.content), 'B') ||"
+            " setweight(to_tsvector('english', coalesce((SELECT string_agg("
+            "c.content, ' ') FROM comments c WHERE c.post_id = p.id), '')), 'C') "
+            "FROM posts p"
+        )
+        return
+
+    await database.execute(
+        "CREATE VIRTUAL TABLE post_search USING fts5("
+        "title, content, comments, tokenize = 'porter unicode61')"
+    )
+    await database.execute(
+        "INSERT INTO post_search (rowid, title, content, comments) "
+        "SELECT p.id, p.title, p.content, coalesce((SELECT group_concat("
+        "c.content, ' ') FROM comments c WHERE c.post_id = p.id), '') "
+        "FROM posts p"
+    )
+
+
+async def add_comment_counts(database: databases.Database) -> None:
+    await database.execute(
+        "ALTER TABLE posts ADD COLUMN comment_count INTEGER NOT NULL DEFAULT 0"
+    )
+    await database.execute(
+        "UPDATE posts SET comment_count ="
+        " (SELECT count(*) FROM comments WHERE comments.post_id = posts.id)"
+    )
+    # Covers per-user listings ordered by id, which user_id alone does not
+    # on Postgres; it also serves every lookup the old index did
+    await database.execute(
+        CreateIndex(
+            sqlalchemy.Index(
+                "ix_posts_user_id_id", _v1_posts.c.user_id, _v1_posts.c.id
+            ),
+            if_not_exists=True,
+        )
+    )
+    await database.execute("DROP INDEX IF EXISTS ix_posts_user_id")
+
+
+async def create_refresh_tokens(database: databases.Database) -> None:
+    await database.execute(CreateTable(_v6_refresh_tokens, if_not_exists=True))
+    await database.execute(
+        CreateIndex(
+            sqlalchemy.Index(
+                "ix_refresh_tokens_family_id", _v6_refresh_tokens.c.family_id
+            ),
+            if_not_exists=True,
+        )
+    )
+
+
+async def drop_collection_versions(database: databases.Database) -> None:
+    # Listings are versioned per page now; bumping this one row on every
+    # write serialized all writers on its lock
+    await database.execute("DROP TABLE IF EXISTS resource_versions")
+
+
+async def split_comment_search(database: databases.Database) -> None:
+    # Comments get search rows of their own, so writing one no longer
+    # rebuilds a document holding every comment on its post
+    if database.url.dialect.startswith("postgres"):
+        await database.execute(
+            "UPDATE post_search SET document ="
+            " setweight(to_tsvector('english', p.title), 'A') ||"
+            " setweight(to_tsvector('english', p.content), 'B') "
+            "FROM posts p WHERE p.id = post_search.post_id"
+        )
+        await database.execute(
+            "CREATE TABLE comment_search ("
+            " comment_id INTEGER PRIMARY KEY REFERENCES comments (id)"
+            " ON DELETE CASCADE,"
+            " post_id INTEGER NOT NULL,"
+            " document TSVECTOR NOT NULL)"
+        )
+        await database.execute(
+            "CREATE INDEX ix_comment_search_document"
+            " ON comment_search USING GIN (document)"
+        )
+        await database.execute(
+            "CREATE INDEX ix_comment_search_post_id ON comment_search (post_id)"
+        )
+        await database.execute(
+            "INSERT INTO comment_search (comment_id, post_id, document) "
+            "SELECT c.id, c.post_id,"
+            " setweight(to_tsvector('english', c.content), 'C') "
+            "FROM comments c"
+        )
+        return
+
+    # An FTS5 table cannot drop a column, so rebuild it without the comments
+    await database.execute("DROP TABLE post_search")
+    await database.execute(
+        "CREATE VIRTUAL TABLE post_search USING fts5("
+        "title, content, tokenize = 'porter unicode61')"
+    )
+    await database.execute(
+        "INSERT INTO post_search (rowid, title, content) "
+        "SELECT p.id, p.title, p.content FROM posts p"
+    )
+    await database.execute(
+        "CREATE VIRTUAL TABLE comment_search USING fts5("
+        "content, post_id UNINDEXED, tokenize = 'porter unicode61')"
+    )
+    await database.execute(
+        "INSERT INTO comment_search (rowid, content, post_id) "
+        "SELECT c.id, c.content, c.post_id FROM comments c"
+    )
+
+
+# Append new migrations here; never edit or reorder ones that have shipped
+MIGRATIONS = [
+    Migration(1, "Create users, posts and comments tables", create_tables),
+    Migration(2, "Index posts.user_id and comments (post_id, id)", create_indexes),
+    Migration(3, "Track post and collection versions for ETags", add_post_versions),
+    Migration(4, "Full-text search index over posts and comments", create_search_index),
+    Migration(
+        5, "Count comments per post; index posts (user_id, id)", add_comment_counts
+    ),
+    Migration(6, "Store hashed refresh tokens", create_refresh_tokens),
+    Migration(
+        7,
+        "Drop the collection version; listings are versioned per page",
+        drop_collection_versions,
+    ),
+    Migration(8, "Index comments for search apart from posts", split_comment_search),
+]
+
+
+async def current_version(database: databases.Database) -> int:
+    await database.execute(CreateTable(schema_version_table, if_not_exists=True))
+    version = await database.fetch_val(
+        sqlalchemy.select(sqlalchemy.func.max(schema_version_table.c.version))
+    )
+    return version or 0
+
+
+async def run_migrations(database: databases.Database) -> int:
+    """
+    Apply every migration newer than the database's recorded schema version.
+    :param database: A connected database.
+    :return: The schema version after migrating.
+    """
+    version = await current_version(database)
+
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+
+        logger.info(
+            "Applying migration %s: %s", migration.version, migration.description
+        )
+        async with database.transaction():
+            await migration.apply(database)
+            await database.execute(
+                schema_version_table.insert().values(
+                    version=migration.version, description=migration.description
+                )
+            )
+        version = migration.version
+
+    return version
+
+
+async def main() -> None:
+    from storeapi.db.database import database
+
+    async with database:
+        version = await run_migrations(database)
+    print(f"Database schema is at version {version}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from typing import Optional
+
+import databases
+
+from storeapi.overload import Overloaded
+
+
+class PoolMonitor:
+    """
+    Instruments a `databases.Database` connection pool: in-use/idle counts,
+    acquire wait time, and an optional acquire timeout.
+    """
+
+    def __init__(
+        self, acquire_timeout: Optional[float] = None, max_waiters: Optional[int] = None
+    ):
+        """
+        :param acquire_timeout: Seconds to wait for a free connection before
+            raising `asyncio.TimeoutError`; None waits forever.
+        :param max_waiters: Acquires allowed to wait at once before further ones
+            raise `Overloaded` instead of joining the queue; None is unbounded.
+        """
+        self.acquire_timeout = acquire_timeout
+        self.max_waiters = max_waiters
+        self._backend = None
+        self.in_use = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.acquires = 0
+        self.acquire_timeouts = 0
+        self.acquire_wait_total = 0.0
+        self.acquire_wait_max = 0.0
+
+    def install(self, database: databases.Database) -> None:
+        """
+        Wrap acquire/release on every connection `database` hands out. The pool
+        itself is left alone: asyncpg's `Pool` declares `__slots__`, so its
+        methods cannot be replaced. Call before `database.connect()` so the
+        connection held by `force_rollback` is counted too.
+        """
+        backend = database._backend
+        if backend is self._backend:
+            return
+
+        connection = backend.connection
+
+        def monitored_connection():
+            return self._instrument(connection())
+
+        backend.connection = monitored_connection
+        self._backend = backend
+        self.in_use = 0
+
+    def _instrument(self, connection):
+        """
+        Time and count `connection`'s acquires from the backend pool.
+        """
+        acquire, release = connection.acquire, connection.release
+
+        async def timed_acquire():
+            if self.max_waiters is not None and self.waiting >= self.max_waiters:
+                self.rejected += 1
+                raise Overloaded("database pool")
+
+            start = time.perf_counter()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(acquire(), self.acquire_timeout)
+            except asyncio.TimeoutError:
+                self.acquire_timeouts += 1
+                raise
+            finally:
+                self.waiting -= 1
+            wait = time.perf_counter() - start
+            self.acquires += 1
+            self.acquire_wait_total += wait
+            self.acquire_wait_max = max(self.acquire_wait_max, wait)
+            self.in_use += 1
+
+        async def counted_release():
+            self.in_use -= 1
+            await release()
+
+        connection.acquire = timed_acquire
+        connection.release = counted_release
+        return connection
+
+    def stats(self) -> dict:
+        size = idle = max_size = None
+        # Both the asyncpg and aiosqlite backends keep their pool on `_pool`;
+        # asyncpg pools report their own size, aiosqlite opens one per acquire
+        pool = getattr(self._backend, "_pool", None)
+        if hasattr(pool, "get_size"):
+            size = pool.get_size()
+            idle = pool.get_idle_size()
+            max_size = pool.get_max_size()
+
+        return {
+            "size": size,
+            "max_size": max_size,
+            "in_use": self.in_use,
+            "idle": idle,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "acquires": self.acquires,
+            "acquire_timeouts": self.acquire_timeouts,
+            "acquire_wait_avg_ms": (
+                self.acquire_wait_total / self.acquires * 1000 if self.acquires else 0.0
+            ),
+            "acquire_wait_max_ms": self.acquire_wait_max * 1000,
+        }
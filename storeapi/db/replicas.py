@@ -0,0 +1,345 @@
+import functools
+import hashlib
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+import databases
+
+from storeapi.config import config
+from storeapi.db.database import database, pool_options
+from storeapi.db.statements import Statement
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = ("fetch_all", "fetch_one", "fetch_val")
+WRITE_METHODS = ("execute", "execute_many")
+
+
+def _call(database: databases.Database, operation: str, query, *args, **kwargs):
+    # Precompiled statements take the database instead of being passed to it
+    if isinstance(query, Statement):
+        return getattr(query, operation)(database, *args, **kwargs)
+    return getattr(database, operation)(query, *args, **kwargs)
+
+
+class Replica:
+    """
+    A read replica and its health. Consecutive failed reads eject it for a
+    while; afterwards it is tried again, and one more failure ejects it again.
+    """
+
+    def __init__(self, index: int, database: databases.Database):
+        self.index = index
+        self.database = database
+        self.reads = 0
+        self.failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+
+    def available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+    def failed(self, now: float, max_failures: int, eject_seconds: float) -> None:
+        self.failures += 1
+        if self.failures >= max_failures:
+            self.ejected_until = now + eject_seconds
+            self.ejections += 1
+            # On its return a single failure is enough to eject it again
+            self.failures = max_failures - 1
+            logger.warning(
+                "Ejecting read replica %s for %ss", self.index, eject_seconds
+            )
+
+    def stats(self, now: float) -> dict:
+        return {
+            "healthy": self.available(now),
+            "reads": self.reads,
+            "failures": self.failures,
+            "ejections": self.ejections,
+        }
+
+
+class _Routing:
+    """
+    Routing state of one request: who is asking, the replica it reads from,
+    whether it wrote, and whether the shared store said it wrote recently.
+    """
+
+    def __init__(self, session: Optional[str]):
+        self.session = session
+        self.replica: Optional[Replica] = None
+        self.wrote = False
+        self.shared_sticky: Optional[bool] = None
+
+
+_routing: ContextVar[Optional[_Routing]] = ContextVar("replica_routing", default=None)
+
+
+class ReplicaSet:
+    """
+    Sends reads to read replicas and everything else to the primary.
+
+    A session (one client) that wrote through the primary keeps reading from
+    the primary for `sticky_seconds`, long enough for the replicas to catch up,
+    so it always sees its own writes. All reads of one request use the same
+    replica, so they see one consistent snapshot.
+
+    Recent writes are remembered per process. With `share_writes` they are also
+    kept in a shared cache backend, so a client whose next request lands on
+    another worker still reads from the primary.
+    """
+
+    def __init__(
+        self,
+        primary: databases.Database,
+        replicas: list[databases.Database],
+        sticky_seconds: float = 5.0,
+        max_failures: int = 3,
+        eject_seconds: float = 30.0,
+        max_sessions: int = 100000,
+    ):
+        self.primary = primary
+        self.replicas = [Replica(i, replica) for i, replica in enumerate(replicas)]
+        self.sticky_seconds = sticky_seconds
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.max_sessions = max_sessions
+        self._writes: OrderedDict[str, float] = OrderedDict()
+        self.shared = None
+        self._next = itertools.count()
+        self.primary_reads = 0
+        self.sticky_reads = 0
+        self._track_writes(primary)
+
+    def _track_writes(self, primary: databases.Database) -> None:
+        for operation in WRITE_METHODS:
+            method = getattr(primary, operation)
+
+            @functools.wraps(method)
+            async def write(*args, _method=method, **kwargs):
+                self.mark_write()
+                return await _method(*args, **kwargs)
+
+            setattr(primary, operation, write)
+
+        transaction = primary.transaction
+
+        @functools.wraps(transaction)
+        def tracked_transaction(*args, **kwargs):
+            self.mark_write()
+            return transaction(*args, **kwargs)
+
+        primary.transaction = tracked_transaction
+
+    def share_writes(self, backend) -> None:
+        """
+        Record which sessions wrote in `backend`, a shared CacheBackend, as
+        well as in this process.
+        """
+        self.shared = backend
+
+    @contextmanager
+    def routing(self, session: Optional[str]):
+        """
+        Route the reads inside the block for `session`, e.g. one request.
+        """
+        routing = _Routing(session)
+        token = _routing.set(routing)
+        try:
+            yield routing
+        finally:
+            _routing.reset(token)
+
+    @staticmethod
+    def _written_key(session: str) -> str:
+        # Hashed, as sessions are keyed by bearer token
+        return (
+            "written:" + hashlib.blake2b(session.encode(), digest_size=16).hexdigest()
+        )
+
+    def mark_write(self) -> None:
+        routing = _routing.get()
+        if not self.replicas or routing is None or routing.session is None:
+            return
+
+        routing.wrote = True
+        self._writes.pop(routing.session, None)
+        self._writes[routing.session] = time.monotonic()
+        while len(self._writes) > self.max_sessions:
+            self._writes.popitem(last=False)
+
+    async def publish_write(self, routing: _Routing) -> None:
+        """
+        Tell the other workers that the session of `routing` wrote, if it did.
+        Called before the response goes out, so the client's next request
+        finds it wherever it lands.
+        """
+        if self.shared is None or not routing.wrote or routing.session is None:
+            return
+        try:
+            await self.shared.set(
+                self._written_key(routing.session), b"1", self.sticky_seconds
+            )
+        except Exception:
+            logger.warning("Could not share a write for stickiness", exc_info=True)
+
+    async def sticky(self) -> bool:
+        """
+        Whether the current session wrote recently enough that replicas may
+        not have its write yet.
+        """
+        routing = _routing.get()
+        if not self.replicas or routing is None or routing.session is None:
+            return False
+
+        written = self._writes.get(routing.session)
+        if written is not None and time.monotonic() - written < self.sticky_seconds:
+            return True
+        if self.shared is None:
+            return False
+
+        # Asked once per request; a write later in it is caught above
+        if routing.shared_sticky is None:
+            try:
+                data = await self.shared.get(self._written_key(routing.session))
+            except Exception:
+                logger.warning("Could not check shared writes", exc_info=True)
+                # Reading the primary is always correct, just slower
+                data = b"1"
+            routing.shared_sticky = data is not None
+        return routing.shared_sticky
+
+    def _choose(self, now: float) -> Optional[Replica]:
+        routing = _routing.get()
+        if routing is not None and routing.replica is not None:
+            if routing.replica.available(now):
+                return routing.replica
+
+        available = [replica for replica in self.replicas if replica.available(now)]
+        if not available:
+            return None
+
+        replica = available[next(self._next) % len(available)]
+        if routing is not None:
+            routing.replica = replica
+        return replica
+
+    async def _read(self, operation: str, *args, **kwargs):
+        if not self.replicas:
+            return await _call(self.primary, operation, *args, **kwargs)
+
+        if await self.sticky():
+            self.sticky_reads += 1
+            return await _call(self.primary, operation, *args, **kwargs)
+
+        now = time.monotonic()
+        replica = self._choose(now)
+        if replica is not None:
+            try:
+                if not replica.database.is_connected:
+                    await replica.database.connect()
+                result = await _call(replica.database, operation, *args, **kwargs)
+            except Exception:
+                logger.warning(
+                    "Read from replica %s failed; using the primary",
+                    replica.index,
+                    exc_info=True,
+                )
+                replica.failed(now, self.max_failures, self.eject_seconds)
+                routing = _routing.get()
+                if routing is not None:
+                    routing.replica = None
+            else:
+                replica.reads += 1
+                replica.failures = 0
+                return result
+
+        self.primary_reads += 1
+        return await _call(self.primary, operation, *args, **kwargs)
+
+    async def fetch_all(self, query, values: Optional[dict] = None):
+        return await self._read("fetch_all", query, values)
+
+    async def fetch_one(self, query, values: Optional[dict] = None):
+        return await self._read("fetch_one", query, values)
+
+    async def fetch_val(self, query, values: Optional[dict] = None, column=0):
+        return await self._read("fetch_val", query, values, column=column)
+
+    async def connect(self) -> None:
+        """
+        Connect every replica. One that cannot connect starts out ejected
+        instead of failing startup; reads retry it once it is due back.
+        """
+        now = time.monotonic()
+        for replica in self.replicas:
+            try:
+                await replica.database.connect()
+            except Exception:
+                logger.exception("Could not connect read replica %s", replica.index)
+                replica.failed(now, 1, self.eject_seconds)
+
+    async def disconnect(self) -> None:
+        for replica in self.replicas:
+            if replica.database.is_connected:
+                await replica.database.disconnect()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "primary_reads": self.primary_reads,
+            "sticky_reads": self.sticky_reads,
+            "sticky_sessions": len(self._writes),
+            "replicas": [replica.stats(now) for replica in self.replicas],
+        }
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Gives every request its own routing state, keyed to the client: its bearer
+    token when it sends one, else its address. A request that wrote is shared
+    with the other workers before its response starts.
+    """
+
+    def __init__(self, app, replicas: ReplicaSet):
+        self.app = app
+        self.replicas = replicas
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        session = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                session = "auth:" + value.decode("latin-1")
+                break
+        if session is None and scope.get("client"):
+            session = "ip:" + scope["client"][0]
+
+        with self.replicas.routing(session) as routing:
+
+            async def send_after_sharing(message):
+                if message["type"] == "http.response.start":
+                    await self.replicas.publish_write(routing)
+                await send(message)
+
+            await self.app(scope, receive, send_after_sharing)
+
+
+replicas = ReplicaSet(
+    database,
+    [
+        databases.Database(url, **pool_options(config, url))
+        for url in config.DATABASE_REPLICA_URLS
+    ],
+    sticky_seconds=config.REPLICA_STICKY_SECONDS,
+    max_failures=config.REPLICA_MAX_FAILURES,
+    eject_seconds=config.REPLICA_EJECT_SECONDS,
+)
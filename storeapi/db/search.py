@@ -0,0 +1,266 @@
+import re
+from typing import Optional
+
+import sqlalchemy
+
+from storeapi.db.database import comment_table, database, post_table
+
+# Posts and comments are indexed separately, so a comment write only touches
+# its own row; a search joins them back together per post. SQLite keeps FTS5
+# tables keyed by rowid = post or comment id; Postgres tsvector columns with
+# GIN indexes (see migrations 4 and 8).
+SEARCH_TABLE = "post_search"
+COMMENT_SEARCH_TABLE = "comment_search"
+
+fts_table = sqlalchemy.table(
+    SEARCH_TABLE,
+    sqlalchemy.column("rowid", sqlalchemy.Integer),
+    sqlalchemy.column("title"),
+    sqlalchemy.column("content"),
+)
+
+comment_fts_table = sqlalchemy.table(
+    COMMENT_SEARCH_TABLE,
+    sqlalchemy.column("rowid", sqlalchemy.Integer),
+    sqlalchemy.column("content"),
+    sqlalchemy.column("post_id", sqlalchemy.Integer),
+)
+
+tsvector_table = sqlalchemy.table(
+    SEARCH_TABLE,
+    sqlalchemy.column("post_id", sqlalchemy.Integer),
+    sqlalchemy.column("document"),
+)
+
+comment_tsvector_table = sqlalchemy.table(
+    COMMENT_SEARCH_TABLE,
+    sqlalchemy.column("comment_id", sqlalchemy.Integer),
+    sqlalchemy.column("post_id", sqlalchemy.Integer),
+    sqlalchemy.column("document"),
+)
+
+# bm25 column weights for title and content, and for comment content; Postgres
+# gets the same ordering from the A/B/C weights the documents are built with
+BM25_WEIGHTS = (10.0, 5.0)
+COMMENT_BM25_WEIGHT = 1.0
+# Inlined rather than bound, so Postgres resolves the regconfig overloads
+TS_CONFIG = sqlalchemy.literal_column("'english'")
+# Each word is matched on its own, and SQLite caps a compound SELECT at 500 arms
+MAX_SEARCH_TERMS = 32
+
+_TERM = re.compile(r"\w+")
+
+
+def is_postgres() -> bool:
+    return database.url.dialect.startswith("postgres")
+
+
+def _weighted(text, weight: str):
+    return sqlalchemy.func.setweight(
+        sqlalchemy.func.to_tsvector(TS_CONFIG, text),
+        sqlalchemy.literal_column(f"'{weight}'"),
+    )
+
+
+async def reindex_posts(post_ids: list[int]) -> None:
+    """
+    Rebuild the search documents of the given posts from their current rows.
+    Run it in the same transaction as the write that changed them.
+    """
+    selected = post_table.c.id.in_(post_ids)
+
+    if is_postgres():
+        # Imported here so SQLite deployments never load the Postgres dialect
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+        documents = sqlalchemy.select(
+            post_table.c.id,
+            _weighted(post_table.c.title, "A").op("||")(
+                _weighted(post_table.c.content, "B")
+            ),
+        ).where(selected)
+        query = pg_insert(tsvector_table).from_select(
+            ["post_id", "document"], documents
+        )
+        await database.execute(
+            query.on_conflict_do_update(
+                index_elements=["post_id"],
+                set_={"document": query.excluded.document},
+            )
+        )
+        return
+
+    # FTS5 has no upsert, so replace the documents
+    await database.execute(fts_table.delete().where(fts_table.c.rowid.in_(post_ids)))
+    documents = sqlalchemy.select(
+        post_table.c.id, post_table.c.title, post_table.c.content
+    ).where(selected)
+    await database.execute(
+        fts_table.insert().from_select(["rowid", "title", "content"], documents)
+    )
+
+
+async def index_comments(comment_ids: list[int]) -> None:
+    """
+    Add new comments to the search index, in the transaction that inserted them.
+    """
+    selected = comment_table.c.id.in_(comment_ids)
+    if is_postgres():
+        documents = sqlalchemy.select(
+            comment_table.c.id,
+            comment_table.c.post_id,
+            _weighted(comment_table.c.content, "C"),
+        ).where(selected)
+        query = comment_tsvector_table.insert().from_select(
+            ["comment_id", "post_id", "document"], documents
+        )
+    else:
+        documents = sqlalchemy.select(
+            comment_table.c.id, comment_table.c.content, comment_table.c.post_id
+        ).where(selected)
+        query = comment_fts_table.insert().from_select(
+            ["rowid", "content", "post_id"], documents
+        )
+    await database.execute(query)
+
+
+async def unindex_comment(comment_id: int) -> None:
+    if is_postgres():
+        query = comment_tsvector_table.delete().where(
+            comment_tsvector_table.c.comment_id == comment_id
+        )
+    else:
+        query = comment_fts_table.delete().where(
+            comment_fts_table.c.rowid == comment_id
+        )
+    await database.execute(query)
+
+
+async def unindex_post(post_id: int) -> None:
+    """
+    Drop a post and its comments from the search index.
+    """
+    if is_postgres():
+        queries = [
+            tsvector_table.delete().where(tsvector_table.c.post_id == post_id),
+            comment_tsvector_table.delete().where(
+                comment_tsvector_table.c.post_id == post_id
+            ),
+        ]
+    else:
+        queries = [
+            fts_table.delete().where(fts_table.c.rowid == post_id),
+            comment_fts_table.delete().where(comment_fts_table.c.post_id == post_id),
+        ]
+    for query in queries:
+        await database.execute(query)
+
+
+def search_terms(q: str) -> list[str]:
+    """
+    The distinct words of a user query. Operators and punctuation are dropped,
+    so the query can never be a syntax error in either backend.
+    """
+    return list(dict.fromkeys(_TERM.findall(q)))
+
+
+def _term_matches(terms: list[str]):
+    """
+    One row per (post, term) hit in a post or one of its comments, with the
+    hit's score, lower being better.
+    """
+    selects = []
+    for i, term in enumerate(terms):
+        # The term number is an int, so inlining it is safe, and Postgres
+        # needs no type for it across the UNION
+        number = sqlalchemy.literal_column(str(i)).label("term")
+        if is_postgres():
+            tsquery = sqlalchemy.func.plainto_tsquery(TS_CONFIG, term)
+            for table in (tsvector_table, comment_tsvector_table):
+                score = -sqlalchemy.cast(
+                    sqlalchemy.func.ts_rank(table.c.document, tsquery),
+                    sqlalchemy.Float,
+                )
+                selects.append(
+                    sqlalchemy.select(
+                        table.c.post_id, number, score.label("score")
+                    ).where(table.c.document.op("@@")(tsquery))
+                )
+        else:
+            match = f'"{term}"'
+            fts = sqlalchemy.literal_column(SEARCH_TABLE)
+            score = sqlalchemy.func.bm25(
+                fts, *(sqlalchemy.literal_column(repr(w)) for w in BM25_WEIGHTS)
+            )
+            selects.append(
+                sqlalchemy.select(
+                    fts_table.c.rowid.label("post_id"), number, score.label("score")
+                ).where(fts.op("MATCH")(match))
+            )
+            fts = sqlalchemy.literal_column(COMMENT_SEARCH_TABLE)
+            score = sqlalchemy.func.bm25(
+                fts, sqlalchemy.literal_column(repr(COMMENT_BM25_WEIGHT))
+            )
+            selects.append(
+                sqlalchemy.select(
+                    comment_fts_table.c.post_id, number, score.label("score")
+                ).where(fts.op("MATCH")(match))
+            )
+    return sqlalchemy.union_all(*selects).subquery("matches")
+
+
+def _required_terms(terms: list[str]):
+    if not is_postgres():
+        return len(terms)
+    # Stop words never match, as they did not when the query was one tsquery
+    return sum(
+        sqlalchemy.case(
+            (
+                sqlalchemy.func.numnode(
+                    sqlalchemy.func.plainto_tsquery(TS_CONFIG, term)
+                )
+                > 0,
+                sqlalchemy.literal_column("1"),
+            ),
+            else_=sqlalchemy.literal_column("0"),
+        )
+        for term in terms
+    )
+
+
+def search_query(
+    terms: list[str],
+    columns,
+    limit: int,
+    after: Optional[tuple[float, int]] = None,
+):
+    """
+    Posts matching every term, best first, as `columns` plus a `rank` column
+    where lower is better. A term may match the post or any of its comments.
+    Pages continue after the (rank, id) of `after`.
+    """
+    matches = _term_matches(terms)
+    ranked = (
+        sqlalchemy.select(
+            matches.c.post_id, sqlalchemy.func.sum(matches.c.score).label("rank")
+        )
+        .group_by(matches.c.post_id)
+        .having(
+            sqlalchemy.func.count(sqlalchemy.distinct(matches.c.term))
+            == _required_terms(terms)
+        )
+        .subquery("ranked")
+    )
+    hits = (
+        sqlalchemy.select(*columns, ranked.c.rank)
+        .select_from(post_table.join(ranked, ranked.c.post_id == post_table.c.id))
+        .subquery("hits")
+    )
+    query = sqlalchemy.select(hits).order_by(hits.c.rank, hits.c.id).limit(limit + 1)
+    if after is not None:
+        after_rank, after_id = after
+        query = query.where(
+            (hits.c.rank > after_rank)
+            | ((hits.c.rank == after_rank) & (hits.c.id > after_id))
+        )
+    return query
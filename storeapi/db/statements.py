@@ -0,0 +1,184 @@
+from typing import Any, NamedTuple, Optional
+
+import databases
+import sqlalchemy
+from sqlalchemy import bindparam
+from sqlalchemy.engine import make_url
+from sqlalchemy.engine.interfaces import Dialect
+
+from storeapi.db.database import comment_table, post_table, rows_to_dicts, user_table
+
+
+class CompiledStatement(NamedTuple):
+    # The query as SQL text, with :name placeholders
+    sql: str
+    # That text with the types of its parameters and result columns, and the
+    # values of the parameters the query itself fixed, e.g. SQLite's OFFSET
+    query: sqlalchemy.TextualSelect
+
+
+def _dialect_for(database: databases.Database) -> Dialect:
+    # Named placeholders, which databases binds and renumbers for its driver
+    return make_url(f"{database.url.dialect}://").get_dialect()(paramstyle="named")
+
+
+class Statement:
+    """
+    A query built once, with `bindparam` placeholders instead of values, and
+    compiled to SQL text once per dialect. Executing it binds the values to
+    that text and runs it through the database, skipping SQLAlchemy's
+    compilation of the full expression on every call. On PostgreSQL the SQL
+    is identical on every call, so asyncpg's statement cache
+    (DB_STATEMENT_CACHE_SIZE) prepares it once per connection and reuses it.
+
+    Rows come back as plain dicts, processed like SQLAlchemy results (e.g.
+    SQLite timestamps as datetimes).
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self._compiled: dict[str, CompiledStatement] = {}
+
+    def compiled(self, database: databases.Database) -> CompiledStatement:
+        key = database.url.dialect
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = self._compiled[key] = self._compile(_dialect_for(database))
+        return compiled
+
+    def _compile(self, dialect: Dialect) -> CompiledStatement:
+        compiled = self.query.compile(dialect=dialect)
+        query = (
+            sqlalchemy.text(compiled.string)
+            .bindparams(
+                *(
+                    # Required ones get their value on every call
+                    bindparam(
+                        name, bind.value if not bind.required else None, bind.type
+                    )
+                    for bind, name in compiled.bind_names.items()
+                )
+            )
+            .columns(
+                *(
+                    # Labels can be str subclasses, which orjson rejects as dict keys
+                    sqlalchemy.column(str(name), column.type)
+                    for name, column in self.query.selected_columns.items()
+                )
+            )
+        )
+        return CompiledStatement(sql=compiled.string, query=query)
+
+    async def _fetch(self, database: databases.Database, values: Optional[dict]):
+        query = self.compiled(database).query
+        if values:
+            query = query.bindparams(**values)
+        return rows_to_dicts(await database.fetch_all(query))
+
+    async def fetch_all(
+        self, database: databases.Database, values: Optional[dict] = None
+    ) -> list[dict]:
+        return await self._fetch(database, values)
+
+    async def fetch_one(
+        self, database: databases.Database, values: Optional[dict] = None
+    ) -> Optional[dict]:
+        rows = await self._fetch(database, values)
+        return rows[0] if rows else None
+
+    async def fetch_val(
+        self, database: databases.Database, values: Optional[dict] = None, column=0
+    ) -> Any:
+        row = await self.fetch_one(database, values)
+        if row is None:
+            return None
+        return row[column] if isinstance(column, str) else list(row.values())[column]
+
+
+# Columns returned to clients; bookkeeping columns such as version stay internal
+post_columns = (
+    post_table.c.id,
+    post_table.c.title,
+    post_table.c.content,
+    post_table.c.user_id,
+    post_table.c.comment_count,
+)
+
+# The hot queries. Pages start after id 0 rather than having variants
+# without that condition, since ids start at 1.
+post_by_id = Statement(
+    post_table.select().where(post_table.c.id == bindparam("post_id"))
+)
+
+user_by_username = Statement(
+    user_table.select().where(user_table.c.username == bindparam("username"))
+)
+
+comments_by_post = Statement(
+    comment_table.select().where(comment_table.c.post_id == bindparam("post_id"))
+)
+
+
+posts_page = Statement(
+    sqlalchemy.select(*post_columns)
+    .where(post_table.c.id > bindparam("after_id"))
+    .order_by(post_table.c.id)
+    .limit(bindparam("limit"))
+)
+
+user_posts_page = Statement(
+    sqlalchemy.select(*post_columns)
+    .where(
+        post_table.c.user_id == bindparam("user_id"),
+        post_table.c.id > bindparam("after_id"),
+    )
+    .order_by(post_table.c.id)
+    .limit(bindparam("limit"))
+)
+
+# Just the ids and versions of a page's rows, which version the page
+posts_page_versions = Statement(
+    sqlalchemy.select(post_table.c.id, post_table.c.version)
+    .where(post_table.c.id > bindparam("after_id"))
+    .order_by(post_table.c.id)
+    .limit(bindparam("limit"))
+)
+
+user_posts_page_versions = Statement(
+    sqlalchemy.select(post_table.c.id, post_table.c.version)
+    .where(
+        post_table.c.user_id == bindparam("user_id"),
+        post_table.c.id > bindparam("after_id"),
+    )
+    .order_by(post_table.c.id)
+    .limit(bindparam("limit"))
+)
+
+user_exists = Statement(
+    sqlalchemy.select(user_table.c.id).where(user_table.c.id == bindparam("user_id"))
+)
+
+
+def _post_with_comments():
+    # A post without comments comes back as one row with NULL comment columns
+    return (
+        sqlalchemy.select(
+            post_table,
+            comment_table.c.id.label("comment_id"),
+            comment_table.c.user_id.label("comment_user_id"),
+            comment_table.c.content.label("comment_content"),
+        )
+        .select_from(
+            post_table.outerjoin(
+                comment_table,
+                (comment_table.c.post_id == post_table.c.id)
+                & (comment_table.c.id > bindparam("after_id")),
+            )
+        )
+        .where(post_table.c.id == bindparam("post_id"))
+        .order_by(comment_table.c.id)
+    )
+
+
+post_with_comments = Statement(_post_with_comments())
+post_with_comments_page = Statement(_post_with_comments().limit(bindparam("limit")))
@@ -0,0 +1,47 @@
+import hashlib
+from datetime import UTC, datetime
+from typing import Optional
+
+from storeapi.db.database import post_table
+from storeapi.db.replicas import replicas
+from storeapi.db.statements import posts_page_versions, user_posts_page_versions
+
+
+def utcnow() -> datetime:
+    # Stored naive in UTC, since SQLite has no timezone-aware timestamp type
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def bump_post(post_id: int, comments: int = 0):
+    """
+    Statement that marks a post (or its comments) as changed.
+    :param comments: Number of comments added (or, negative, removed).
+    """
+    values = {"version": post_table.c.version + 1, "updated_at": utcnow()}
+    if comments:
+        values["comment_count"] = post_table.c.comment_count + comments
+    return post_table.update().where(post_table.c.id == post_id).values(**values)
+
+
+async def fetch_page_version(
+    limit: int, after_id: Optional[int], user_id: Optional[int] = None
+) -> str:
+    """
+    Version of a listing page: a digest of the ids and versions of its posts,
+    and of whether any follow, which decides the next cursor. Creating,
+    updating, deleting or commenting on a post changes only the pages it
+    appears on, and no write has to touch a row shared by the whole collection.
+    """
+    values = {"after_id": after_id or 0, "limit": limit + 1}
+    if user_id is None:
+        rows = await replicas.fetch_all(posts_page_versions, values)
+    else:
+        rows = await replicas.fetch_all(
+            user_posts_page_versions, {**values, "user_id": user_id}
+        )
+
+    digest = hashlib.blake2b(digest_size=8)
+    for row in rows[:limit]:
+        digest.update(f"{row['id']}:{row['version']},".encode())
+    digest.update(b"more" if len(rows) > limit else b"end")
+    return digest.hexdigest()
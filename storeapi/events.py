@@ -0,0 +1,231 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Callable, NamedTuple, Optional
+
+import orjson
+
+from storeapi.config import GlobalConfig, config
+
+logger = logging.getLogger(__name__)
+
+# Topics. Post-level events go to POSTS_TOPIC; everything that happens to one
+# post, its comments included, goes to that post's topic as well.
+POSTS_TOPIC = "posts"
+
+
+def post_topic(post_id: int) -> str:
+    return f"post:{post_id}"
+
+
+class Event(NamedTuple):
+    topics: tuple[str, ...]
+    type: str
+    data: dict
+
+    def dumps(self) -> bytes:
+        return orjson.dumps({"type": self.type, "data": self.data})
+
+
+class SlowConsumer(Exception):
+    """
+    Raised by `Subscription.get` once the subscriber fell `buffer_size` events
+    behind and was dropped.
+    """
+
+
+class Subscription:
+    """
+    A bounded buffer of the events on some topics, for one client.
+    """
+
+    def __init__(self, topics: frozenset[str], buffer_size: int):
+        self.topics = topics
+        self.buffer_size = buffer_size
+        # One slot more than the buffer, for the marker that ends the stream
+        self._queue: asyncio.Queue[Optional[Event]] = asyncio.Queue(buffer_size + 1)
+        self.dropped = False
+
+    def put(self, event: Event) -> bool:
+        """
+        Buffer an event without waiting.
+        :return: False if the buffer was full and the subscriber is now dropped.
+        """
+        if self._queue.qsize() < self.buffer_size:
+            self._queue.put_nowait(event)
+            return True
+
+        # Rather than block publishers, or silently skip events, end the
+        # stream: the client reconnects and reloads what it missed
+        self.dropped = True
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(None)
+        return False
+
+    async def get(self) -> Event:
+        event = await self._queue.get()
+        if event is None:
+            raise SlowConsumer()
+        return event
+
+
+class EventBackend(ABC):
+    """
+    Carries published events to every broker attached to it. The in-memory
+    backend only reaches brokers of this process; a shared one, such as Redis
+    pub/sub, reaches every worker.
+    """
+
+    @abstractmethod
+    def attach(self, deliver: Callable[[Event], None]) -> None: ...
+
+    @abstractmethod
+    async def publish(self, event: Event) -> None: ...
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class MemoryEventBackend(EventBackend):
+    """
+    Delivers to the brokers attached to this object, in this process. Several
+    brokers can share one to stand in for workers sharing a message bus.
+    """
+
+    def __init__(self):
+        self._brokers: list[Callable[[Event], None]] = []
+
+    def attach(self, deliver: Callable[[Event], None]) -> None:
+        self._brokers.append(deliver)
+
+    async def publish(self, event: Event) -> None:
+        for deliver in self._brokers:
+            deliver(event)
+
+
+class RedisEventBackend(EventBackend):
+    """
+    Shares events between workers over pub/sub on one channel, given a
+    `redis.asyncio` style client. Events from this worker come back through
+    Redis too, so every worker delivers them the same way.
+    """
+
+    def __init__(self, client, channel: str = "storeapi:events"):
+        self.client = client
+        self.channel = channel
+        self._brokers: list[Callable[[Event], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def attach(self, deliver: Callable[[Event], None]) -> None:
+        self._brokers.append(deliver)
+
+    async def publish(self, event: Event) -> None:
+        await self.client.publish(self.channel, orjson.dumps(event._asdict()))
+
+    async def start(self) -> None:
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(self.channel)
+        self._task = asyncio.create_task(self._listen(pubsub))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _listen(self, pubsub) -> None:
+        async for message in pubsub.listen():
+            if message["type"] != "message":
+                continue
+            fields = orjson.loads(message["data"])
+            event = Event(tuple(fields["topics"]), fields["type"], fields["data"])
+            for deliver in self._brokers:
+                deliver(event)
+
+
+class Broker:
+    """
+    Fans published events out to the subscriptions of this process.
+    """
+
+    def __init__(self, backend: EventBackend, buffer_size: int):
+        self.backend = backend
+        self.buffer_size = buffer_size
+        self._subscriptions: dict[str, set[Subscription]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        backend.attach(self._deliver)
+
+    async def publish(self, topics: tuple[str, ...], type: str, data: dict) -> None:
+        """
+        Publish an event. Call it after the write it announces has committed;
+        a failure is logged rather than raised, since the write stands.
+        """
+        try:
+            await self.backend.publish(Event(topics, type, data))
+            self.published += 1
+        except Exception:
+            logger.exception("Could not publish %s event", type)
+
+    def subscribe(self, topics: set[str]) -> Subscription:
+        subscription = Subscription(frozenset(topics), self.buffer_size)
+        for topic in subscription.topics:
+            self._subscriptions.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for topic in subscription.topics:
+            subscribers = self._subscriptions.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[topic]
+
+    def _deliver(self, event: Event) -> None:
+        # A subscriber of several of the event's topics gets it once
+        recipients = set()
+        for topic in event.topics:
+            recipients.update(self._subscriptions.get(topic, ()))
+
+        for subscription in recipients:
+            if subscription.put(event):
+                self.delivered += 1
+            else:
+                self.dropped += 1
+                self.unsubscribe(subscription)
+
+    async def start(self) -> None:
+        await self.backend.start()
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+
+    def stats(self) -> dict:
+        return {
+            "topics": len(self._subscriptions),
+            "subscriptions": len(set().union(*self._subscriptions.values())),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+def build_broker(config: GlobalConfig) -> Broker:
+    if config.FEED_BACKEND == "redis":
+        # Optional dependency, only needed when workers share one feed
+        import redis.asyncio
+
+        backend = RedisEventBackend(redis.asyncio.from_url(config.FEED_REDIS_URL))
+    elif config.FEED_BACKEND == "memory":
+        backend = MemoryEventBackend()
+    else:
+        raise ValueError(f"Unknown feed backend: {config.FEED_BACKEND}")
+
+    return Broker(backend, config.FEED_BUFFER_SIZE)
+
+
+broker = build_broker(config)
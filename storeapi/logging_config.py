@@ -1,11 +1,72 @@
+import logging
+import queue
 from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from asgi_correlation_id import CorrelationIdFilter
 
 from storeapi.config import DevConfig, config
 
+# Loggers configured below, in the order they appear in the dictConfig
+LOGGERS = ("storeapi", "uvicorn", "database", "sqlalchemy", "asyncpg")
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["BoundedQueueHandler"] = None
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler over a bounded queue. When the queue is full, "drop" discards
+    the record and counts it, while "block" waits for the listener to catch up.
+
+    Records are prepared as the stdlib does: a copy with `msg % args` and the
+    traceback merged into the message, taken on the caller's thread. Their
+    arguments are live objects the caller may go on to change.
+    """
+
+    def __init__(self, maxsize: int, overflow: str = "drop"):
+        if overflow not in ("drop", "block"):
+            raise ValueError(f"Unknown log overflow policy: {overflow}")
+        super().__init__(queue.Queue(maxsize=maxsize))
+        self.overflow = overflow
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.overflow == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def uuid_length() -> int:
+    return 8 if isinstance(config, DevConfig) else 32
+
+
+def log_level() -> str:
+    if config.LOG_LEVEL:
+        return config.LOG_LEVEL.upper()
+    return "DEBUG" if isinstance(config, DevConfig) else "INFO"
+
+
+def use_rich_console() -> bool:
+    if config.LOG_RICH_CONSOLE is not None:
+        return config.LOG_RICH_CONSOLE
+    return isinstance(config, DevConfig)
+
 
 # Logging configuration
 def configure_logging():
     """Configure logging settings for the application."""
+    stop_logging()
+
+    # With the queue enabled, the correlation id has to be read on the
+    # request's own context, so the filter moves onto the queue handler
+    handler_filters = [] if config.LOG_QUEUE_ENABLED else ["correlation_id"]
+
     dictConfig(
         {
             "version": 1,
@@ -13,7 +74,7 @@ def configure_logging():
             "filters": {
                 "correlation_id": {
                     "()": "asgi_correlation_id.CorrelationIdFilter",
-                    "uuid_length": 8 if isinstance(config, DevConfig) else 32,
+                    "uuid_length": uuid_length(),
                     "default_value": "-",
                 }
             },
@@ -32,25 +93,29 @@ def configure_logging():
             },
             "handlers": {
                 "console": {
-                    "class": "rich.logging.RichHandler",
+                    "class": (
+                        "rich.logging.RichHandler"
+                        if use_rich_console()
+                        else "logging.StreamHandler"
+                    ),
                     "formatter": "default",
                     "level": "DEBUG",
-                    "filters": ["correlation_id"],
+                    "filters": handler_filters,
                 },
                 "RotatingFileHandler": {
                     "class": "logging.handlers.RotatingFileHandler",
-                    "filename": "storeapi.log",
+                    "filename": config.LOG_FILE,
                     "maxBytes": 10 * 1024 * 1024,  # 10 MB
                     "backupCount": 5,
                     "formatter": "file",
-                    "level": "DEBUG" if isinstance(config, DevConfig) else "INFO",
+                    "level": log_level(),
                     "encoding": "utf-8",
-                    "filters": ["correlation_id"],
+                    "filters": handler_filters,
                 },
             },
             "loggers": {
                 "storeapi": {
-                    "level": "DEBUG" if isinstance(config, DevConfig) else "INFO",
+                    "level": log_level(),
                     "handlers": ["console", "RotatingFileHandler"],
                     "propagate": False,
                 },
@@ -73,3 +138,58 @@ def configure_logging():
             },
         }
     )
+
+    if config.LOG_QUEUE_ENABLED:
+        start_queue_listener()
+
+
+def start_queue_listener() -> None:
+    """
+    Swap the configured handlers on each logger for one shared queue handler,
+    and replay them from a listener on a background thread.
+    """
+    global _listener, _queue_handler
+
+    queue_handler = BoundedQueueHandler(
+        config.LOG_QUEUE_SIZE, config.LOG_QUEUE_OVERFLOW
+    )
+    queue_handler.addFilter(
+        CorrelationIdFilter(uuid_length=uuid_length(), default_value="-")
+    )
+
+    handlers = []
+    for name in LOGGERS:
+        logger = logging.getLogger(name)
+        for handler in logger.handlers:
+            if handler not in handlers:
+                handlers.append(handler)
+        logger.handlers = [queue_handler]
+
+    _listener = QueueListener(
+        queue_handler.queue, *handlers, respect_handler_level=True
+    )
+    _listener.start()
+    _queue_handler = queue_handler
+
+
+def stop_logging() -> None:
+    """
+    Flush and stop the queue listener, if one is running.
+    """
+    global _listener, _queue_handler
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        _queue_handler = None
+
+
+def logging_stats() -> dict:
+    if _queue_handler is None:
+        return {"queued": False}
+    return {
+        "queued": True,
+        "queue_depth": _queue_handler.queue.qsize(),
+        "queue_size": _queue_handler.queue.maxsize,
+        "dropped": _queue_handler.dropped,
+    }
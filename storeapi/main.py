@@ -5,11 +5,24 @@ from asgi_correlation_id import CorrelationIdMiddleware
 from fastapi import FastAPI, HTTPException
 from fastapi.exception_handlers import http_exception_handler
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 
+from storeapi.config import config
+from storeapi.controller.controller import comment_batcher, post_batcher
 from storeapi.controller.controller import router as api_router
+from storeapi.controller.feed import router as feed_router
 from storeapi.controller.user import router as user_router
-from storeapi.db.database import database
-from storeapi.logging_config import configure_logging
+from storeapi.db.cache import read_cache
+from storeapi.db.database import database, pool_monitor
+from storeapi.db.migrations import run_migrations
+from storeapi.db.replicas import ReplicaRoutingMiddleware, replicas
+from storeapi.events import broker
+from storeapi.logging_config import configure_logging, logging_stats, stop_logging
+from storeapi.metrics import MetricsMiddleware, metrics
+from storeapi.overload import Overloaded
+from storeapi.profiling import ProfilingMiddleware
+from storeapi.security.rate_limit import auth_limiter
+from storeapi.security.security import hashing_pool, user_cache
 
 logger = logging.getLogger(__name__)
 
@@ -22,16 +35,29 @@ async def lifespan(app: FastAPI):
     configure_logging()  # Configure logging at the start
     logger.info("Starting application lifespan")
     logger.debug("Connecting to the database")
+    pool_monitor.install(database)
     await database.connect()
+    if config.DB_MIGRATE_ON_STARTUP:
+        await run_migrations(database)
+    await replicas.connect()
+    await broker.start()
     yield
+    for batcher in (comment_batcher, post_batcher):
+        if batcher is not None:
+            await batcher.close()
+    await broker.stop()
+    await replicas.disconnect()
     await database.disconnect()
+    hashing_pool.shutdown()
+    stop_logging()
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 
 app.include_router(api_router, prefix="/posts", tags=["posts"])
 app.include_router(user_router, prefix="/users", tags=["users"])
+app.include_router(feed_router, prefix="/feed", tags=["feed"])
 
 # CORS configuration
 app.add_middleware(
@@ -42,6 +68,26 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+if replicas.replicas:
+    if read_cache.backend.shared:
+        # Keeps a client on the primary after a write whichever worker it hits
+        replicas.share_writes(read_cache.backend)
+    app.add_middleware(ReplicaRoutingMiddleware, replicas=replicas)
+
+if config.METRICS_ENABLED:
+    metrics.instrument_database(database)
+    for replica in replicas.replicas:
+        metrics.instrument_database(replica.database)
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+if config.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        directory=config.PROFILING_DIR,
+        header=config.PROFILING_HEADER,
+        sample_rate=config.PROFILING_SAMPLE_RATE,
+    )
+
 app.add_middleware(CorrelationIdMiddleware)
 
 
@@ -50,12 +96,49 @@ async def root():
     return {"message": "Welcome to the Store API"}
 
 
+def component_stats() -> dict:
+    stats = {
+        "user_cache": user_cache.stats(),
+        "hashing_pool": hashing_pool.stats(),
+        "db_pool": pool_monitor.stats(),
+        "db_replicas": replicas.stats(),
+        "read_cache": read_cache.stats(),
+        "rate_limit": auth_limiter.stats(),
+        "feed": broker.stats(),
+        "logging": logging_stats(),
+    }
+    if comment_batcher is not None:
+        stats["comment_batches"] = comment_batcher.stats()
+    if post_batcher is not None:
+        stats["post_batches"] = post_batcher.stats()
+    return stats
+
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", **component_stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(
+        metrics.render(component_stats()),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
 
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler_logging(req, exc):
-    logger.error(f"Status: {exc.status_code} HTTP Exception: {exc.detail}")
+    logger.error("Status: %s HTTP Exception: %s", exc.status_code, exc.detail)
     return await http_exception_handler(req, exc)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(req, exc):
+    # Fail fast so clients back off, rather than queueing past their timeouts
+    logger.warning("Shedding %s %s: %s", req.method, req.url.path, exc)
+    return ORJSONResponse(
+        {"detail": "Service overloaded, retry later"},
+        status_code=503,
+        headers={"Retry-After": str(config.SHED_RETRY_AFTER)},
+    )
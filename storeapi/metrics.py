@@ -0,0 +1,320 @@
+import functools
+import logging
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import databases
+from asgi_correlation_id import correlation_id
+
+from storeapi.config import config
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+QUERY_METHODS = (
+    "execute",
+    "execute_many",
+    "fetch_all",
+    "fetch_one",
+    "fetch_val",
+    "iterate",
+)
+
+# Route label for requests that did not match any route, so 404 scans of
+# arbitrary paths cannot blow up the number of series
+UNMATCHED_ROUTE = "unmatched"
+
+
+class QueryTally:
+    """
+    Queries issued while serving one request.
+    """
+
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_request_queries: ContextVar[Optional[QueryTally]] = ContextVar(
+    "request_queries", default=None
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(v))}"' for name, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, labels: Tuple[str, ...] = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        for values, total in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label set: observations per bucket (the last one is +Inf) and sum
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def count(self, labels: Tuple[str, ...] = ()) -> int:
+        return sum(self._counts.get(labels, ()))
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        bucket_labels = self.labels + ("le",)
+        for values, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, observed in zip(self.buckets + ("+Inf",), counts):
+                cumulative += observed
+                labels = _format_labels(bucket_labels, values + (str(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {self._sums[values]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Metrics:
+    """
+    Request and database metrics for the process, rendered in the Prometheus
+    text exposition format.
+    """
+
+    def __init__(self, query_log_threshold: int = 20):
+        """
+        :param query_log_threshold: Requests issuing more queries than this are
+            logged as a warning, tagged with their correlation id.
+        """
+        self.query_log_threshold = query_log_threshold
+        self.in_flight = 0
+        self.requests = Counter(
+            "storeapi_http_requests_total",
+            "HTTP requests served.",
+            ("method", "route", "status"),
+        )
+        self.request_latency = Histogram(
+            "storeapi_http_request_duration_seconds",
+            "Time spent serving HTTP requests.",
+            ("method", "route"),
+        )
+        self.request_queries = Histogram(
+            "storeapi_http_request_db_queries",
+            "Database queries issued per HTTP request.",
+            ("method", "route"),
+            QUERY_COUNT_BUCKETS,
+        )
+        self.request_db_time = Histogram(
+            "storeapi_http_request_db_duration_seconds",
+            "Time spent in database queries per HTTP request.",
+            ("method", "route"),
+        )
+        self.queries = Counter(
+            "storeapi_db_queries_total", "Database queries issued.", ("operation",)
+        )
+        self.query_latency = Histogram(
+            "storeapi_db_query_duration_seconds",
+            "Time spent in individual database queries.",
+            ("operation",),
+        )
+
+    def observe_query(self, operation: str, seconds: float) -> None:
+        self.queries.inc((operation,))
+        self.query_latency.observe((operation,), seconds)
+        tally = _request_queries.get()
+        if tally is not None:
+            tally.count += 1
+            tally.seconds += seconds
+
+    def observe_request(
+        self, method: str, route: str, status: int, seconds: float, tally: QueryTally
+    ) -> None:
+        self.requests.inc((method, route, str(status)))
+        self.request_latency.observe((method, route), seconds)
+        self.request_queries.observe((method, route), tally.count)
+        self.request_db_time.observe((method, route), tally.seconds)
+
+        level = (
+            logging.WARNING if tally.count > self.query_log_threshold else logging.DEBUG
+        )
+        logger.log(
+            level,
+            "%s %s -> %s in %.1f ms, %d queries (%.1f ms) [correlation_id=%s]",
+            method,
+            route,
+            status,
+            seconds * 1000,
+            tally.count,
+            tally.seconds * 1000,
+            correlation_id.get(),
+            extra={"db_queries": tally.count, "db_time_ms": tally.seconds * 1000},
+        )
+
+    def instrument_database(self, database: databases.Database) -> None:
+        """
+        Time every query issued through `database`. Transactions and explicit
+        connections are left alone; the queries run inside them still go
+        through these methods.
+        """
+        if getattr(database, "_metrics", None) is self:
+            return
+
+        for operation in QUERY_METHODS:
+            # Whatever is installed on the instance, e.g. write tracking
+            method = getattr(database, operation)
+            if operation == "iterate":
+                wrapper = self._timed_iterate(method)
+            else:
+                wrapper = self._timed(operation, method)
+            setattr(database, operation, wrapper)
+        database._metrics = self
+
+    def _timed(self, operation: str, method):
+        @functools.wraps(method)
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                self.observe_query(operation, time.perf_counter() - start)
+
+        return timed
+
+    def _timed_iterate(self, method):
+        # A streamed query counts once, for the full time it was being consumed
+        @functools.wraps(method)
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                async for row in method(*args, **kwargs):
+                    yield row
+            finally:
+                self.observe_query("iterate", time.perf_counter() - start)
+
+        return timed
+
+    def render(self, stats: Optional[Dict[str, dict]] = None) -> str:
+        """
+        Render all metrics, plus any numeric fields of `stats` (component name
+        to a `stats()` dict) as gauges named `storeapi_<component>_<field>`.
+        """
+        lines = [
+            "# HELP storeapi_http_requests_in_flight HTTP requests being served.",
+            "# TYPE storeapi_http_requests_in_flight gauge",
+            f"storeapi_http_requests_in_flight {self.in_flight}",
+        ]
+        for metric in (
+            self.requests,
+            self.request_latency,
+            self.request_queries,
+            self.request_db_time,
+            self.queries,
+            self.query_latency,
+        ):
+            lines.extend(metric.render())
+
+        for component, values in (stats or {}).items():
+            for field, value in values.items():
+                # Strings (executor kind, ...) and unset sizes are not samples
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                name = f"storeapi_{component}_{field}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording count, latency, in-flight and DB usage per route.
+    Add it before `CorrelationIdMiddleware` so the id is set when it logs.
+    """
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        tally = QueryTally()
+        token = _request_queries.set(tally)
+        self.metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.metrics.in_flight -= 1
+            _request_queries.reset(token)
+            # The router records the matched route on the scope; its path is
+            # the template ("/posts/{post_id}"), which keeps the label bounded
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            self.metrics.observe_request(
+                scope["method"], route, status_code, elapsed, tally
+            )
+
+
+metrics = Metrics(query_log_threshold=config.METRICS_QUERY_LOG_THRESHOLD)
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel, ConfigDict
 
 
@@ -14,6 +16,17 @@ class PostOut(PostIn):
     user_id: int
 
 
+# A post as listed, with its comment count so clients need not fetch them
+class PostSummary(PostOut):
+    comment_count: int
+
+
+# A single page of posts, with the cursor to pass as `after` for the next one
+class PostPage(BaseModel):
+    items: list[PostSummary]
+    next_cursor: Optional[str] = None
+
+
 class CommentIn(BaseModel):
     post_id: int
     content: str
@@ -39,3 +52,19 @@ class UserIn(BaseModel):
 class UserOut(UserIn):
     model_config = ConfigDict(from_attributes=True)
     id: int
+
+
+class RefreshTokenIn(BaseModel):
+    refresh_token: str
+
+
+# A post together with (a page of) its comments
+class PostWithComments(BaseModel):
+    post: PostOut
+    comments: list[CommentOut]
+    next_cursor: Optional[str] = None
+
+
+# Ids generated by a bulk insert, in insertion order
+class BulkCreated(BaseModel):
+    ids: list[int]
@@ -0,0 +1,10 @@
+class Overloaded(Exception):
+    """
+    Raised instead of queueing when a shared resource (the password hashing
+    pool, the database pool) already has as much waiting work as allowed.
+    The app answers it with 503 and Retry-After.
+    """
+
+    def __init__(self, resource: str):
+        super().__init__(f"{resource} is saturated")
+        self.resource = resource
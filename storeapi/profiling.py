@@ -0,0 +1,83 @@
+import cProfile
+import logging
+import os
+import random
+import re
+from typing import Optional
+
+import anyio
+from asgi_correlation_id import correlation_id
+
+logger = logging.getLogger(__name__)
+
+# Correlation ids come from a client header; keep only filename-safe characters
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that runs selected requests under cProfile and writes the
+    stats to `<directory>/<correlation id>.prof` (open them with snakeviz,
+    flameprof or `python -m pstats`).
+
+    cProfile follows the event loop thread, so the profile covers the handler
+    and its dependencies but also whatever other requests ran interleaved with
+    it, and not work handed to executors (password hashing). Only one request
+    is profiled at a time; others that ask while one is running are served
+    without a profile.
+
+    Only add it when profiling is enabled; it is not meant to sit idle in the
+    stack.
+    """
+
+    def __init__(
+        self,
+        app,
+        directory: str,
+        header: str = "X-Profile",
+        sample_rate: float = 0.0,
+    ):
+        self.app = app
+        self.directory = directory
+        self.header = header.lower().encode("latin-1")
+        self.sample_rate = sample_rate
+        self._active = False
+
+    def should_profile(self, scope) -> bool:
+        if self._active:
+            return False
+        for name, value in scope["headers"]:
+            if name == self.header:
+                return value.strip().lower() in (b"1", b"true", b"yes")
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self._active = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.disable()
+            self._active = False
+            path = await anyio.to_thread.run_sync(
+                self.dump, profiler, correlation_id.get()
+            )
+            logger.info("Profiled %s %s into %s", scope["method"], scope["path"], path)
+
+    def dump(self, profiler: cProfile.Profile, request_id: Optional[str]) -> str:
+        """
+        Write the profile to the output directory, named after the request id.
+        :param profiler: The stopped profiler.
+        :param request_id: The correlation id of the profiled request.
+        :return: The path of the written file.
+        """
+        name = _UNSAFE_FILENAME_CHARS.sub("_", request_id or "") or "unknown"
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{name}.prof")
+        profiler.dump_stats(path)
+        return path
@@ -0,0 +1,192 @@
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request, status
+
+from storeapi.config import GlobalConfig, config
+
+
+class RateLimitBackend(ABC):
+    """
+    Token buckets by key. `take` removes one token from the bucket of `key`,
+    which holds at most `burst` tokens and refills at `rate` per second.
+    """
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """
+        Take a token if one is left.
+        :return: 0 if the token was taken, else the seconds until one is.
+        """
+
+    @abstractmethod
+    async def clear(self) -> None: ...
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """
+    Buckets of this process only, least recently used dropped beyond
+    `max_keys`. A dropped bucket comes back full, which errs towards allowing.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    async def clear(self) -> None:
+        self._buckets.clear()
+
+    def stats(self) -> dict:
+        return {"keys": len(self._buckets)}
+
+
+# Refill and take in one round trip, on the server clock so that every worker
+# and host agrees on the time. Buckets expire once they would be full again.
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + (now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call("HSET", KEYS[1], "tokens", tokens, "updated", now)
+redis.call("PEXPIRE", KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+    Buckets shared by every worker, given a `redis.asyncio` style client.
+    """
+
+    def __init__(self, client, prefix: str = "storeapi:ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+        self._take = client.register_script(_TAKE_SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        wait = await self._take(keys=[self.prefix + key], args=[rate, burst])
+        return float(wait)
+
+    async def clear(self) -> None:
+        async for key in self.client.scan_iter(match=self.prefix + "*"):
+            await self.client.delete(key)
+
+
+class RateLimiter:
+    """
+    Rejects a request with 429 once any of its keys has run out of tokens.
+    """
+
+    def __init__(
+        self, backend: RateLimitBackend, rate: float, burst: int, enabled: bool = True
+    ):
+        self.backend = backend
+        self.rate = rate
+        self.burst = burst
+        self.enabled = enabled
+        self.allowed = 0
+        self.limited = 0
+
+    async def check(self, *keys: str) -> None:
+        """
+        Take a token from the bucket of every key, e.g. the client IP and the
+        username, so neither many clients nor many usernames get around it.
+        Stops at the first empty bucket, so a rejected request does not drain
+        the buckets of the keys after it.
+        :raises HTTPException: 429 with Retry-After when a bucket is empty.
+        """
+        if not self.enabled:
+            return
+
+        for key in keys:
+            wait = await self.backend.take(key, self.rate, self.burst)
+            if wait:
+                self.limited += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests",
+                    headers={"Retry-After": str(math.ceil(wait))},
+                )
+        self.allowed += 1
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            **self.backend.stats(),
+        }
+
+
+def client_ip(request: Request) -> str:
+    """
+    The address of the client. Behind RATE_LIMIT_TRUSTED_PROXIES proxies it is
+    that many entries from the right of X-Forwarded-For: the one the outermost
+    trusted proxy appended. Entries left of it came from the client, who can
+    put anything there.
+    """
+    hops = config.RATE_LIMIT_TRUSTED_PROXIES
+    if hops > 0:
+        forwarded = request.headers.get("x-forwarded-for", "").split(",")
+        # Fewer entries than proxies means the request skipped one of them
+        if len(forwarded) >= hops:
+            return forwarded[-hops].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def build_rate_limiter(config: GlobalConfig) -> RateLimiter:
+    if config.RATE_LIMIT_BACKEND == "redis":
+        # Optional dependency, only needed when limits are shared between workers
+        import redis.asyncio
+
+        backend = RedisRateLimitBackend(
+            redis.asyncio.from_url(config.RATE_LIMIT_REDIS_URL)
+        )
+    elif config.RATE_LIMIT_BACKEND == "memory":
+        backend = MemoryRateLimitBackend(config.RATE_LIMIT_MAX_KEYS)
+    else:
+        raise ValueError(f"Unknown rate limit backend: {config.RATE_LIMIT_BACKEND}")
+
+    return RateLimiter(
+        backend,
+        config.RATE_LIMIT_RATE,
+        config.RATE_LIMIT_BURST,
+        enabled=config.RATE_LIMIT_ENABLED,
+    )
+
+
+auth_limiter = build_rate_limiter(config)
@@ -1,13 +1,23 @@
+import hashlib
 import logging
+import secrets
+import uuid
 from datetime import UTC, datetime, timedelta
-from typing import Annotated
+from typing import Annotated, Optional
 
+import sqlalchemy
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from passlib.context import CryptContext
 
-from storeapi.db.database import database, user_table
+from storeapi.config import config
+from storeapi.db.database import database, refresh_token_table, user_table
+from storeapi.db.replicas import replicas
+from storeapi.db.statements import user_by_username
+from storeapi.db.versions import utcnow
+from storeapi.security.user_cache import UserCache
+from storeapi.security.worker_pool import WorkerPool
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +28,14 @@ cryptContext = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = "MY-APP"
 ALGORITHM = "HS256"
 
+user_cache = UserCache(config.USER_CACHE_SIZE, config.USER_CACHE_TTL)
+
+hashing_pool = WorkerPool(
+    config.PASSWORD_HASH_WORKERS,
+    config.PASSWORD_HASH_EXECUTOR,
+    queue_limit=config.SHED_HASH_QUEUE_DEPTH,
+)
+
 credential_exception = HTTPException(
     status_code=status.HTTP_401_UNAUTHORIZED,
     detail="Could not validate credentials",
@@ -25,57 +43,168 @@ credential_exception = HTTPException(
 )
 
 
-async def create_access_token(data: dict, expires_delta: int = None) -> str:
+async def create_access_token(data: dict, expires_delta: Optional[int] = None) -> str:
     """
     Create a JWT access token.
     :param data: The data to encode in the token.
-    :param expires_delta: Optional expiration time in seconds.
+    :param expires_delta: Optional expiration time in seconds; defaults to
+        ACCESS_TOKEN_EXPIRE_MINUTES.
     :return: The encoded JWT token as a string.
     """
     to_encode = data.copy()
     if expires_delta:
-        to_encode.update({"exp": datetime.now(UTC) + timedelta(minutes=15)})
+        lifetime = timedelta(seconds=expires_delta)
     else:
-        to_encode.update({"exp": datetime.now(UTC) + timedelta(minutes=15)})
+        lifetime = timedelta(minutes=config.ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": datetime.now(UTC) + lifetime})
 
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
+def _token_hash(token: str) -> str:
+    # Refresh tokens are random, so a fast unsalted hash is enough to keep a
+    # leaked table from being replayed, and lookups stay one indexed query
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def create_refresh_token(user_id: int, family_id: Optional[str] = None) -> str:
+    """
+    Issue a refresh token and store its hash.
+    :param user_id: The user the token authenticates.
+    :param family_id: The family of the token being rotated; None starts a new one.
+    :return: The token itself, which only the client keeps.
+    """
+    token = secrets.token_urlsafe(32)
+    now = utcnow()
+    await database.execute(
+        refresh_token_table.insert().values(
+            user_id=user_id,
+            family_id=family_id or uuid.uuid4().hex,
+            token_hash=_token_hash(token),
+            created_at=now,
+            expires_at=now + timedelta(days=config.REFRESH_TOKEN_EXPIRE_DAYS),
+        )
+    )
+    return token
+
+
+async def rotate_refresh_token(token: str) -> Optional[tuple[dict, str]]:
+    """
+    Exchange a refresh token for its user and a new token of the same family.
+    Tokens are single use: one presented again after its rotation revokes the
+    family, since either its client or whoever copied it holds a newer one.
+    :param token: The refresh token presented by the client.
+    :return: The user and the new refresh token, or None if `token` is not valid.
+    """
+    token_hash = _token_hash(token)
+    now = utcnow()
+    async with database.transaction():
+        # Claiming the token in one conditional UPDATE lets only one of two
+        # concurrent refreshes with the same token succeed
+        claimed = await database.fetch_one(
+            refresh_token_table.update()
+            .where(
+                refresh_token_table.c.token_hash == token_hash,
+                refresh_token_table.c.revoked_at.is_(None),
+                refresh_token_table.c.expires_at > now,
+            )
+            .values(revoked_at=now)
+            .returning(refresh_token_table.c.user_id, refresh_token_table.c.family_id)
+        )
+        if claimed is None:
+            family_id = await database.fetch_val(
+                sqlalchemy.select(refresh_token_table.c.family_id).where(
+                    refresh_token_table.c.token_hash == token_hash,
+                    refresh_token_table.c.revoked_at.is_not(None),
+                )
+            )
+            if family_id is not None:
+                logger.warning("Revoked refresh token reused, revoking its family")
+                await _revoke_family(family_id, now)
+            return None
+
+        user = await database.fetch_one(
+            user_table.select().where(user_table.c.id == claimed["user_id"])
+        )
+        new_token = await create_refresh_token(claimed["user_id"], claimed["family_id"])
+
+    return {
+        "id": user["id"],
+        "username": user["username"],
+        "email": user["email"],
+    }, new_token
+
+
+async def revoke_refresh_token(token: str) -> None:
+    """
+    Revoke a refresh token and every token rotated from the same login.
+    :param token: The refresh token presented by the client.
+    """
+    family_id = await database.fetch_val(
+        sqlalchemy.select(refresh_token_table.c.family_id).where(
+            refresh_token_table.c.token_hash == _token_hash(token)
+        )
+    )
+    if family_id is not None:
+        await _revoke_family(family_id, utcnow())
+
+
+async def _revoke_family(family_id: str, now: datetime) -> None:
+    await database.execute(
+        refresh_token_table.update()
+        .where(
+            refresh_token_table.c.family_id == family_id,
+            refresh_token_table.c.revoked_at.is_(None),
+        )
+        .values(revoked_at=now)
+    )
+
+
+def _hash(password: str) -> str:
+    return cryptContext.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return cryptContext.verify(plain_password, hashed_password)
+
+
 async def hash_password(password: str) -> str:
     """
-    Hash a plain password using bcrypt.
+    Hash a plain password using bcrypt on the hashing worker pool.
     :param password: The plain text password to hash.
     :return: The hashed password.
     """
-    return cryptContext.hash(password)
+    return await hashing_pool.run(_hash, password)
 
 
 async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
-    Verify a plain password against a hashed password.
+    Verify a plain password against a hashed password on the hashing worker pool.
     :param plain_password: The plain text password to verify.
     :param hashed_password: The hashed password to compare against.
     :return: True if the passwords match, False otherwise.
     """
-    return cryptContext.verify(plain_password, hashed_password)
+    return await hashing_pool.run(_verify, plain_password, hashed_password)
 
 
-async def get_user(username: str):
+async def get_user(username: str, primary: bool = False):
     """
     Mock function to simulate user retrieval.
     In a real application, this would query the database or an external service.
+    :param primary: Read from the primary rather than a replica, which may not
+        have a user registered a moment ago.
     """
     # Simulating a user retrieval
 
-    query = user_table.select().where(user_table.c.username == username)
-
-    logger.debug(f"Executing query to get user: {query}")
-
-    result = await database.fetch_one(query)
+    values = {"username": username}
+    if primary:
+        result = await user_by_username.fetch_one(database, values)
+    else:
+        result = await replicas.fetch_one(user_by_username, values)
 
-    logger.debug(f"Querying user with username: {username}")
-    logger.debug(f"Query result: {result}")
+    logger.debug("Querying user with username: %s", username)
+    logger.debug("Query result: %s", result)
 
     if not result:
         return None
@@ -109,17 +238,28 @@ async def get_current_user(token: Annotated[str, Depends] = Depends(oauth2_schem
     :return: The user data if the token is valid, raises HTTPException otherwise.
     """
     try:
-        logger.debug(f"Received token: {token}")
+        logger.debug("Received token: %s", token)
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        logger.debug(f"Decoded JWT payload: {payload}")
+        logger.debug("Decoded JWT payload: %s", payload)
         if username is None:
             raise credential_exception
-        user = await get_user(username)
-        logger.debug(f"Retrieved user: {user}")
+
+        if config.TRUST_TOKEN_CLAIMS and "id" in payload:
+            return {
+                "id": payload["id"],
+                "username": username,
+                "email": payload.get("email"),
+            }
+
+        user = user_cache.get(username)
         if user is None:
-            raise credential_exception
+            user = await get_user(username)
+            logger.debug("Retrieved user: %s", user)
+            if user is None:
+                raise credential_exception
+            user_cache.set(username, user)
         return user
     except jwt.JWTError as e:
-        logger.error(f"JWT Error: {e}")
+        logger.error("JWT Error: %s", e)
         raise credential_exception
@@ -0,0 +1,66 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class UserCache:
+    """
+    Bounded, TTL-based LRU cache of authenticated users keyed by username.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        """
+        :param max_size: Maximum number of users kept; 0 disables the cache.
+        :param ttl: Seconds an entry stays valid after it is stored.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, username: str) -> Optional[dict]:
+        """
+        Return a copy of the cached user, or None on a miss or expired entry.
+        """
+        entry = self._entries.get(username)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[username]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(username)
+        self.hits += 1
+        return dict(entry[1])
+
+    def set(self, username: str, user: dict) -> None:
+        """
+        Store a user, evicting the least recently used entry when full.
+        """
+        if self.max_size <= 0:
+            return
+
+        self._entries[username] = (time.monotonic() + self.ttl, dict(user))
+        self._entries.move_to_end(username)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, username: str) -> None:
+        """
+        Drop a user from the cache, e.g. after it has been changed.
+        """
+        self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,84 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from storeapi.overload import Overloaded
+
+
+class WorkerPool:
+    """
+    Bounded executor for CPU-bound work such as bcrypt, so it runs off the event loop.
+    """
+
+    def __init__(
+        self, max_workers: int, kind: str = "thread", queue_limit: Optional[int] = None
+    ):
+        """
+        :param max_workers: Number of jobs that may run at the same time.
+        :param kind: "thread" or "process".
+        :param queue_limit: Waiting jobs allowed before `run` raises `Overloaded`
+            instead of queueing; None queues without bound.
+        """
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown worker pool kind: {kind}")
+        self.max_workers = max_workers
+        self.kind = kind
+        self.queue_limit = queue_limit
+        self._executor: Optional[Executor] = None
+        self.in_flight = 0
+        self.completed = 0
+        self.max_queue_depth = 0
+        self.rejected = 0
+
+    @property
+    def executor(self) -> Executor:
+        # Created on first use so forked server workers each get their own
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="storeapi-hash"
+                )
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Number of submitted jobs waiting for a free worker.
+        """
+        return max(0, self.in_flight - self.max_workers)
+
+    async def run(self, func: Callable, *args):
+        """
+        Run `func(*args)` on the pool and await its result.
+        """
+        if self.queue_limit is not None and self.queue_depth >= self.queue_limit:
+            self.rejected += 1
+            raise Overloaded("password hashing")
+
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "queue_limit": self.queue_limit,
+            "rejected": self.rejected,
+            "completed": self.completed,
+        }
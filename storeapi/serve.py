@@ -0,0 +1,87 @@
+import argparse
+import importlib.util
+import logging
+import os
+from typing import Optional
+
+from storeapi.config import config
+
+logger = logging.getLogger(__name__)
+
+APP = "storeapi.main:app"
+
+
+def resolve_loop(loop: str) -> str:
+    if loop != "auto":
+        return loop
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def resolve_http(http: str) -> str:
+    if http != "auto":
+        return http
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def worker_count(workers: Optional[int]) -> int:
+    return workers or os.cpu_count() or 1
+
+
+def server_options(
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> dict:
+    """
+    Keyword arguments for `uvicorn.run`, from GlobalConfig unless overridden.
+    """
+    return {
+        "host": host or config.SERVER_HOST,
+        "port": port or config.SERVER_PORT,
+        "workers": worker_count(workers or config.SERVER_WORKERS),
+        "loop": resolve_loop(config.SERVER_LOOP),
+        "http": resolve_http(config.SERVER_HTTP),
+        "timeout_keep_alive": config.SERVER_KEEP_ALIVE,
+        "backlog": config.SERVER_BACKLOG,
+        "timeout_graceful_shutdown": config.SERVER_GRACEFUL_SHUTDOWN,
+        # The app configures the "uvicorn" loggers itself in its lifespan
+        "log_config": None,
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the Store API with uvicorn.")
+    parser.add_argument("--host", help=f"default: SERVER_HOST ({config.SERVER_HOST})")
+    parser.add_argument(
+        "--port", type=int, help=f"default: SERVER_PORT ({config.SERVER_PORT})"
+    )
+    parser.add_argument(
+        "--workers", type=int, help="default: SERVER_WORKERS, else the CPU count"
+    )
+    args = parser.parse_args(argv)
+
+    # Imported here so importing this module does not require the server
+    import uvicorn
+
+    options = server_options(args.host, args.port, args.workers)
+    logging.basicConfig(level=logging.INFO)
+    logger.info(
+        "Starting %s worker(s) on %s:%s (loop=%s, http=%s); up to %s DB connections",
+        options["workers"],
+        options["host"],
+        options["port"],
+        options["loop"],
+        options["http"],
+        options["workers"] * config.DB_POOL_MAX_SIZE,
+    )
+    # Workers import the app by name, so each builds its own database and
+    # opens its pool in the app lifespan rather than inheriting one. They read
+    # their count from the environment: a per-worker read cache may only hold
+    # post rows when there is a single worker.
+    prefix = config.model_config.get("env_prefix", "")
+    os.environ[f"{prefix}SERVER_WORKERS"] = str(options["workers"])
+    uvicorn.run(APP, **options)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import pytest
+
+from storeapi.tests.benchmarks.utils import BENCH_TIMING
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "timing: wall-clock comparison, run only with BENCH_TIMING=1"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if BENCH_TIMING:
+        return
+    skip = pytest.mark.skip(reason="timing comparison; set BENCH_TIMING=1 to run")
+    for item in items:
+        if "timing" in item.keywords:
+            item.add_marker(skip)
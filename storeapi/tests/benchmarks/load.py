@@ -0,0 +1,521 @@
+"""
+Load benchmark for every route in the posts and users routers.
+
+Seeds users, posts and comments, drives each route with a fixed number of
+requests and prints throughput and p50/p95/p99 latency per route as JSON:
+
+    ENV_STATE=test python -m storeapi.tests.benchmarks.load --requests 500
+
+Requests go through `httpx.ASGITransport` by default, against whatever
+DATABASE_URL the environment configures (SQLite works, no services needed).
+`--uvicorn` starts a real server (`storeapi.serve`) in a subprocess instead,
+and `--url` targets one that is already running; both need a database shared
+with the server, so DB_FORCE_ROLL_BACK must be off.
+
+Login and register are rate limited per client IP; set RATE_LIMIT_ENABLED=false
+(with the prefix of the ENV_STATE in use, e.g. TEST_) to time the handlers
+rather than the 429s once more than RATE_LIMIT_BURST of them are sent.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+import anyio
+import httpx
+import sqlalchemy
+
+from storeapi.config import config
+from storeapi.controller.pagination import encode_cursor
+from storeapi.db.database import comment_table, database, post_table, user_table
+from storeapi.db.migrations import run_migrations
+from storeapi.db.search import index_comments, reindex_posts
+from storeapi.security.security import create_refresh_token, hash_password
+from storeapi.tests.benchmarks.utils import latency_summary
+
+PASSWORD = "load-test-password"
+# Rows per multi-row INSERT while seeding, well under SQLite's variable limit
+SEED_CHUNK = 500
+
+
+class LoadContext:
+    """
+    State shared by the scenarios of one run: the seeded ids and the token of
+    the user the authenticated requests act as.
+    """
+
+    def __init__(self, run_id: str, user_id: int, username: str, post_ids: list[int]):
+        self.run_id = run_id
+        self.user_id = user_id
+        self.username = username
+        self.post_ids = post_ids
+        self.token: Optional[str] = None
+        # Per-scenario targets created by `Scenario.prepare`, outside the timing
+        self.targets: dict[str, list] = {}
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    def post_id(self, i: int) -> int:
+        return self.post_ids[i % len(self.post_ids)]
+
+
+class Scenario(NamedTuple):
+    name: str
+    route: str
+    # Builds (method, url, request kwargs) for the i-th request
+    build: Callable[[LoadContext, int], tuple[str, str, dict]]
+    # Share of the configured request count; bcrypt-bound routes run fewer
+    weight: float = 1.0
+    prepare: Optional[Callable[[httpx.AsyncClient, LoadContext, int], Awaitable]] = None
+
+
+async def insert_returning_ids(table: sqlalchemy.Table, rows: list[dict]) -> list[int]:
+    ids = []
+    for start in range(0, len(rows), SEED_CHUNK):
+        query = (
+            table.insert()
+            .values(rows[start : start + SEED_CHUNK])
+            .returning(table.c.id)
+        )
+        ids.extend(row.id for row in await database.fetch_all(query))
+    return sorted(ids)
+
+
+async def seed(run_id: str, users: int, posts: int, comments: int) -> LoadContext:
+    """
+    Insert `users` users (all sharing one password), `posts` posts spread over
+    them and `comments` comments on each post, straight through the database.
+    """
+    hashed = await hash_password(PASSWORD)
+    user_ids = await insert_returning_ids(
+        user_table,
+        [
+            {
+                "username": f"load_{run_id}_{i}",
+                "email": f"load_{run_id}_{i}@example.net",
+                "hashed_password": hashed,
+            }
+            for i in range(users)
+        ],
+    )
+    post_ids = await insert_returning_ids(
+        post_table,
+        [
+            {
+                "title": f"Post {i}",
+                "content": "Content " * 20,
+                "user_id": user_ids[i % users],
+            }
+            for i in range(posts)
+        ],
+    )
+    comment_ids = await insert_returning_ids(
+        comment_table,
+        [
+            {"post_id": post_id, "user_id": user_ids[i % users], "content": "Comment"}
+            for post_id in post_ids
+            for i in range(comments)
+        ],
+    )
+    await database.execute(
+        post_table.update()
+        .where(post_table.c.id.in_(post_ids))
+        .values(comment_count=comments)
+    )
+    await reindex_posts(post_ids)
+    for start in range(0, len(comment_ids), SEED_CHUNK):
+        await index_comments(comment_ids[start : start + SEED_CHUNK])
+
+    # Authenticated scenarios act as the first user, on the posts it owns
+    own_posts = [post_id for i, post_id in enumerate(post_ids) if i % users == 0]
+    return LoadContext(run_id, user_ids[0], f"load_{run_id}_0", own_posts)
+
+
+async def prepare_comments(client: httpx.AsyncClient, ctx: LoadContext, n: int):
+    rows = [
+        {"post_id": ctx.post_id(i), "user_id": ctx.user_id, "content": "Doomed"}
+        for i in range(n)
+    ]
+    ids = await insert_returning_ids(comment_table, rows)
+    ctx.targets["delete_comment"] = [
+        (row["post_id"], comment_id) for row, comment_id in zip(rows, ids)
+    ]
+
+
+async def prepare_posts(client: httpx.AsyncClient, ctx: LoadContext, n: int):
+    ctx.targets["delete_post"] = await insert_returning_ids(
+        post_table,
+        [{"title": "Doomed", "content": "Doomed", "user_id": ctx.user_id}] * n,
+    )
+
+
+def prepare_refresh_tokens(name: str):
+    # Refresh tokens are single use, so every request gets one of its own
+    async def prepare(client: httpx.AsyncClient, ctx: LoadContext, n: int):
+        ctx.targets[name] = [await create_refresh_token(ctx.user_id) for _ in range(n)]
+
+    return prepare
+
+
+async def prepare_etag(client: httpx.AsyncClient, ctx: LoadContext, n: int):
+    response = await client.get("/posts/")
+    ctx.targets["etag"] = [response.headers["ETag"]]
+
+
+def post_body(i: int) -> dict:
+    return {"title": f"Load post {i}", "content": "Content " * 20}
+
+
+# In run order: reads before the writes that invalidate their cache entries,
+# deletes last so they never remove a post another scenario targets
+SCENARIOS = (
+    Scenario(
+        "register",
+        "POST /users/register",
+        lambda ctx, i: (
+            "POST",
+            "/users/register",
+            {
+                "json": {
+                    "username": f"register_{ctx.run_id}_{i}",
+                    "email": f"register_{ctx.run_id}_{i}@example.net",
+                    "password": PASSWORD,
+                }
+            },
+        ),
+        weight=0.1,
+    ),
+    Scenario(
+        "login",
+        "GET /users/login",
+        lambda ctx, i: (
+            "GET",
+            "/users/login",
+            {"params": {"username": ctx.username, "password": PASSWORD}},
+        ),
+        weight=0.1,
+    ),
+    Scenario(
+        "refresh_token",
+        "POST /users/token/refresh",
+        lambda ctx, i: (
+            "POST",
+            "/users/token/refresh",
+            {"json": {"refresh_token": ctx.targets["refresh_token"][i]}},
+        ),
+        prepare=prepare_refresh_tokens("refresh_token"),
+    ),
+    Scenario(
+        "revoke_token",
+        "POST /users/token/revoke",
+        lambda ctx, i: (
+            "POST",
+            "/users/token/revoke",
+            {"json": {"refresh_token": ctx.targets["revoke_token"][i]}},
+        ),
+        prepare=prepare_refresh_tokens("revoke_token"),
+    ),
+    Scenario(
+        "list_posts",
+        "GET /posts/",
+        lambda ctx, i: (
+            "GET",
+            "/posts/",
+            {"params": {"limit": 20, "after": encode_cursor(ctx.post_id(i))}},
+        ),
+    ),
+    Scenario(
+        "list_posts_not_modified",
+        "GET /posts/ (If-None-Match)",
+        lambda ctx, i: (
+            "GET",
+            "/posts/",
+            {"headers": {"If-None-Match": ctx.targets["etag"][0]}},
+        ),
+        prepare=prepare_etag,
+    ),
+    Scenario(
+        "stream_posts",
+        "GET /posts/?stream=true",
+        lambda ctx, i: ("GET", "/posts/", {"params": {"stream": "true"}}),
+        weight=0.1,
+    ),
+    Scenario(
+        "list_user_posts",
+        "GET /users/{user_id}/posts",
+        lambda ctx, i: (
+            "GET",
+            f"/users/{ctx.user_id}/posts",
+            {"params": {"limit": 20}},
+        ),
+    ),
+    Scenario(
+        "search_posts",
+        "GET /posts/search",
+        lambda ctx, i: (
+            "GET",
+            "/posts/search",
+            {"params": {"q": "content comment", "limit": 20}},
+        ),
+    ),
+    Scenario(
+        "get_post_with_comments",
+        "GET /posts/{post_id}",
+        lambda ctx, i: ("GET", f"/posts/{ctx.post_id(i)}", {}),
+    ),
+    Scenario(
+        "list_comments",
+        "GET /posts/{post_id}/comments/",
+        lambda ctx, i: ("GET", f"/posts/{ctx.post_id(i)}/comments/", {}),
+    ),
+    Scenario(
+        "create_post",
+        "POST /posts/",
+        lambda ctx, i: ("POST", "/posts/", {"json": post_body(i)}),
+    ),
+    Scenario(
+        "create_posts_bulk",
+        "POST /posts/bulk",
+        lambda ctx, i: (
+            "POST",
+            "/posts/bulk",
+            {"json": [post_body(i)] * 10},
+        ),
+        weight=0.2,
+    ),
+    Scenario(
+        "update_post",
+        "PUT /posts/{post_id}",
+        lambda ctx, i: ("PUT", f"/posts/{ctx.post_id(i)}", {"json": post_body(i)}),
+    ),
+    Scenario(
+        "add_comment",
+        "POST /posts/{post_id}/comments/",
+        lambda ctx, i: (
+            "POST",
+            f"/posts/{ctx.post_id(i)}/comments/",
+            {"json": {"post_id": ctx.post_id(i), "content": "Load comment"}},
+        ),
+    ),
+    Scenario(
+        "add_comments_bulk",
+        "POST /posts/{post_id}/comments/bulk",
+        lambda ctx, i: (
+            "POST",
+            f"/posts/{ctx.post_id(i)}/comments/bulk",
+            {"json": [{"post_id": ctx.post_id(i), "content": "Bulk comment"}] * 10},
+        ),
+        weight=0.2,
+    ),
+    Scenario(
+        "delete_comment",
+        "DELETE /posts/{post_id}/comments/{comment_id}",
+        lambda ctx, i: (
+            "DELETE",
+            "/posts/{}/comments/{}".format(*ctx.targets["delete_comment"][i]),
+            {},
+        ),
+        prepare=prepare_comments,
+    ),
+    Scenario(
+        "delete_post",
+        "DELETE /posts/{post_id}",
+        lambda ctx, i: ("DELETE", f"/posts/{ctx.targets['delete_post'][i]}", {}),
+        prepare=prepare_posts,
+    ),
+)
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    ctx: LoadContext,
+    requests: int,
+    concurrency: int,
+) -> dict:
+    """
+    Send `requests` requests for `scenario` from `concurrency` workers.
+    :return: Throughput, latency percentiles and status counts for the route.
+    """
+    if scenario.prepare is not None:
+        await scenario.prepare(client, ctx, requests)
+
+    samples: list[float] = []
+    statuses: dict[str, int] = {}
+    pending = iter(range(requests))
+
+    async def worker():
+        for i in pending:
+            method, url, kwargs = scenario.build(ctx, i)
+            kwargs.setdefault("headers", {}).update(ctx.headers)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            await response.aread()
+            samples.append((time.perf_counter() - start) * 1000)
+            code = str(response.status_code)
+            statuses[code] = statuses.get(code, 0) + 1
+
+    start = time.perf_counter()
+    async with anyio.create_task_group() as tg:
+        for _ in range(concurrency):
+            tg.start_soon(worker)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "route": scenario.route,
+        "requests": requests,
+        "errors": sum(n for code, n in statuses.items() if int(code) >= 400),
+        "statuses": statuses,
+        "throughput_rps": requests / elapsed if elapsed else 0.0,
+        **latency_summary(samples),
+    }
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    users: int = 10,
+    posts: int = 200,
+    comments: int = 5,
+    requests: int = 200,
+    concurrency: int = 1,
+    only: Optional[list[str]] = None,
+) -> dict:
+    """
+    Seed the connected `database` and run every scenario (or those named in
+    `only`) against `client`.
+    :return: The JSON-serialisable report.
+    """
+    run_id = uuid.uuid4().hex[:8]
+    ctx = await seed(run_id, users, posts, comments)
+
+    response = await client.get(
+        "/users/login", params={"username": ctx.username, "password": PASSWORD}
+    )
+    response.raise_for_status()
+    ctx.token = response.json()["access_token"]
+
+    results = {}
+    for scenario in SCENARIOS:
+        if only and scenario.name not in only:
+            continue
+        count = max(1, int(requests * scenario.weight))
+        results[scenario.name] = await run_scenario(
+            client, scenario, ctx, count, concurrency
+        )
+
+    return {
+        "run_id": run_id,
+        "database": database.url.dialect,
+        "seed": {"users": users, "posts": posts, "comments_per_post": comments},
+        "requests": requests,
+        "concurrency": concurrency,
+        "scenarios": results,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_uvicorn(port: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "storeapi.serve", "--port", str(port), "--workers", "1"],
+        env=os.environ.copy(),
+    )
+
+
+async def wait_until_up(
+    client: httpx.AsyncClient,
+    server: Optional[subprocess.Popen] = None,
+    timeout: float = 30.0,
+) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            (await client.get("/health")).raise_for_status()
+            return
+        except httpx.TransportError:
+            if server is not None and server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def main(argv: Optional[list[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--comments", type=int, default=5, help="per post")
+    parser.add_argument("--requests", type=int, default=200, help="per route")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--scenario", action="append", help="run only these")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="benchmark a server that is already running")
+    target.add_argument(
+        "--uvicorn", action="store_true", help="start a server to benchmark"
+    )
+    args = parser.parse_args(argv)
+
+    if (args.url or args.uvicorn) and config.DB_FORCE_ROLL_BACK:
+        parser.error("a separate server cannot see rows seeded under force rollback")
+
+    server = None
+    async with database:
+        await run_migrations(database)
+
+        if args.uvicorn:
+            port = free_port()
+            server = start_uvicorn(port)
+            args.url = f"http://127.0.0.1:{port}"
+
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, timeout=60.0)
+        else:
+            from storeapi.main import app
+
+            client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://bench"
+            )
+
+        try:
+            async with client:
+                if args.url:
+                    await wait_until_up(client, server)
+                report = await run_load(
+                    client,
+                    users=args.users,
+                    posts=args.posts,
+                    comments=args.comments,
+                    requests=args.requests,
+                    concurrency=args.concurrency,
+                    only=args.scenario,
+                )
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    report["transport"] = "http" if args.url else "asgi"
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    return report
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,34 @@
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from storeapi.tests.benchmarks.utils import BENCH_SCALE, report
+
+POSTS = 200 * BENCH_SCALE
+BATCH_SIZE = 100
+
+
+@pytest.mark.timing
+@pytest.mark.anyio
+async def test_bulk_create_throughput(async_client: AsyncClient, logged_in_token: str):
+    headers = {"Authorization": f"Bearer {logged_in_token}"}
+    body = {"title": "Post", "content": "Content"}
+
+    start = time.perf_counter()
+    for _ in range(POSTS):
+        response = await async_client.post("/posts/", json=body, headers=headers)
+        assert response.status_code == 201
+    single = POSTS / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(POSTS // BATCH_SIZE):
+        response = await async_client.post(
+            "/posts/bulk", json=[body] * BATCH_SIZE, headers=headers
+        )
+        assert response.status_code == 201
+    bulk = POSTS / (time.perf_counter() - start)
+
+    report("bulk_create", {"single_rows_per_s": single, "bulk_rows_per_s": bulk})
+
+    assert bulk > single * 5
@@ -0,0 +1,48 @@
+import pytest
+import sqlalchemy
+from httpx import AsyncClient
+
+from storeapi.db.database import database, post_table
+from storeapi.tests.benchmarks.utils import (
+    BENCH_SCALE,
+    Timer,
+    report,
+    seed_comments,
+    seed_posts,
+    seed_user,
+)
+
+DELETES_PER_SIZE = 30
+
+
+async def median_delete_latency(async_client: AsyncClient, post_count: int) -> float:
+    """
+    Grow the posts table to `post_count` rows and time deleting comments on one post.
+    """
+    user_id = await seed_user(f"bench_{post_count}")
+    await seed_posts(user_id, post_count)
+    last_post = await database.fetch_val(
+        sqlalchemy.select(sqlalchemy.func.max(post_table.c.id))
+    )
+    comment_ids = await seed_comments(last_post, user_id, DELETES_PER_SIZE)
+
+    timer = Timer()
+    for comment_id in comment_ids:
+        with timer:
+            response = await async_client.delete(
+                f"/posts/{last_post}/comments/{comment_id}"
+            )
+        assert response.status_code == 200
+    return timer.median
+
+
+@pytest.mark.timing
+@pytest.mark.anyio
+async def test_delete_comment_latency_is_flat(async_client: AsyncClient):
+    small = await median_delete_latency(async_client, 100 * BENCH_SCALE)
+    large = await median_delete_latency(async_client, 10_000 * BENCH_SCALE)
+
+    report("delete_comment", {"small_median_ms": small, "large_median_ms": large})
+
+    # Loading every post made this grow linearly; a keyed delete should not
+    assert large < small * 3 + 1
@@ -0,0 +1,32 @@
+import pytest
+from httpx import AsyncClient
+
+from storeapi.security.rate_limit import auth_limiter
+from storeapi.tests.benchmarks.load import SCENARIOS, run_load
+from storeapi.tests.benchmarks.utils import BENCH_SCALE, report
+
+
+@pytest.mark.anyio
+async def test_load_covers_every_route(async_client: AsyncClient, monkeypatch):
+    # Every request comes from one client address; time the handlers instead
+    monkeypatch.setattr(auth_limiter, "enabled", False)
+    requests = 20 * BENCH_SCALE
+    results = await run_load(
+        async_client,
+        users=3,
+        posts=30 * BENCH_SCALE,
+        comments=3,
+        requests=requests,
+    )
+
+    report("load", results)
+
+    assert set(results["scenarios"]) == {scenario.name for scenario in SCENARIOS}
+    for name, result in results["scenarios"].items():
+        assert result["errors"] == 0, f"{name}: {result['statuses']}"
+    assert results["scenarios"]["list_posts_not_modified"]["statuses"] == {
+        "304": requests
+    }
+    # Each refresh rotates a token of its own, so none trips reuse detection
+    assert results["scenarios"]["refresh_token"]["statuses"] == {"200": requests}
+    assert results["scenarios"]["revoke_token"]["statuses"] == {"204": requests}
@@ -0,0 +1,97 @@
+import logging
+import statistics
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from storeapi.config import config
+from storeapi.logging_config import LOGGERS, configure_logging, stop_logging
+from storeapi.tests.benchmarks.utils import BENCH_SCALE, report
+
+REQUESTS = 100 * BENCH_SCALE
+
+
+@pytest.fixture()
+def restore_logging():
+    yield
+    stop_logging()
+    for name in LOGGERS:
+        logger = logging.getLogger(name)
+        for handler in logger.handlers:
+            handler.close()
+        logger.handlers = []
+
+
+async def median_latency(async_client: AsyncClient, token: str) -> float:
+    samples = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        response = await async_client.post(
+            "/posts/",
+            json={"title": "Post", "content": "Content"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 201
+    return statistics.median(samples)
+
+
+@pytest.mark.anyio
+async def test_queued_logging_reaches_the_log_file(
+    async_client: AsyncClient,
+    logged_in_token: str,
+    monkeypatch,
+    tmp_path,
+    restore_logging,
+):
+    log_file = tmp_path / "bench.log"
+    monkeypatch.setattr(config, "LOG_FILE", str(log_file))
+    monkeypatch.setattr(config, "LOG_LEVEL", "DEBUG")
+    monkeypatch.setattr(config, "LOG_QUEUE_ENABLED", True)
+    monkeypatch.setattr(config, "LOG_RICH_CONSOLE", False)
+    configure_logging()
+
+    response = await async_client.post(
+        "/posts/",
+        json={"title": "Post", "content": "Content"},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.status_code == 201
+    # Stopping the listener flushes the queue
+    stop_logging()
+
+    assert "Creating post" in log_file.read_text()
+
+
+@pytest.mark.timing
+@pytest.mark.anyio
+async def test_logging_request_latency(
+    async_client: AsyncClient,
+    logged_in_token: str,
+    monkeypatch,
+    tmp_path,
+    restore_logging,
+):
+    monkeypatch.setattr(config, "LOG_FILE", str(tmp_path / "bench.log"))
+
+    results = {}
+    for level in ("INFO", "DEBUG"):
+        for queued, rich in ((False, True), (True, False)):
+            monkeypatch.setattr(config, "LOG_LEVEL", level)
+            monkeypatch.setattr(config, "LOG_QUEUE_ENABLED", queued)
+            monkeypatch.setattr(config, "LOG_RICH_CONSOLE", rich)
+            configure_logging()
+            mode = "queued" if queued else "inline+rich"
+            results[(level, mode)] = await median_latency(async_client, logged_in_token)
+            stop_logging()
+
+    report(
+        "logging",
+        {
+            f"{level} {mode}": {"median_ms": latency}
+            for (level, mode), latency in results.items()
+        },
+    )
+
+    assert results[("DEBUG", "queued")] < results[("DEBUG", "inline+rich")]
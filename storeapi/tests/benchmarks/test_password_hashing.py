@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import pytest
+
+from storeapi.security.security import cryptContext, hash_password
+from storeapi.tests.benchmarks.utils import report
+
+CONCURRENT_HASHES = 4
+TICK = 0.005
+
+
+async def max_loop_lag(work) -> float:
+    """
+    Run `work` while a ticker measures the longest event-loop stall in milliseconds.
+    """
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append(time.perf_counter() - start - TICK)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    await work()
+    done.set()
+    await task
+    return max(lags) * 1000
+
+
+@pytest.mark.timing
+@pytest.mark.anyio
+async def test_hashing_does_not_block_event_loop():
+    async def inline():
+        for _ in range(CONCURRENT_HASHES):
+            await asyncio.sleep(0)
+            cryptContext.hash("password")
+
+    async def pooled():
+        await asyncio.gather(
+            *(hash_password("password") for _ in range(CONCURRENT_HASHES))
+        )
+
+    before = await max_loop_lag(inline)
+    after = await max_loop_lag(pooled)
+
+    report("password_hashing", {"inline_lag_ms": before, "pooled_lag_ms": after})
+
+    assert after < before / 2
@@ -0,0 +1,69 @@
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from storeapi.db.cache import read_cache
+from storeapi.tests.benchmarks.utils import (
+    BENCH_SCALE,
+    report,
+    seed_comments,
+    seed_posts,
+    seed_user,
+)
+
+POSTS = 50
+READS = 300 * BENCH_SCALE
+
+
+async def read_throughput(async_client: AsyncClient) -> float:
+    start = time.perf_counter()
+    for i in range(READS):
+        post_id = i % POSTS + 1
+        response = await async_client.get(f"/posts/{post_id}/comments/")
+        assert response.status_code == 200
+    return READS / (time.perf_counter() - start)
+
+
+async def seed() -> None:
+    user_id = await seed_user()
+    await seed_posts(user_id, POSTS)
+    for post_id in range(1, POSTS + 1):
+        await seed_comments(post_id, user_id, 5)
+
+
+@pytest.mark.anyio
+async def test_read_cache_serves_repeat_reads(async_client: AsyncClient):
+    await seed()
+
+    first = await async_client.get("/posts/1/comments/")
+    hits = read_cache.stats()["hits"]
+    second = await async_client.get("/posts/1/comments/")
+
+    assert second.json() == first.json()
+    # The post row, for the ETag, and the comment list
+    assert read_cache.stats()["hits"] == hits + 2
+
+
+@pytest.mark.timing
+@pytest.mark.anyio
+async def test_read_cache_throughput(async_client: AsyncClient, monkeypatch):
+    await seed()
+
+    monkeypatch.setattr(read_cache, "enabled", False)
+    uncached = await read_throughput(async_client)
+
+    monkeypatch.setattr(read_cache, "enabled", True)
+    cached = await read_throughput(async_client)
+
+    report(
+        "read_cache",
+        {
+            "reads": READS,
+            "uncached_rps": uncached,
+            "cached_rps": cached,
+            "hit_ratio": read_cache.stats()["hit_ratio"],
+        },
+    )
+
+    assert cached > uncached
@@ -0,0 +1,44 @@
+import json
+import time
+
+import pytest
+from fastapi.responses import ORJSONResponse
+
+from storeapi.db.database import database, post_table, rows_to_dicts
+from storeapi.models.models import PostPage
+from storeapi.tests.benchmarks.utils import (
+    BENCH_SCALE,
+    report,
+    seed_posts,
+    seed_user,
+)
+
+ROWS = 10_000 * BENCH_SCALE
+
+
+def pydantic_body(rows) -> bytes:
+    # What FastAPI does with a response_model: validate, dump, then json.dumps
+    page = PostPage.model_validate({"items": rows, "next_cursor": None})
+    return json.dumps(page.model_dump(mode="json")).encode()
+
+
+def orjson_body(rows) -> bytes:
+    return ORJSONResponse({"items": rows_to_dicts(rows), "next_cursor": None}).body
+
+
+@pytest.mark.timing
+@pytest.mark.anyio
+async def test_list_posts_serialization_cost():
+    await seed_posts(await seed_user(), ROWS)
+    rows = await database.fetch_all(post_table.select().order_by(post_table.c.id))
+
+    timings = {}
+    for name, serialize in (("pydantic", pydantic_body), ("orjson", orjson_body)):
+        start = time.perf_counter()
+        body = serialize(rows)
+        timings[name] = (time.perf_counter() - start) * 1000
+        assert len(json.loads(body)["items"]) == ROWS
+
+    report("serialization", {"rows": ROWS, **timings})
+
+    assert timings["orjson"] < timings["pydantic"]
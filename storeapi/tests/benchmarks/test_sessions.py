@@ -0,0 +1,63 @@
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from storeapi.config import config
+from storeapi.tests.benchmarks.utils import report
+
+RENEWALS = 3
+
+
+async def cpu_ms_per_renewal(renew) -> float:
+    """
+    Process CPU time of `renew`, averaged over RENEWALS calls. process_time
+    counts every thread, so it includes bcrypt on the thread hashing pool.
+    """
+    start = time.process_time()
+    for _ in range(RENEWALS):
+        await renew()
+    return (time.process_time() - start) * 1000 / RENEWALS
+
+
+@pytest.mark.timing
+@pytest.mark.anyio
+async def test_refresh_cuts_cpu_per_session_hour(
+    async_client: AsyncClient, registered_user: dict
+):
+    credentials = {
+        "username": registered_user["username"],
+        "password": registered_user["password"],
+    }
+    refresh_token = None
+
+    async def login():
+        nonlocal refresh_token
+        response = await async_client.get("/users/login", params=credentials)
+        assert response.status_code == 200
+        refresh_token = response.json()["refresh_token"]
+
+    async def refresh():
+        nonlocal refresh_token
+        response = await async_client.post(
+            "/users/token/refresh", json={"refresh_token": refresh_token}
+        )
+        assert response.status_code == 200
+        refresh_token = response.json()["refresh_token"]
+
+    # A client keeps a valid access token for an hour by renewing it this often;
+    # the one login that starts a refresh-token session is amortised away
+    renewals_per_hour = 60 / config.ACCESS_TOKEN_EXPIRE_MINUTES
+    before = await cpu_ms_per_renewal(login) * renewals_per_hour
+    after = await cpu_ms_per_renewal(refresh) * renewals_per_hour
+
+    report(
+        "sessions",
+        {
+            "renewals_per_hour": renewals_per_hour,
+            "login_cpu_ms_per_hour": before,
+            "refresh_cpu_ms_per_hour": after,
+        },
+    )
+
+    assert after < before / 5
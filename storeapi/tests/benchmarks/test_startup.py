@@ -0,0 +1,77 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import storeapi
+from storeapi.tests.benchmarks.utils import report
+
+# Runs in a fresh interpreter, so nothing is already imported or connected
+STARTUP_SCRIPT = """
+import asyncio, json, time
+
+start = time.perf_counter()
+from storeapi.main import app
+imported = time.perf_counter()
+
+from httpx import ASGITransport, AsyncClient
+
+
+async def first_request():
+    async with app.router.lifespan_context(app):
+        started = time.perf_counter()
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/health")
+        assert response.status_code == 200, response.text
+    return started
+
+
+started = asyncio.run(first_request())
+answered = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "lifespan_ms": (started - imported) * 1000,
+    "first_request_ms": (answered - start) * 1000,
+}))
+"""
+
+
+def run_python(code: str, tmp_path) -> subprocess.CompletedProcess:
+    env = {
+        **os.environ,
+        "ENV_STATE": "test",
+        "TEST_DATABASE_URL": f"sqlite+aiosqlite:///{tmp_path / 'startup.db'}",
+        "TEST_LOG_FILE": str(tmp_path / "startup.log"),
+        # Run from an empty directory, with the project still importable
+        "PYTHONPATH": os.path.dirname(os.path.dirname(storeapi.__file__)),
+    }
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        env=env,
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+@pytest.mark.anyio
+async def test_import_has_no_side_effects(tmp_path):
+    result = run_python("import storeapi.main", tmp_path)
+
+    assert result.stdout == ""
+    # Neither the database nor the log file is touched until the lifespan runs
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.anyio
+async def test_startup_time(tmp_path):
+    timings = json.loads(run_python(STARTUP_SCRIPT, tmp_path).stdout)
+
+    report("startup", timings)
+
+    # Generous bound: it catches import-time I/O creeping back in, not noise
+    assert timings["first_request_ms"] < 10000
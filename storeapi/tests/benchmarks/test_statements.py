@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from storeapi.db.database import database, post_table, row_to_dict
+from storeapi.db.statements import post_by_id
+from storeapi.tests.benchmarks.utils import BENCH_SCALE, report, seed_posts, seed_user
+
+POSTS = 50
+QUERIES = 2000 * BENCH_SCALE
+
+
+async def built_per_call(post_id: int) -> dict:
+    # What load_post did before: build the expression, let databases compile it
+    query = post_table.select().where(post_table.c.id == post_id)
+    return row_to_dict(await database.fetch_one(query))
+
+
+async def precompiled(post_id: int) -> dict:
+    return await post_by_id.fetch_one(database, {"post_id": post_id})
+
+
+async def microseconds_per_query(load) -> float:
+    start = time.perf_counter()
+    for i in range(QUERIES):
+        await load(i % POSTS + 1)
+    return (time.perf_counter() - start) * 1e6 / QUERIES
+
+
+@pytest.mark.anyio
+async def test_precompiled_statement_matches_built_query():
+    await seed_posts(await seed_user(), POSTS)
+
+    # Same row, same types, either way
+    assert await precompiled(1) == await built_per_call(1)
+
+
+@pytest.mark.timing
+@pytest.mark.anyio
+async def test_precompiled_statement_overhead():
+    await seed_posts(await seed_user(), POSTS)
+
+    before = await microseconds_per_query(built_per_call)
+    after = await microseconds_per_query(precompiled)
+
+    report(
+        "statements",
+        {"queries": QUERIES, "built_per_call_us": before, "precompiled_us": after},
+    )
+
+    assert after < before
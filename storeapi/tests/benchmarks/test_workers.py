@@ -0,0 +1,23 @@
+import pytest
+
+from storeapi.tests.benchmarks.utils import BENCH_SCALE, report
+from storeapi.tests.benchmarks.workers import run
+
+# Starts real server processes, so it needs the server installed
+pytest.importorskip("uvicorn")
+
+
+@pytest.mark.anyio
+async def test_worker_scaling(tmp_path):
+    results = await run(
+        [1, 2],
+        f"sqlite+aiosqlite:///{tmp_path / 'workers.db'}",
+        posts=50,
+        requests=500 * BENCH_SCALE,
+        concurrency=16,
+    )
+
+    report("workers", results)
+
+    # Scaling depends on the machine's cores; only check every run was clean
+    assert all(result["errors"] == 0 for result in results["workers"].values())
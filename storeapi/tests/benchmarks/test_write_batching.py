@@ -0,0 +1,23 @@
+import pytest
+
+from storeapi.tests.benchmarks.utils import BENCH_SCALE, report
+from storeapi.tests.benchmarks.write_batching import run
+
+# Starts real server processes, so it needs the server installed
+pytest.importorskip("uvicorn")
+
+
+@pytest.mark.anyio
+async def test_write_batching(tmp_path):
+    results = await run(
+        f"sqlite+aiosqlite:///{tmp_path / 'batching.db'}",
+        [1, 16],
+        requests=100 * BENCH_SCALE,
+    )
+
+    report("write_batching", results)
+
+    # SQLite may refuse concurrent single-row writers ("database is locked");
+    # batched inserts are written one transaction at a time and never are
+    for levels in results["batched"].values():
+        assert all(result["errors"] == 0 for result in levels.values())
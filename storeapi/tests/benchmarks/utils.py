@@ -0,0 +1,98 @@
+import json
+import os
+import statistics
+import time
+
+from storeapi.db.database import comment_table, database, post_table, user_table
+
+# Multiplier for the seeded row counts, e.g. BENCH_SCALE=10 for a longer run
+BENCH_SCALE = int(os.environ.get("BENCH_SCALE", "1"))
+# Wall-clock comparisons (tests marked `timing`) only run with BENCH_TIMING=1,
+# since a loaded machine can turn any of them around
+BENCH_TIMING = os.environ.get("BENCH_TIMING") == "1"
+# Directory the benchmarks write their numbers to, one JSON file per test
+BENCH_REPORT_DIR = os.environ.get("BENCH_REPORT_DIR")
+
+
+async def seed_user(username: str = "bench_user") -> int:
+    """
+    Insert a user directly, bypassing the register endpoint and bcrypt.
+    """
+    query = user_table.insert().values(
+        username=username, email=f"{username}@example.net", hashed_password="-"
+    )
+    return await database.execute(query)
+
+
+async def seed_posts(user_id: int, count: int) -> None:
+    """
+    Insert `count` posts for `user_id` in a single executemany call.
+    """
+    await database.execute_many(
+        post_table.insert(),
+        [
+            {"title": f"Post {i}", "content": "Content", "user_id": user_id}
+            for i in range(count)
+        ],
+    )
+
+
+async def seed_comments(post_id: int, user_id: int, count: int) -> list[int]:
+    """
+    Insert `count` comments on `post_id` and return their ids.
+    """
+    ids = []
+    for i in range(count):
+        query = comment_table.insert().values(
+            post_id=post_id, user_id=user_id, content=f"Comment {i}"
+        )
+        ids.append(await database.execute(query))
+    return ids
+
+
+class Timer:
+    """
+    Collect wall-clock samples and summarise them in milliseconds.
+    """
+
+    def __init__(self):
+        self.samples: list[float] = []
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.samples.append((time.perf_counter() - self._start) * 1000)
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.samples)
+
+
+def latency_summary(samples: list[float]) -> dict:
+    """
+    p50/p95/p99 and max of latency samples, in milliseconds.
+    """
+    if len(samples) < 2:
+        value = samples[0] if samples else 0.0
+        return {"p50_ms": value, "p95_ms": value, "p99_ms": value, "max_ms": value}
+
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50_ms": cuts[49],
+        "p95_ms": cuts[94],
+        "p99_ms": cuts[98],
+        "max_ms": max(samples),
+    }
+
+
+def report(name: str, results: dict) -> None:
+    """
+    Save a benchmark's numbers as BENCH_REPORT_DIR/<name>.json, if it is set.
+    """
+    if not BENCH_REPORT_DIR:
+        return
+    os.makedirs(BENCH_REPORT_DIR, exist_ok=True)
+    with open(os.path.join(BENCH_REPORT_DIR, f"{name}.json"), "w") as f:
+        json.dump(results, f, indent=2)
@@ -0,0 +1,179 @@
+"""
+Throughput of the production launcher as the number of workers grows.
+
+Starts `python -m storeapi.serve` once per worker count against one SQLite
+file (or --database-url), seeds it through the API, and reports req/s and
+latency percentiles per worker count as JSON:
+
+    python -m storeapi.tests.benchmarks.workers --workers 1 2 4 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+import anyio
+import databases
+import httpx
+
+from storeapi.db.migrations import run_migrations
+from storeapi.tests.benchmarks.load import free_port, wait_until_up
+from storeapi.tests.benchmarks.utils import latency_summary
+
+PASSWORD = "workers-bench-password"
+
+
+def start_server(port: int, workers: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "storeapi.serve",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def seed_through_api(client: httpx.AsyncClient, posts: int) -> None:
+    user = {"username": "workers", "email": "workers@example.net"}
+    await client.post("/users/register", json={**user, "password": PASSWORD})
+    response = await client.get(
+        "/users/login", params={"username": "workers", "password": PASSWORD}
+    )
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    for start in range(0, posts, 500):
+        batch = [
+            {"title": f"Post {i}", "content": "Content " * 20}
+            for i in range(start, min(posts, start + 500))
+        ]
+        response = await client.post("/posts/bulk", json=batch, headers=headers)
+        response.raise_for_status()
+
+
+async def measure(
+    client: httpx.AsyncClient, posts: int, requests: int, concurrency: int
+) -> dict:
+    """
+    Send `requests` reads, alternating single posts and list pages, from
+    `concurrency` concurrent clients.
+    """
+    samples: list[float] = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in pending:
+            url = f"/posts/{i % posts + 1}" if i % 2 else "/posts/?limit=20"
+            start = time.perf_counter()
+            response = await client.get(url)
+            samples.append((time.perf_counter() - start) * 1000)
+            errors += response.status_code >= 400
+
+    start = time.perf_counter()
+    async with anyio.create_task_group() as tg:
+        for _ in range(concurrency):
+            tg.start_soon(worker)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": requests / elapsed,
+        **latency_summary(samples),
+    }
+
+
+async def run(
+    worker_counts: list[int],
+    database_url: str,
+    posts: int = 200,
+    requests: int = 2000,
+    concurrency: int = 64,
+) -> dict:
+    async with databases.Database(database_url) as database:
+        await run_migrations(database)
+
+    env = {
+        **os.environ,
+        "ENV_STATE": "global",
+        "DATABASE_URL": database_url,
+        "DB_FORCE_ROLL_BACK": "false",
+        "DB_MIGRATE_ON_STARTUP": "false",
+        "LOG_LEVEL": "WARNING",
+        "LOG_FILE": os.path.join(tempfile.gettempdir(), "storeapi-workers.log"),
+    }
+
+    results = {}
+    seeded = False
+    for workers in worker_counts:
+        port = free_port()
+        server = start_server(port, workers, env)
+        try:
+            limits = httpx.Limits(max_connections=concurrency)
+            async with httpx.AsyncClient(
+                base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60.0
+            ) as client:
+                await wait_until_up(client, server)
+                if not seeded:
+                    await seed_through_api(client, posts)
+                    seeded = True
+                # Warm every worker's read cache and connection pool first
+                await measure(client, posts, concurrency * 4, concurrency)
+                results[str(workers)] = await measure(
+                    client, posts, requests, concurrency
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+    return {
+        "cpu_count": os.cpu_count(),
+        "database": database_url.split(":")[0],
+        "posts": posts,
+        "concurrency": concurrency,
+        "workers": results,
+    }
+
+
+async def main(argv: Optional[list[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--database-url", help="default: a temporary SQLite file")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or (
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'workers.db')}"
+        )
+        report = await run(
+            args.workers, database_url, args.posts, args.requests, args.concurrency
+        )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    return report
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
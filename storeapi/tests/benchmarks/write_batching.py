@@ -0,0 +1,180 @@
+"""
+Throughput and latency of single-row creates with and without group commit.
+
+Starts `python -m storeapi.serve` against one SQLite file (or --database-url),
+once with WRITE_BATCH_COMMENTS/WRITE_BATCH_POSTS off and once on, and sends
+comment and post creates at each concurrency level. Prints req/s, latency
+percentiles and the average batch size per mode and level as JSON:
+
+    python -m storeapi.tests.benchmarks.write_batching --concurrency 1 16 64
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Optional
+
+import anyio
+import databases
+import httpx
+
+from storeapi.db.migrations import run_migrations
+from storeapi.tests.benchmarks.load import free_port, wait_until_up
+from storeapi.tests.benchmarks.utils import latency_summary
+from storeapi.tests.benchmarks.workers import start_server
+
+PASSWORD = "batching-bench-password"
+
+
+async def log_in(client: httpx.AsyncClient, username: str) -> dict:
+    user = {"username": username, "email": f"{username}@example.net"}
+    await client.post("/users/register", json={**user, "password": PASSWORD})
+    response = await client.get(
+        "/users/login", params={"username": username, "password": PASSWORD}
+    )
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def measure(
+    client: httpx.AsyncClient,
+    headers: dict,
+    post_id: int,
+    kind: str,
+    requests: int,
+    concurrency: int,
+) -> dict:
+    """
+    Send `requests` comment (or post) creates from `concurrency` concurrent
+    clients.
+    """
+    samples: list[float] = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in pending:
+            if kind == "comments":
+                url = f"/posts/{post_id}/comments/"
+                body = {"post_id": post_id, "content": f"Comment {i}"}
+            else:
+                url = "/posts/"
+                body = {"title": f"Post {i}", "content": "Content"}
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, json=body, headers=headers)
+            except httpx.TransportError:
+                # The server drops the connection when a handler raises, e.g.
+                # SQLite's "database is locked" under concurrent writers
+                errors += 1
+                continue
+            samples.append((time.perf_counter() - start) * 1000)
+            errors += response.status_code >= 400
+
+    start = time.perf_counter()
+    async with anyio.create_task_group() as tg:
+        for _ in range(concurrency):
+            tg.start_soon(worker)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": requests / elapsed,
+        **latency_summary(samples),
+    }
+
+
+async def run_mode(
+    batched: bool, env: dict, concurrency_levels: list[int], requests: int
+) -> dict:
+    port = free_port()
+    flag = "true" if batched else "false"
+    server = start_server(
+        port, 1, {**env, "WRITE_BATCH_COMMENTS": flag, "WRITE_BATCH_POSTS": flag}
+    )
+    results = {}
+    try:
+        limits = httpx.Limits(max_connections=max(concurrency_levels))
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60.0
+        ) as client:
+            await wait_until_up(client, server)
+            headers = await log_in(client, f"batching_{flag}")
+            response = await client.post(
+                "/posts/", json={"title": "Post", "content": "Content"}, headers=headers
+            )
+            response.raise_for_status()
+            post_id = response.json()["id"]
+
+            for kind in ("comments", "posts"):
+                for concurrency in concurrency_levels:
+                    before = (await client.get("/health")).json()
+                    result = await measure(
+                        client, headers, post_id, kind, requests, concurrency
+                    )
+                    after = (await client.get("/health")).json()
+                    stats = f"{kind[:-1]}_batches"
+                    if batched:
+                        batches = after[stats]["batches"] - before[stats]["batches"]
+                        rows = after[stats]["rows"] - before[stats]["rows"]
+                        result["rows_per_batch"] = rows / max(batches, 1)
+                    results.setdefault(kind, {})[str(concurrency)] = result
+    finally:
+        server.terminate()
+        server.wait()
+    return results
+
+
+async def run(
+    database_url: str, concurrency_levels: list[int], requests: int = 500
+) -> dict:
+    async with databases.Database(database_url) as database:
+        await run_migrations(database)
+
+    env = {
+        **os.environ,
+        "ENV_STATE": "global",
+        "DATABASE_URL": database_url,
+        "DB_FORCE_ROLL_BACK": "false",
+        "DB_MIGRATE_ON_STARTUP": "false",
+        "LOG_LEVEL": "WARNING",
+        "LOG_FILE": os.path.join(tempfile.gettempdir(), "storeapi-batching.log"),
+    }
+
+    return {
+        "database": database_url.split(":")[0],
+        "requests": requests,
+        "single": await run_mode(False, env, concurrency_levels, requests),
+        "batched": await run_mode(True, env, concurrency_levels, requests),
+    }
+
+
+async def main(argv: Optional[list[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--database-url", help="default: a temporary SQLite file")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or (
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'batching.db')}"
+        )
+        report = await run(database_url, args.concurrency, args.requests)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    return report
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
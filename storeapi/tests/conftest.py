@@ -1,14 +1,18 @@
 import os
 from typing import AsyncGenerator, Generator
 
-import pytest
-from fastapi.testclient import TestClient
-from httpx import ASGITransport, AsyncClient
+os.environ["ENV_STATE"] = "TEST"  # Must be set before the app config is imported
 
-from storeapi.db.database import database
-from storeapi.main import app
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from httpx import ASGITransport, AsyncClient  # noqa: E402
 
-os.environ["ENV_STATE"] = "TEST"  # Enable asyncio debug mode for better error messages
+from storeapi.db.cache import read_cache  # noqa: E402
+from storeapi.db.database import database  # noqa: E402
+from storeapi.db.migrations import run_migrations  # noqa: E402
+from storeapi.main import app  # noqa: E402
+from storeapi.security.rate_limit import auth_limiter  # noqa: E402
+from storeapi.security.security import user_cache  # noqa: E402
 
 
 @pytest.fixture(scope="session")
@@ -35,14 +39,17 @@ async def reset_db() -> AsyncGenerator:
     Fixture to reset the in-memory database before each test.
     This ensures that tests do not interfere with each other.
     """
-    database.connect()
+    user_cache.clear()
+    await read_cache.clear()
+    await auth_limiter.clear()
+    await database.connect()
+    await run_migrations(database)
     yield
-    database.disconnect()
-    # No cleanup needed since we're using an in-memory dictionary
+    await database.disconnect()
 
 
 @pytest.fixture()
-async def async_client(client) -> AsyncGenerator:
+async def async_client() -> AsyncGenerator:
     """
     Fixture to create an async test client for the FastAPI application.
     This can be used for testing async endpoints.
@@ -50,6 +57,36 @@ async def async_client(client) -> AsyncGenerator:
     transport = ASGITransport(app=app)
 
     async with AsyncClient(
-        transport=transport, base_url=client.base_url
+        transport=transport, base_url="http://test"
     ) as async_test_client:
         yield async_test_client
+
+
+@pytest.fixture()
+async def registered_user(async_client: AsyncClient) -> dict:
+    """
+    Fixture to register a user and return its credentials.
+    """
+    user_details = {
+        "username": "test_user",
+        "email": "test@example.net",
+        "password": "1234",
+    }
+    response = await async_client.post("/users/register", json=user_details)
+    assert response.status_code == 201, f"Failed to register user: {response.text}"
+    return user_details
+
+
+@pytest.fixture()
+async def logged_in_token(async_client: AsyncClient, registered_user: dict) -> str:
+    """
+    Fixture to log in the registered user and return a bearer token.
+    """
+    response = await async_client.get(
+        "/users/login",
+        params={
+            "username": registered_user["username"],
+            "password": registered_user["password"],
+        },
+    )
+    return response.json()["access_token"]
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from storeapi.db.batching import InsertBatcher
+
+
+class RecordingWriter:
+    """
+    Stands in for a batch insert: records each batch and hands out ids.
+    """
+
+    def __init__(self):
+        self.batches: list[list[dict]] = []
+        self.next_id = 1
+
+    async def __call__(self, rows: list[dict]) -> list[int]:
+        self.batches.append(rows)
+        if any(row.get("bad") for row in rows):
+            raise ValueError("bad row")
+        ids = list(range(self.next_id, self.next_id + len(rows)))
+        self.next_id += len(rows)
+        return ids
+
+
+@pytest.mark.anyio
+async def test_concurrent_inserts_share_a_batch():
+    write = RecordingWriter()
+    batcher = InsertBatcher(write, window=0.01, max_rows=100)
+
+    ids = await asyncio.gather(*(batcher.insert({"n": n}) for n in range(5)))
+
+    assert ids == [1, 2, 3, 4, 5]
+    assert write.batches == [[{"n": n} for n in range(5)]]
+    assert batcher.stats()["largest_batch"] == 5
+
+
+@pytest.mark.anyio
+async def test_full_batch_is_written_without_waiting():
+    write = RecordingWriter()
+    batcher = InsertBatcher(write, window=60.0, max_rows=2)
+
+    ids = await asyncio.wait_for(
+        asyncio.gather(*(batcher.insert({"n": n}) for n in range(4))), 1.0
+    )
+
+    assert ids == [1, 2, 3, 4]
+    assert [len(batch) for batch in write.batches] == [2, 2]
+
+
+@pytest.mark.anyio
+async def test_failing_row_fails_only_its_caller():
+    write = RecordingWriter()
+    batcher = InsertBatcher(write, window=0.01, max_rows=100)
+
+    results = await asyncio.gather(
+        batcher.insert({"n": 0}),
+        batcher.insert({"n": 1, "bad": True}),
+        batcher.insert({"n": 2}),
+        return_exceptions=True,
+    )
+
+    assert results[0] == 1 and results[2] == 2
+    assert isinstance(results[1], ValueError)
+    assert batcher.stats()["retried_batches"] == 1
+    assert batcher.stats()["failed_rows"] == 1
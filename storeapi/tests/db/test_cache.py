@@ -0,0 +1,155 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from storeapi.db.cache import MemoryCache, ReadThroughCache, decode, encode
+
+
+class SharedCache(MemoryCache):
+    # Stands in for Redis, which every worker shares
+    shared = True
+
+
+@pytest.mark.anyio
+async def test_memory_cache_evicts_and_tracks_size():
+    cache = MemoryCache(max_entries=2)
+    await cache.set("a", b"1", ttl=60)
+    await cache.set("b", b"22", ttl=60)
+    await cache.get("a")
+    await cache.set("c", b"333", ttl=60)
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == b"1"
+    assert cache.stats() == {"entries": 2, "evictions": 1, "memory_bytes": 6}
+
+    await cache.set("d", b"4", ttl=-1)
+    assert await cache.get("d") is None
+
+
+@pytest.mark.anyio
+async def test_read_through_cache_loads_once():
+    cache = ReadThroughCache(MemoryCache(max_entries=10), ttl=60)
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        return {"id": 1}
+
+    for _ in range(3):
+        assert await cache.get_or_load("post:1", loader) == {"id": 1}
+
+    assert len(loads) == 1
+    assert cache.stats()["hit_ratio"] == pytest.approx(2 / 3)
+
+
+@pytest.mark.anyio
+async def test_versioned_values_skip_a_per_process_cache():
+    cache = ReadThroughCache(MemoryCache(max_entries=10), ttl=60)
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        return {"id": 1, "version": len(loads)}
+
+    assert await cache.get_or_load("post:1", loader, versioned=True) == {
+        "id": 1,
+        "version": 1,
+    }
+    assert await cache.get_or_load("post:1", loader, versioned=True) == {
+        "id": 1,
+        "version": 2,
+    }
+    assert cache.backend.stats()["entries"] == 0
+
+
+@pytest.mark.anyio
+async def test_single_worker_caches_versioned_values_locally():
+    cache = ReadThroughCache(MemoryCache(max_entries=10), ttl=60, single_worker=True)
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        return {"id": 1, "version": len(loads)}
+
+    await cache.get_or_load("post:1", loader, versioned=True)
+    assert (await cache.get_or_load("post:1", loader, versioned=True))["version"] == 1
+
+    await cache.invalidate("post:1")
+    assert (await cache.get_or_load("post:1", loader, versioned=True))["version"] == 2
+
+
+@pytest.mark.anyio
+async def test_fill_loaded_before_an_invalidation_is_not_served():
+    cache = ReadThroughCache(SharedCache(max_entries=10), ttl=60)
+    loaded = asyncio.Event()
+    written = asyncio.Event()
+
+    async def stale_loader():
+        loaded.set()
+        await written.wait()
+        return {"id": 1, "version": 1}
+
+    async def fresh_loader():
+        return {"id": 1, "version": 2}
+
+    reader = asyncio.create_task(
+        cache.get_or_load("post:1", stale_loader, versioned=True)
+    )
+    await loaded.wait()
+    await cache.invalidate("post:1")
+    written.set()
+    # The reader stores its row after the invalidation...
+    assert (await reader)["version"] == 1
+
+    # ...but later reads do not get it
+    post = await cache.get_or_load("post:1", fresh_loader, versioned=True)
+    assert post["version"] == 2
+    post = await cache.get_or_load("post:1", fresh_loader, versioned=True)
+    assert post["version"] == 2
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.anyio
+async def test_replica_reads_do_not_refill_a_fresh_invalidation():
+    sticky = False
+
+    async def bypass():
+        return sticky
+
+    cache = ReadThroughCache(
+        SharedCache(max_entries=10), ttl=60, bypass=bypass, replica_lag=0.05
+    )
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        return {"id": 1, "version": len(loads)}
+
+    await cache.invalidate("post:1")
+    # Possibly from a lagging replica, so returned but not cached
+    await cache.get_or_load("post:1", loader, versioned=True)
+    await cache.get_or_load("post:1", loader, versioned=True)
+    assert len(loads) == 2
+
+    # The writer itself reads the primary, which may refill the entry
+    sticky = True
+    await cache.get_or_load("post:1", loader, versioned=True)
+    sticky = False
+    assert (await cache.get_or_load("post:1", loader, versioned=True))["version"] == 3
+
+    await cache.invalidate("post:1")
+    await asyncio.sleep(0.06)
+    # Past the lag window replicas have the write, so their reads are cached again
+    await cache.get_or_load("post:1", loader, versioned=True)
+    await cache.get_or_load("post:1", loader, versioned=True)
+    assert len(loads) == 4
+
+
+@pytest.mark.anyio
+async def test_cached_values_round_trip_through_json():
+    value = {"id": 1, "updated_at": datetime(2024, 5, 1, 12, 30), "tags": ["a"]}
+    data = encode(value)
+
+    assert data.startswith(b"{")
+    assert decode(data) == value
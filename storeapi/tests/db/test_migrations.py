@@ -0,0 +1,33 @@
+import pytest
+
+from storeapi.db.database import comment_table, database, post_table
+from storeapi.db.migrations import MIGRATIONS, run_migrations
+
+
+@pytest.mark.anyio
+async def test_run_migrations_is_idempotent():
+    # reset_db has already migrated the test database
+    assert await run_migrations(database) == MIGRATIONS[-1].version
+
+
+@pytest.mark.anyio
+async def test_comment_lookup_uses_index():
+    query = comment_table.select().where(comment_table.c.post_id == 1)
+    sql = str(query.compile(compile_kwargs={"literal_binds": True}))
+
+    plan = await database.fetch_all(f"EXPLAIN QUERY PLAN {sql}")
+
+    assert any("ix_comments_post_id_id" in row["detail"] for row in plan)
+
+
+@pytest.mark.anyio
+async def test_user_posts_lookup_uses_index():
+    query = (
+        post_table.select().where(post_table.c.user_id == 1).order_by(post_table.c.id)
+    )
+    sql = str(query.compile(compile_kwargs={"literal_binds": True}))
+
+    plan = await database.fetch_all(f"EXPLAIN QUERY PLAN {sql}")
+
+    assert any("ix_posts_user_id_id" in row["detail"] for row in plan)
+    assert not any("TEMP B-TREE" in row["detail"] for row in plan)
@@ -0,0 +1,146 @@
+import asyncio
+
+import databases
+import pytest
+
+from storeapi.config import GlobalConfig
+from storeapi.db.database import pool_options
+from storeapi.db.pool import PoolMonitor
+from storeapi.overload import Overloaded
+
+
+@pytest.mark.anyio
+async def test_pool_monitor_counts_acquires(tmp_path):
+    database = databases.Database(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}")
+    await database.connect()
+    monitor = PoolMonitor()
+    monitor.install(database)
+
+    async def query():
+        async with database.connection() as connection:
+            assert monitor.stats()["in_use"] >= 1
+            await connection.fetch_val("SELECT 1")
+
+    await asyncio.gather(*(query() for _ in range(3)))
+    await database.disconnect()
+
+    stats = monitor.stats()
+    assert stats["acquires"] == 3
+    assert stats["in_use"] == 0
+    assert stats["acquire_wait_max_ms"] >= stats["acquire_wait_avg_ms"] > 0
+
+
+@pytest.mark.anyio
+async def test_pool_options_only_apply_to_postgres():
+    config = GlobalConfig(DATABASE_URL="sqlite+aiosqlite:///./test.db")
+    assert pool_options(config) == {}
+
+    config = GlobalConfig(
+        DATABASE_URL="postgresql://localhost/blog",
+        DB_POOL_MIN_SIZE=2,
+        DB_POOL_MAX_SIZE=8,
+    )
+    assert pool_options(config)["min_size"] == 2
+    assert pool_options(config)["max_size"] == 8
+
+
+class SlottedPool:
+    """
+    Stands in for `asyncpg.Pool`, whose `__slots__` make its methods read-only.
+    """
+
+    __slots__ = ("free",)
+
+    def __init__(self):
+        self.free = asyncio.Event()
+        self.free.set()
+
+    async def acquire(self):
+        await self.free.wait()
+        return object()
+
+    async def release(self, connection):
+        pass
+
+
+def postgres_database(pool) -> databases.Database:
+    """
+    A Postgres `databases.Database` whose asyncpg pool is `pool`, without a server.
+    """
+    pytest.importorskip("asyncpg")
+    database = databases.Database("postgresql://localhost/blog")
+    database._backend._pool = pool
+    return database
+
+
+@pytest.mark.anyio
+async def test_pool_monitor_installs_on_asyncpg_pool():
+    asyncpg = pytest.importorskip("asyncpg")
+    # min_size=0 opens no connections, so no server is needed
+    pool = await asyncpg.create_pool("postgresql://localhost:1/blog", min_size=0)
+    database = postgres_database(pool)
+    monitor = PoolMonitor()
+    monitor.install(database)
+
+    assert monitor.stats()["size"] == 0
+    assert monitor.stats()["max_size"] == pool.get_max_size()
+    await pool.close()
+
+
+@pytest.mark.anyio
+async def test_pool_monitor_counts_acquires_on_slotted_pool():
+    database = postgres_database(SlottedPool())
+    monitor = PoolMonitor()
+    monitor.install(database)
+
+    async with database.connection():
+        assert monitor.stats()["in_use"] == 1
+
+    stats = monitor.stats()
+    assert stats["acquires"] == 1
+    assert stats["in_use"] == 0
+
+
+@pytest.mark.anyio
+async def test_pool_monitor_sheds_beyond_max_waiters():
+    pool = SlottedPool()
+    pool.free.clear()
+    database = postgres_database(pool)
+    monitor = PoolMonitor(max_waiters=1)
+    monitor.install(database)
+
+    async def query():
+        async with database.connection():
+            pass
+
+    waiter = asyncio.create_task(query())
+    while monitor.stats()["waiting"] < 1:
+        await asyncio.sleep(0)
+    with pytest.raises(Overloaded):
+        await query()
+
+    pool.free.set()
+    await waiter
+    stats = monitor.stats()
+    assert stats["rejected"] == 1
+    assert stats["waiting"] == 0
+    assert stats["in_use"] == 0
+    assert stats["acquires"] == 1
+
+
+@pytest.mark.anyio
+async def test_pool_monitor_times_out_acquire():
+    pool = SlottedPool()
+    pool.free.clear()
+    database = postgres_database(pool)
+    monitor = PoolMonitor(acquire_timeout=0.01)
+    monitor.install(database)
+
+    with pytest.raises(asyncio.TimeoutError):
+        async with database.connection():
+            pass
+
+    stats = monitor.stats()
+    assert stats["acquire_timeouts"] == 1
+    assert stats["waiting"] == 0
+    assert stats["in_use"] == 0
@@ -0,0 +1,138 @@
+import databases
+import pytest
+import sqlalchemy
+
+from storeapi.db.cache import MemoryCache, ReadThroughCache
+from storeapi.db.database import user_table
+from storeapi.db.migrations import run_migrations
+from storeapi.db.replicas import ReplicaRoutingMiddleware, ReplicaSet
+
+USERS = sqlalchemy.select(user_table.c.username)
+
+
+async def open_database(path, username: str) -> databases.Database:
+    database = databases.Database(f"sqlite+aiosqlite:///{path}")
+    await database.connect()
+    await run_migrations(database)
+    await database.execute(
+        user_table.insert().values(
+            username=username, email=f"{username}@example.net", hashed_password="-"
+        )
+    )
+    return database
+
+
+@pytest.fixture()
+async def primary_and_replica(tmp_path):
+    # Separate SQLite files, told apart by the one user each holds
+    primary = await open_database(tmp_path / "primary.db", "on_primary")
+    replica = await open_database(tmp_path / "replica.db", "on_replica")
+    yield primary, replica
+    await primary.disconnect()
+    await replica.disconnect()
+
+
+@pytest.mark.anyio
+async def test_reads_go_to_replica_until_the_session_writes(primary_and_replica):
+    primary, replica = primary_and_replica
+    replicas = ReplicaSet(primary, [replica], sticky_seconds=60)
+
+    with replicas.routing("auth:alice"):
+        assert await replicas.fetch_val(USERS) == "on_replica"
+        await primary.execute(user_table.update().values(email="new@example.net"))
+        assert await replicas.fetch_val(USERS) == "on_primary"
+
+    # Other clients do not need to see alice's write right away
+    with replicas.routing("auth:bob"):
+        assert await replicas.fetch_val(USERS) == "on_replica"
+
+    replicas.sticky_seconds = 0
+    with replicas.routing("auth:alice"):
+        assert await replicas.fetch_val(USERS) == "on_replica"
+    assert replicas.stats()["sticky_reads"] == 1
+
+
+@pytest.mark.anyio
+async def test_failing_replica_is_ejected(primary_and_replica):
+    primary, replica = primary_and_replica
+    replicas = ReplicaSet(primary, [replica], max_failures=2, eject_seconds=60)
+    await replica.execute("DROP TABLE users")
+
+    # Each failed read is answered by the primary
+    for _ in range(3):
+        assert await replicas.fetch_val(USERS) == "on_primary"
+
+    stats = replicas.stats()
+    assert stats["replicas"][0]["healthy"] is False
+    assert stats["replicas"][0]["ejections"] == 1
+    # The third read skipped the ejected replica
+    assert stats["primary_reads"] == 3
+
+    replicas.replicas[0].ejected_until = 0
+    assert await replicas.fetch_val(USERS) == "on_primary"
+    # Back on probation, one failure ejects it again
+    assert replicas.stats()["replicas"][0]["ejections"] == 2
+
+
+@pytest.mark.anyio
+async def test_middleware_keys_sessions_by_token_then_address(primary_and_replica):
+    primary, replica = primary_and_replica
+    replicas = ReplicaSet(primary, [replica], sticky_seconds=60)
+
+    async def write(scope, receive, send):
+        await primary.execute(user_table.update().values(email="new@example.net"))
+
+    app = ReplicaRoutingMiddleware(write, replicas)
+    await app(
+        {"type": "http", "headers": [(b"authorization", b"Bearer t")], "client": None},
+        None,
+        None,
+    )
+    await app({"type": "http", "headers": [], "client": ("10.0.0.1", 1234)}, None, None)
+
+    assert set(replicas._writes) == {"auth:Bearer t", "ip:10.0.0.1"}
+
+
+@pytest.mark.anyio
+async def test_shared_writes_keep_sessions_sticky_across_workers(primary_and_replica):
+    primary, replica = primary_and_replica
+    shared = MemoryCache(10)
+    workers = [ReplicaSet(primary, [replica], sticky_seconds=60) for _ in range(2)]
+    for worker in workers:
+        worker.share_writes(shared)
+
+    async def write(scope, receive, send):
+        await primary.execute(user_table.update().values(email="new@example.net"))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "headers": [(b"authorization", b"Bearer t")]}
+    await ReplicaRoutingMiddleware(write, workers[0])(scope, None, send)
+
+    # The next request lands on the other worker, which never saw the write
+    with workers[1].routing("auth:Bearer t"):
+        assert await workers[1].fetch_val(USERS) == "on_primary"
+    with workers[1].routing("auth:Bearer other"):
+        assert await workers[1].fetch_val(USERS) == "on_replica"
+
+
+@pytest.mark.anyio
+async def test_sticky_sessions_refresh_the_read_cache(primary_and_replica):
+    primary, replica = primary_and_replica
+    replicas = ReplicaSet(primary, [replica], sticky_seconds=60)
+    cache = ReadThroughCache(MemoryCache(10), ttl=60, bypass=replicas.sticky)
+
+    def load():
+        return replicas.fetch_val(USERS)
+
+    with replicas.routing("auth:alice"):
+        assert await cache.get_or_load("user", load) == "on_replica"
+        await primary.execute(user_table.update().values(email="new@example.net"))
+        # Skips the entry filled from the replica, and replaces it
+        assert await cache.get_or_load("user", load) == "on_primary"
+
+    with replicas.routing("auth:bob"):
+        assert await cache.get_or_load("user", load) == "on_primary"
+    assert cache.stats()["bypassed"] == 1
@@ -0,0 +1,70 @@
+import pytest
+from fastapi.testclient import TestClient
+from httpx import AsyncClient
+
+from storeapi.controller.feed import sse_events
+from storeapi.events import POSTS_TOPIC, Broker, MemoryEventBackend, broker, post_topic
+from storeapi.main import app
+from storeapi.tests.routers.test_post import create_post
+
+
+@pytest.mark.anyio
+async def test_writes_publish_events(async_client: AsyncClient, logged_in_token: str):
+    posts = broker.subscribe({POSTS_TOPIC})
+    post = await create_post(
+        {"title": "Live", "content": "Content"}, async_client, logged_in_token
+    )
+    comments = broker.subscribe({post_topic(post["id"])})
+    response = await async_client.post(
+        f"/posts/{post['id']}/comments/",
+        json={"post_id": post["id"], "content": "First"},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.status_code == 201
+
+    created = await posts.get()
+    assert (created.type, created.data["id"]) == ("post.created", post["id"])
+    comment = await comments.get()
+    assert (comment.type, comment.data["content"]) == ("comment.created", "First")
+    # Comments are not post-level events
+    assert posts._queue.empty()
+    broker.unsubscribe(posts)
+    broker.unsubscribe(comments)
+
+
+@pytest.mark.anyio
+async def test_sse_stream_formats_events_and_ends_on_overflow(monkeypatch):
+    local = Broker(MemoryEventBackend(), buffer_size=1)
+    monkeypatch.setattr("storeapi.controller.feed.broker", local)
+    subscription = local.subscribe({POSTS_TOPIC})
+    stream = sse_events(subscription)
+
+    await local.publish((POSTS_TOPIC,), "post.created", {"id": 1})
+    assert (
+        await anext(stream)
+        == b'event: post.created\ndata: {"type":"post.created","data":{"id":1}}\n\n'
+    )
+
+    await local.publish((POSTS_TOPIC,), "post.created", {"id": 2})
+    await local.publish((POSTS_TOPIC,), "post.created", {"id": 3})
+    assert await anext(stream) == b"event: overflow\ndata: {}\n\n"
+    with pytest.raises(StopAsyncIteration):
+        await anext(stream)
+    assert local.stats()["subscriptions"] == 0
+
+
+@pytest.mark.anyio
+async def test_websocket_receives_post_events():
+    client = TestClient(app)
+    with client.websocket_connect("/feed/ws?post_id=5") as websocket:
+        assert websocket.receive_json() == {
+            "type": "subscribed",
+            "data": {"topics": ["post:5"]},
+        }
+        websocket.portal.call(
+            broker.publish, (post_topic(5),), "comment.deleted", {"id": 9}
+        )
+        assert websocket.receive_json() == {
+            "type": "comment.deleted",
+            "data": {"id": 9},
+        }
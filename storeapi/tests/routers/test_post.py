@@ -1,29 +1,42 @@
+import asyncio
+import json
+
 import pytest
 from httpx import AsyncClient
 
+from storeapi.config import config
+from storeapi.controller import controller
+from storeapi.db.batching import InsertBatcher
+from storeapi.db.cache import read_cache
+from storeapi.db.search import MAX_SEARCH_TERMS
+
 
-def create_post(body: dict, async_client: AsyncClient) -> dict:
+async def create_post(body: dict, async_client: AsyncClient, token: str) -> dict:
     """
     Helper function to create a post using the async client.
     """
-    response = async_client.post("/posts/", json=body)
-    assert response.status_code == 200, f"Failed to create post: {response.text}"
+    response = await async_client.post(
+        "/posts/", json=body, headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 201, f"Failed to create post: {response.text}"
     return response.json()
 
 
 @pytest.fixture()
-async def created_post(async_client: AsyncClient):
+async def created_post(async_client: AsyncClient, logged_in_token: str):
     """
     Fixture to create a post before each test.
     This ensures that tests have a post to work with.
     """
     return await create_post(
-        {"title": "Test post", "content": "Test post Content"}, async_client
+        {"title": "Test post", "content": "Test post Content"},
+        async_client,
+        logged_in_token,
     )
 
 
 @pytest.mark.anyio
-async def test_create_post(async_client: AsyncClient):
+async def test_create_post(async_client: AsyncClient, logged_in_token: str):
     """
     Fixture to create a post for testing.
     This can be used in tests that require a post to be present.
@@ -35,6 +48,7 @@ async def test_create_post(async_client: AsyncClient):
             "content": "Test post Content",
             "name": "Test User",
         },
+        headers={"Authorization": f"Bearer {logged_in_token}"},
     )
 
     assert post.status_code == 201, f"Failed to create post: {post.text}"
@@ -43,3 +57,502 @@ async def test_create_post(async_client: AsyncClient):
         "title": "Test post",
         "content": "Test post Content",
     }.items() <= post.json().items(), "Post creation response mismatch"
+
+
+@pytest.mark.anyio
+async def test_list_posts_paginates(async_client: AsyncClient, logged_in_token: str):
+    for i in range(5):
+        await create_post(
+            {"title": f"Post {i}", "content": "Content"}, async_client, logged_in_token
+        )
+
+    first = await async_client.get("/posts/", params={"limit": 2})
+    assert first.status_code == 200
+    assert [post["title"] for post in first.json()["items"]] == ["Post 0", "Post 1"]
+    assert first.json()["next_cursor"]
+
+    seen = first.json()["items"]
+    cursor = first.json()["next_cursor"]
+    while cursor:
+        page = await async_client.get("/posts/", params={"limit": 2, "after": cursor})
+        seen += page.json()["items"]
+        cursor = page.json()["next_cursor"]
+
+    assert [post["title"] for post in seen] == [f"Post {i}" for i in range(5)]
+
+
+@pytest.mark.anyio
+async def test_list_posts_rejects_invalid_cursor(async_client: AsyncClient):
+    response = await async_client.get("/posts/", params={"after": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_list_posts_stream(async_client: AsyncClient, logged_in_token: str):
+    for i in range(3):
+        await create_post(
+            {"title": f"Post {i}", "content": "Content"}, async_client, logged_in_token
+        )
+
+    response = await async_client.get("/posts/", params={"stream": True})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["title"] for row in rows] == ["Post 0", "Post 1", "Post 2"]
+
+
+async def create_comment(
+    post_id: int, content: str, async_client: AsyncClient, token: str
+) -> dict:
+    """
+    Helper function to add a comment to a post using the async client.
+    """
+    response = await async_client.post(
+        f"/posts/{post_id}/comments/",
+        json={"post_id": post_id, "content": content},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 201, f"Failed to add comment: {response.text}"
+    return response.json()
+
+
+@pytest.mark.anyio
+async def test_delete_comment(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    comment = await create_comment(
+        created_post["id"], "Test comment", async_client, logged_in_token
+    )
+
+    response = await async_client.delete(
+        f"/posts/{created_post['id']}/comments/{comment['id']}"
+    )
+    assert response.status_code == 200
+
+    response = await async_client.delete(
+        f"/posts/{created_post['id']}/comments/{comment['id']}"
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Comment not found"
+
+
+@pytest.mark.anyio
+async def test_batched_comments_get_their_own_ids(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str, monkeypatch
+):
+    batcher = InsertBatcher(controller.write_comments, window=0.01, max_rows=100)
+    monkeypatch.setattr(controller, "comment_batcher", batcher)
+
+    comments = await asyncio.gather(
+        *(
+            create_comment(
+                created_post["id"], f"Comment {i}", async_client, logged_in_token
+            )
+            for i in range(5)
+        )
+    )
+
+    assert batcher.stats()["largest_batch"] > 1
+    stored = (await async_client.get(f"/posts/{created_post['id']}")).json()
+    assert {c["id"]: c["content"] for c in comments} == {
+        c["id"]: c["content"] for c in stored["comments"]
+    }
+    items = (await async_client.get("/posts/")).json()["items"]
+    assert items[0]["comment_count"] == 5
+
+
+@pytest.mark.anyio
+async def test_delete_comment_missing_post(async_client: AsyncClient):
+    response = await async_client.delete("/posts/999/comments/1")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Post not found"
+
+
+@pytest.mark.anyio
+async def test_get_post_without_comments(async_client: AsyncClient, created_post: dict):
+    response = await async_client.get(f"/posts/{created_post['id']}")
+    assert response.status_code == 200
+    assert response.json()["post"]["title"] == "Test post"
+    assert response.json()["comments"] == []
+
+
+@pytest.mark.anyio
+async def test_get_post_with_comments(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    for i in range(3):
+        await create_comment(
+            created_post["id"], f"Comment {i}", async_client, logged_in_token
+        )
+
+    response = await async_client.get(f"/posts/{created_post['id']}")
+    assert [c["content"] for c in response.json()["comments"]] == [
+        "Comment 0",
+        "Comment 1",
+        "Comment 2",
+    ]
+    assert response.json()["next_cursor"] is None
+
+    page = await async_client.get(f"/posts/{created_post['id']}", params={"limit": 2})
+    assert len(page.json()["comments"]) == 2
+    rest = await async_client.get(
+        f"/posts/{created_post['id']}",
+        params={"limit": 2, "after": page.json()["next_cursor"]},
+    )
+    assert [c["content"] for c in rest.json()["comments"]] == ["Comment 2"]
+    assert rest.json()["post"]["id"] == created_post["id"]
+
+
+@pytest.mark.anyio
+async def test_get_missing_post(async_client: AsyncClient):
+    response = await async_client.get("/posts/999")
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_create_posts_bulk(async_client: AsyncClient, logged_in_token: str):
+    response = await async_client.post(
+        "/posts/bulk",
+        json=[{"title": f"Post {i}", "content": "Content"} for i in range(3)],
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.status_code == 201
+    assert response.json() == {"ids": [1, 2, 3]}
+
+
+@pytest.mark.anyio
+async def test_bulk_ids_match_their_rows_during_batched_inserts(
+    async_client: AsyncClient, logged_in_token: str, monkeypatch
+):
+    batcher = InsertBatcher(controller.write_posts, window=0.01, max_rows=100)
+    monkeypatch.setattr(controller, "post_batcher", batcher)
+    headers = {"Authorization": f"Bearer {logged_in_token}"}
+
+    async def bulk() -> dict:
+        response = await async_client.post(
+            "/posts/bulk",
+            json=[{"title": f"Bulk {i}", "content": "Content"} for i in range(5)],
+            headers=headers,
+        )
+        return dict(zip(response.json()["ids"], (f"Bulk {i}" for i in range(5))))
+
+    singles = [
+        create_post(
+            {"title": f"Single {i}", "content": "Content"},
+            async_client,
+            logged_in_token,
+        )
+        for i in range(5)
+    ]
+    bulk_ids, *created = await asyncio.gather(bulk(), *singles)
+
+    assert batcher.stats()["largest_batch"] > 1
+    expected = {**bulk_ids, **{post["id"]: post["title"] for post in created}}
+    assert len(expected) == 10
+    for post_id, title in expected.items():
+        response = await async_client.get(f"/posts/{post_id}")
+        assert response.json()["post"]["title"] == title
+
+
+@pytest.mark.anyio
+async def test_create_posts_bulk_rejects_oversized_batch(
+    async_client: AsyncClient, logged_in_token: str, monkeypatch
+):
+    monkeypatch.setattr(config, "MAX_BULK_SIZE", 2)
+    response = await async_client.post(
+        "/posts/bulk",
+        json=[{"title": f"Post {i}", "content": "Content"} for i in range(3)],
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.status_code == 413
+
+
+@pytest.mark.anyio
+async def test_add_comments_bulk(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    post_id = created_post["id"]
+    response = await async_client.post(
+        f"/posts/{post_id}/comments/bulk",
+        json=[{"post_id": post_id, "content": f"Comment {i}"} for i in range(2)],
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.status_code == 201
+    assert response.json() == {"ids": [1, 2]}
+
+    response = await async_client.get(f"/posts/{post_id}")
+    assert [c["content"] for c in response.json()["comments"]] == [
+        "Comment 0",
+        "Comment 1",
+    ]
+
+
+@pytest.mark.anyio
+async def test_list_posts_same_body_without_fast_serialization(
+    async_client: AsyncClient, created_post: dict, monkeypatch
+):
+    fast = await async_client.get("/posts/")
+    monkeypatch.setattr(config, "FAST_SERIALIZATION", False)
+    validated = await async_client.get("/posts/")
+
+    assert fast.json() == validated.json()
+    assert fast.json()["items"][0]["id"] == created_post["id"]
+
+
+@pytest.mark.anyio
+async def test_get_post_conditional(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    url = f"/posts/{created_post['id']}"
+    first = await async_client.get(url)
+    etag = first.headers["etag"]
+    assert first.headers["last-modified"]
+
+    cached = await async_client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.content == b""
+
+    await create_comment(
+        created_post["id"], "New comment", async_client, logged_in_token
+    )
+
+    changed = await async_client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["comments"][0]["content"] == "New comment"
+
+
+@pytest.mark.anyio
+async def test_list_posts_conditional(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    etag = (await async_client.get("/posts/")).headers["etag"]
+
+    cached = await async_client.get("/posts/", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
+    await async_client.put(
+        f"/posts/{created_post['id']}",
+        json={"title": "Updated", "content": "Updated content"},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    changed = await async_client.get("/posts/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["items"][0]["title"] == "Updated"
+
+
+@pytest.mark.anyio
+async def test_comment_changes_only_the_listing_page_showing_its_post(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    other = await create_post(
+        {"title": "Other", "content": "Content"}, async_client, logged_in_token
+    )
+    first = await async_client.get("/posts/", params={"limit": 1})
+    second = await async_client.get(
+        "/posts/", params={"limit": 1, "after": first.json()["next_cursor"]}
+    )
+
+    await create_comment(other["id"], "New comment", async_client, logged_in_token)
+
+    unchanged = await async_client.get(
+        "/posts/",
+        params={"limit": 1},
+        headers={"If-None-Match": first.headers["etag"]},
+    )
+    assert unchanged.status_code == 304
+    changed = await async_client.get(
+        "/posts/",
+        params={"limit": 1, "after": first.json()["next_cursor"]},
+        headers={"If-None-Match": second.headers["etag"]},
+    )
+    assert changed.status_code == 200
+    assert changed.json()["items"][0]["comment_count"] == 1
+
+
+@pytest.mark.anyio
+async def test_comment_writes_invalidate_cached_reads(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    url = f"/posts/{created_post['id']}/comments/"
+    await create_comment(created_post["id"], "First", async_client, logged_in_token)
+    assert len((await async_client.get(url)).json()) == 1
+
+    misses = read_cache.misses
+    assert len((await async_client.get(url)).json()) == 1
+    assert read_cache.misses == misses
+
+    await create_comment(created_post["id"], "Second", async_client, logged_in_token)
+    assert len((await async_client.get(url)).json()) == 2
+
+
+@pytest.mark.anyio
+async def test_search_ranks_title_matches_first(
+    async_client: AsyncClient, logged_in_token: str
+):
+    body_match = await create_post(
+        {"title": "Weekend plans", "content": "Baking sourdough bread"},
+        async_client,
+        logged_in_token,
+    )
+    title_match = await create_post(
+        {"title": "Sourdough starter", "content": "Feeding schedule"},
+        async_client,
+        logged_in_token,
+    )
+    await create_post(
+        {"title": "Unrelated", "content": "Nothing here"}, async_client, logged_in_token
+    )
+
+    response = await async_client.get("/posts/search", params={"q": "sourdough"})
+
+    assert response.status_code == 200
+    assert [p["id"] for p in response.json()["items"]] == [
+        title_match["id"],
+        body_match["id"],
+    ]
+    assert response.json()["next_cursor"] is None
+
+
+@pytest.mark.anyio
+async def test_search_finds_comments_and_follows_writes(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    post_id = created_post["id"]
+
+    async def search(q: str) -> list[int]:
+        response = await async_client.get("/posts/search", params={"q": q})
+        return [p["id"] for p in response.json()["items"]]
+
+    comment = await create_comment(
+        post_id, "Try rye flour", async_client, logged_in_token
+    )
+    assert await search("rye") == [post_id]
+
+    await async_client.delete(f"/posts/{post_id}/comments/{comment['id']}")
+    assert await search("rye") == []
+
+    await async_client.put(
+        f"/posts/{post_id}",
+        json={"title": "Pancakes", "content": "Buttermilk"},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert await search("pancakes") == [post_id]
+    assert await search("test") == []
+
+    await async_client.delete(
+        f"/posts/{post_id}", headers={"Authorization": f"Bearer {logged_in_token}"}
+    )
+    assert await search("pancakes") == []
+
+
+@pytest.mark.anyio
+async def test_search_matches_words_across_post_and_comments(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    post_id = created_post["id"]
+    for content in ("Try rye flour", "Add caraway seeds"):
+        await create_comment(post_id, content, async_client, logged_in_token)
+
+    for q in ("rye caraway", "test rye", "rye rye"):
+        response = await async_client.get("/posts/search", params={"q": q})
+        assert [p["id"] for p in response.json()["items"]] == [post_id]
+
+    response = await async_client.get("/posts/search", params={"q": "rye spelt"})
+    assert response.json()["items"] == []
+
+
+@pytest.mark.anyio
+async def test_search_rejects_too_many_words(async_client: AsyncClient):
+    q = " ".join(f"word{i}" for i in range(MAX_SEARCH_TERMS + 1))
+    response = await async_client.get("/posts/search", params={"q": q})
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_search_paginates(async_client: AsyncClient, logged_in_token: str):
+    response = await async_client.post(
+        "/posts/bulk",
+        json=[{"title": f"Recipe {i}", "content": "Soup"} for i in range(5)],
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    ids = response.json()["ids"]
+
+    seen, cursor = [], None
+    while True:
+        params = {"q": "soup", "limit": 2, **({"after": cursor} if cursor else {})}
+        page = (await async_client.get("/posts/search", params=params)).json()
+        seen.extend(p["id"] for p in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert sorted(seen) == ids
+    assert len(seen) == len(ids)
+
+
+@pytest.mark.anyio
+async def test_search_ignores_query_syntax(async_client: AsyncClient):
+    for q in ('"unbalanced', "NEAR(a b", "*", "a OR AND"):
+        response = await async_client.get("/posts/search", params={"q": q})
+        assert response.status_code == 200
+        assert response.json()["items"] == []
+
+    response = await async_client.get("/posts/search", params={"q": "x", "after": "!"})
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_list_posts_includes_comment_count(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    post_id = created_post["id"]
+    comment = await create_comment(post_id, "One", async_client, logged_in_token)
+    await async_client.post(
+        f"/posts/{post_id}/comments/bulk",
+        json=[{"post_id": post_id, "content": "More"}] * 2,
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    items = (await async_client.get("/posts/")).json()["items"]
+    assert items[0]["comment_count"] == 3
+
+    await async_client.delete(f"/posts/{post_id}/comments/{comment['id']}")
+    items = (await async_client.get("/posts/")).json()["items"]
+    assert items[0]["comment_count"] == 2
+
+
+@pytest.mark.anyio
+async def test_list_user_posts(async_client: AsyncClient, logged_in_token: str):
+    headers = {"Authorization": f"Bearer {logged_in_token}"}
+    ids = (
+        await async_client.post(
+            "/posts/bulk",
+            json=[{"title": f"Post {i}", "content": "Content"} for i in range(3)],
+            headers=headers,
+        )
+    ).json()["ids"]
+    user_id = (await async_client.get(f"/posts/{ids[0]}")).json()["post"]["user_id"]
+
+    page = (
+        await async_client.get(f"/users/{user_id}/posts", params={"limit": 2})
+    ).json()
+    assert [p["id"] for p in page["items"]] == ids[:2]
+    assert page["items"][0]["comment_count"] == 0
+
+    rest = (
+        await async_client.get(
+            f"/users/{user_id}/posts", params={"after": page["next_cursor"]}
+        )
+    ).json()
+    assert [p["id"] for p in rest["items"]] == ids[2:]
+    assert rest["next_cursor"] is None
+
+
+@pytest.mark.anyio
+async def test_list_user_posts_missing_user(async_client: AsyncClient):
+    response = await async_client.get("/users/999/posts")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "User not found"
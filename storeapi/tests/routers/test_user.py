@@ -0,0 +1,103 @@
+import time
+
+import pytest
+from httpx import AsyncClient
+from jose import jwt
+
+from storeapi.config import config
+from storeapi.db.replicas import replicas
+from storeapi.security.security import ALGORITHM, SECRET_KEY, hashing_pool
+
+
+async def login(async_client: AsyncClient, user: dict) -> dict:
+    response = await async_client.get(
+        "/users/login",
+        params={"username": user["username"], "password": user["password"]},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def refresh(async_client: AsyncClient, refresh_token: str):
+    return await async_client.post(
+        "/users/token/refresh", json={"refresh_token": refresh_token}
+    )
+
+
+@pytest.mark.anyio
+async def test_access_token_lifetime_is_configurable(
+    async_client: AsyncClient, registered_user: dict, monkeypatch
+):
+    monkeypatch.setattr(config, "ACCESS_TOKEN_EXPIRE_MINUTES", 60.0)
+
+    before = time.time()
+    tokens = await login(async_client, registered_user)
+    claims = jwt.decode(tokens["access_token"], SECRET_KEY, algorithms=[ALGORITHM])
+
+    assert tokens["expires_in"] == 3600
+    assert before + 3600 - 1 <= claims["exp"] <= time.time() + 3600
+
+
+@pytest.mark.anyio
+async def test_refresh_rotates_without_bcrypt(
+    async_client: AsyncClient, registered_user: dict
+):
+    tokens = await login(async_client, registered_user)
+    hashes = hashing_pool.stats()["completed"]
+
+    response = await refresh(async_client, tokens["refresh_token"])
+
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    assert hashing_pool.stats()["completed"] == hashes
+
+    response = await async_client.post(
+        "/posts/",
+        json={"title": "Refreshed", "content": "Content"},
+        headers={"Authorization": f"Bearer {rotated['access_token']}"},
+    )
+    assert response.status_code == 201
+
+
+@pytest.mark.anyio
+async def test_reused_refresh_token_revokes_its_family(
+    async_client: AsyncClient, registered_user: dict
+):
+    tokens = await login(async_client, registered_user)
+    rotated = (await refresh(async_client, tokens["refresh_token"])).json()
+
+    assert (await refresh(async_client, tokens["refresh_token"])).status_code == 401
+    # The replay also ends the session the newer token belonged to
+    assert (await refresh(async_client, rotated["refresh_token"])).status_code == 401
+
+
+@pytest.mark.anyio
+async def test_revoked_and_expired_refresh_tokens_are_rejected(
+    async_client: AsyncClient, registered_user: dict, monkeypatch
+):
+    tokens = await login(async_client, registered_user)
+    response = await async_client.post(
+        "/users/token/revoke", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 204
+    assert (await refresh(async_client, tokens["refresh_token"])).status_code == 401
+
+    monkeypatch.setattr(config, "REFRESH_TOKEN_EXPIRE_DAYS", 0)
+    tokens = await login(async_client, registered_user)
+    assert (await refresh(async_client, tokens["refresh_token"])).status_code == 401
+    assert (await refresh(async_client, "not-a-token")).status_code == 401
+
+
+@pytest.mark.anyio
+async def test_register_checks_for_duplicates_on_the_primary(
+    async_client: AsyncClient, registered_user: dict, monkeypatch
+):
+    async def lagging_replica(query, values=None):
+        return None
+
+    monkeypatch.setattr(replicas, "fetch_one", lagging_replica)
+
+    response = await async_client.post("/users/register", json=registered_user)
+
+    assert response.status_code == 400
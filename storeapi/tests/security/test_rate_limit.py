@@ -0,0 +1,109 @@
+import pytest
+from fastapi import HTTPException
+from httpx import AsyncClient
+
+from storeapi.config import config
+from storeapi.security import rate_limit
+from storeapi.security.rate_limit import (
+    MemoryRateLimitBackend,
+    RateLimiter,
+    auth_limiter,
+)
+from storeapi.security.security import hashing_pool
+
+
+@pytest.mark.anyio
+async def test_bucket_allows_burst_then_refills(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    backend = MemoryRateLimitBackend(max_keys=10)
+
+    assert [await backend.take("ip:1", rate=2.0, burst=3) for _ in range(3)] == [0] * 3
+    assert await backend.take("ip:1", rate=2.0, burst=3) == pytest.approx(0.5)
+    # Other keys have their own bucket
+    assert await backend.take("ip:2", rate=2.0, burst=3) == 0
+
+    now[0] += 0.5
+    assert await backend.take("ip:1", rate=2.0, burst=3) == 0
+
+
+@pytest.mark.anyio
+async def test_memory_backend_drops_least_recent_keys():
+    backend = MemoryRateLimitBackend(max_keys=2)
+    for key in ("a", "b", "c"):
+        await backend.take(key, rate=1.0, burst=1)
+
+    assert backend.stats() == {"keys": 2}
+    # "a" was dropped, so it starts again with a full bucket
+    assert await backend.take("a", rate=1.0, burst=1) == 0
+
+
+@pytest.mark.anyio
+async def test_check_stops_at_the_first_empty_bucket():
+    limiter = RateLimiter(MemoryRateLimitBackend(max_keys=10), rate=0.1, burst=1)
+    await limiter.check("ip:a", "user:x")
+
+    with pytest.raises(HTTPException):
+        await limiter.check("ip:a", "user:y")
+    # The rejected request never reached the bucket of user:y
+    await limiter.check("ip:b", "user:y")
+
+    assert limiter.stats()["allowed"] == 2
+    assert limiter.stats()["limited"] == 1
+
+
+@pytest.mark.anyio
+async def test_spoofed_forwarded_for_shares_the_proxy_reported_bucket(
+    async_client: AsyncClient, monkeypatch
+):
+    monkeypatch.setattr(config, "RATE_LIMIT_TRUSTED_PROXIES", 1)
+    monkeypatch.setattr(auth_limiter, "rate", 0.1)
+    monkeypatch.setattr(auth_limiter, "burst", 2)
+
+    async def login(i: int):
+        # A fresh username each time, so only the IP bucket is shared
+        return await async_client.get(
+            "/users/login",
+            params={"username": f"nobody{i}", "password": "wrong"},
+            headers={"X-Forwarded-For": f"10.0.0.{i}, 203.0.113.7"},
+        )
+
+    statuses = [(await login(i)).status_code for i in range(3)]
+
+    assert statuses == [401, 401, 429]
+
+
+@pytest.mark.anyio
+async def test_login_flood_gets_429(
+    async_client: AsyncClient, registered_user: dict, monkeypatch
+):
+    monkeypatch.setattr(auth_limiter, "rate", 0.1)
+    monkeypatch.setattr(auth_limiter, "burst", 2)
+    limited = auth_limiter.stats()["limited"]
+
+    params = {"username": registered_user["username"], "password": "wrong"}
+    statuses = [
+        (await async_client.get("/users/login", params=params)).status_code
+        for _ in range(2)
+    ]
+    response = await async_client.get("/users/login", params=params)
+
+    assert statuses == [401, 401]
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "10"
+    assert auth_limiter.stats()["limited"] == limited + 1
+
+
+@pytest.mark.anyio
+async def test_saturated_hashing_pool_sheds_with_503(
+    async_client: AsyncClient, monkeypatch
+):
+    monkeypatch.setattr(hashing_pool, "queue_limit", 0)
+
+    response = await async_client.post(
+        "/users/register",
+        json={"username": "shed", "email": "shed@example.net", "password": "1234"},
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,64 @@
+import pytest
+from httpx import AsyncClient
+
+from storeapi.config import config
+from storeapi.security import security
+from storeapi.security.user_cache import UserCache
+
+
+@pytest.mark.anyio
+async def test_user_cache_evicts_least_recently_used():
+    cache = UserCache(max_size=2, ttl=60)
+    cache.set("a", {"id": 1})
+    cache.set("b", {"id": 2})
+    cache.get("a")
+    cache.set("c", {"id": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"id": 1}
+    assert cache.stats() == {"size": 2, "hits": 2, "misses": 1, "evictions": 1}
+
+
+@pytest.mark.anyio
+async def test_user_cache_expires_entries():
+    cache = UserCache(max_size=2, ttl=-1)
+    cache.set("a", {"id": 1})
+
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+@pytest.mark.anyio
+async def test_get_current_user_uses_cache(
+    async_client: AsyncClient, logged_in_token: str, monkeypatch
+):
+    calls = []
+    get_user = security.get_user
+
+    async def counting_get_user(username):
+        calls.append(username)
+        return await get_user(username)
+
+    monkeypatch.setattr(security, "get_user", counting_get_user)
+    hits = security.user_cache.hits
+
+    for _ in range(3):
+        user = await security.get_current_user(logged_in_token)
+        assert user["username"] == "test_user"
+
+    assert calls == ["test_user"]
+    assert security.user_cache.hits - hits == 2
+
+
+@pytest.mark.anyio
+async def test_get_current_user_trusts_claims(
+    async_client: AsyncClient, logged_in_token: str, monkeypatch
+):
+    async def failing_get_user(username):
+        raise AssertionError("The database should not be queried")
+
+    monkeypatch.setattr(security, "get_user", failing_get_user)
+    monkeypatch.setattr(config, "TRUST_TOKEN_CLAIMS", True)
+
+    user = await security.get_current_user(logged_in_token)
+    assert user == {"id": 1, "username": "test_user", "email": "test@example.net"}
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+
+import pytest
+
+from storeapi.overload import Overloaded
+from storeapi.security.worker_pool import WorkerPool
+
+
+@pytest.mark.anyio
+async def test_worker_pool_caps_concurrency_and_reports_queue_depth():
+    pool = WorkerPool(max_workers=1)
+    release = threading.Event()
+
+    jobs = [asyncio.create_task(pool.run(release.wait, 5)) for _ in range(3)]
+    await asyncio.sleep(0.05)
+
+    assert pool.stats()["in_flight"] == 3
+    assert pool.queue_depth == 2
+
+    release.set()
+    assert await asyncio.gather(*jobs) == [True, True, True]
+    assert pool.stats()["completed"] == 3
+    assert pool.stats()["max_queue_depth"] == 2
+    pool.shutdown()
+
+
+@pytest.mark.anyio
+async def test_worker_pool_rejects_unknown_kind():
+    with pytest.raises(ValueError):
+        WorkerPool(max_workers=1, kind="fiber")
+
+
+@pytest.mark.anyio
+async def test_worker_pool_sheds_beyond_queue_limit():
+    pool = WorkerPool(max_workers=1, queue_limit=1)
+    release = threading.Event()
+
+    jobs = [asyncio.create_task(pool.run(release.wait, 5)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(Overloaded):
+        await pool.run(release.wait, 5)
+
+    release.set()
+    assert await asyncio.gather(*jobs) == [True, True]
+    assert pool.stats()["rejected"] == 1
+    pool.shutdown()
@@ -0,0 +1,51 @@
+import pytest
+
+from storeapi.events import (
+    POSTS_TOPIC,
+    Broker,
+    MemoryEventBackend,
+    SlowConsumer,
+    post_topic,
+)
+
+
+@pytest.mark.anyio
+async def test_broker_delivers_by_topic_once():
+    broker = Broker(MemoryEventBackend(), buffer_size=10)
+    everything = broker.subscribe({POSTS_TOPIC, post_topic(1)})
+    other_post = broker.subscribe({post_topic(2)})
+
+    await broker.publish((POSTS_TOPIC, post_topic(1)), "post.updated", {"id": 1})
+
+    event = await everything.get()
+    assert (event.type, event.data) == ("post.updated", {"id": 1})
+    assert everything._queue.empty()
+    assert other_post._queue.empty()
+    assert broker.stats()["delivered"] == 1
+
+
+@pytest.mark.anyio
+async def test_slow_consumer_is_dropped():
+    broker = Broker(MemoryEventBackend(), buffer_size=2)
+    slow = broker.subscribe({POSTS_TOPIC})
+
+    for i in range(3):
+        await broker.publish((POSTS_TOPIC,), "post.created", {"id": i})
+
+    with pytest.raises(SlowConsumer):
+        await slow.get()
+    assert slow.dropped
+    assert broker.stats()["dropped"] == 1
+    assert broker.stats()["subscriptions"] == 0
+
+
+@pytest.mark.anyio
+async def test_brokers_sharing_a_backend_see_each_others_events():
+    # Two workers' brokers on one bus
+    backend = MemoryEventBackend()
+    first, second = Broker(backend, 10), Broker(backend, 10)
+    subscription = second.subscribe({post_topic(7)})
+
+    await first.publish((post_topic(7),), "comment.created", {"id": 1})
+
+    assert (await subscription.get()).type == "comment.created"
@@ -0,0 +1,43 @@
+import logging
+
+import pytest
+
+from storeapi.logging_config import BoundedQueueHandler
+
+
+@pytest.mark.anyio
+async def test_bounded_queue_handler_drops_on_overflow():
+    handler = BoundedQueueHandler(maxsize=2, overflow="drop")
+    logger = logging.getLogger("storeapi.tests.overflow")
+    logger.addHandler(handler)
+    logger.propagate = False
+
+    for i in range(5):
+        logger.warning("message %s", i)
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+    assert handler.queue.get_nowait().getMessage() == "message 0"
+
+
+@pytest.mark.anyio
+async def test_bounded_queue_handler_merges_arguments_on_enqueue():
+    handler = BoundedQueueHandler(maxsize=10)
+    logger = logging.getLogger("storeapi.tests.prepare")
+    logger.addHandler(handler)
+    logger.propagate = False
+
+    row = {"title": "before"}
+    logger.warning("row %s", row)
+    row["title"] = "after"
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("failed")
+
+    record = handler.queue.get_nowait()
+    assert record.getMessage() == "row {'title': 'before'}"
+    assert record.args is None
+    record = handler.queue.get_nowait()
+    assert record.exc_info is None
+    assert "ValueError: boom" in record.getMessage()
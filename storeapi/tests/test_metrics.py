@@ -0,0 +1,69 @@
+import pytest
+from httpx import AsyncClient
+
+from storeapi.metrics import Histogram, metrics
+from storeapi.tests.routers.test_post import create_post
+
+
+@pytest.mark.anyio
+async def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency", "Latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(("/a",), value)
+
+    lines = histogram.render()
+
+    assert 'latency_bucket{route="/a",le="0.1"} 2' in lines
+    assert 'latency_bucket{route="/a",le="1.0"} 3' in lines
+    assert 'latency_bucket{route="/a",le="+Inf"} 4' in lines
+    assert 'latency_count{route="/a"} 4' in lines
+
+
+@pytest.mark.anyio
+async def test_requests_are_recorded_per_route_template(
+    async_client: AsyncClient, logged_in_token: str
+):
+    post = await create_post(
+        {"title": "Metrics post", "content": "Metrics content"},
+        async_client,
+        logged_in_token,
+    )
+    labels = ("GET", "/posts/{post_id}")
+    requests_before = metrics.requests.get(labels + ("200",))
+    queries_before = metrics.request_queries.count(labels)
+
+    response = await async_client.get(f"/posts/{post['id']}")
+    assert response.status_code == 200
+
+    assert metrics.requests.get(labels + ("200",)) == requests_before + 1
+    assert metrics.request_queries.count(labels) == queries_before + 1
+    assert metrics.queries.get(("fetch_all",)) > 0
+    assert metrics.in_flight == 0
+
+
+@pytest.mark.anyio
+async def test_unmatched_paths_share_one_label(async_client: AsyncClient):
+    before = metrics.requests.get(("GET", "unmatched", "404"))
+
+    await async_client.get("/no/such/path")
+    await async_client.get("/another/missing/path")
+
+    assert metrics.requests.get(("GET", "unmatched", "404")) == before + 2
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint_exposes_prometheus_text(async_client: AsyncClient):
+    await async_client.get("/health")
+
+    response = await async_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert "# TYPE storeapi_http_request_duration_seconds histogram" in body
+    assert (
+        'storeapi_http_requests_total{method="GET",route="/health",status="200"}'
+        in body
+    )
+    assert "storeapi_db_queries_total" in body
+    assert "storeapi_user_cache_hits" in body
@@ -0,0 +1,56 @@
+import pstats
+
+import pytest
+from asgi_correlation_id import CorrelationIdMiddleware
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from storeapi.profiling import ProfilingMiddleware
+
+
+def profiled_app(directory, sample_rate: float = 0.0) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow():
+        return {"total": sum(range(10000))}
+
+    app.add_middleware(
+        ProfilingMiddleware, directory=str(directory), sample_rate=sample_rate
+    )
+    app.add_middleware(CorrelationIdMiddleware)
+    return app
+
+
+@pytest.mark.anyio
+async def test_header_triggers_profile_named_by_correlation_id(tmp_path):
+    transport = ASGITransport(app=profiled_app(tmp_path))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/slow", headers={"X-Profile": "1"})
+
+    assert response.status_code == 200
+    path = tmp_path / f"{response.headers['X-Request-ID']}.prof"
+    assert path.exists()
+    # The dump is a regular pstats file covering the handler
+    stats = pstats.Stats(str(path))
+    assert any(func[2] == "slow" for func in stats.stats)
+
+
+@pytest.mark.anyio
+async def test_requests_are_not_profiled_without_header_or_sampling(tmp_path):
+    transport = ASGITransport(app=profiled_app(tmp_path))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.get("/slow")
+        await client.get("/slow", headers={"X-Profile": "0"})
+
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.anyio
+async def test_sample_rate_profiles_requests(tmp_path):
+    transport = ASGITransport(app=profiled_app(tmp_path, sample_rate=1.0))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        for _ in range(3):
+            await client.get("/slow")
+
+    assert len(list(tmp_path.glob("*.prof"))) == 3
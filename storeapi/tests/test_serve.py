@@ -0,0 +1,50 @@
+import pytest
+
+from storeapi import serve
+from storeapi.config import config
+
+
+@pytest.mark.anyio
+async def test_server_options_come_from_config(monkeypatch):
+    monkeypatch.setattr(config, "SERVER_WORKERS", 3)
+    monkeypatch.setattr(config, "SERVER_KEEP_ALIVE", 15)
+    monkeypatch.setattr(config, "SERVER_GRACEFUL_SHUTDOWN", 10.0)
+
+    options = serve.server_options()
+
+    assert options["workers"] == 3
+    assert options["timeout_keep_alive"] == 15
+    assert options["timeout_graceful_shutdown"] == 10.0
+    assert options["backlog"] == config.SERVER_BACKLOG
+
+
+@pytest.mark.anyio
+async def test_server_options_overrides_and_defaults(monkeypatch):
+    monkeypatch.setattr(config, "SERVER_WORKERS", None)
+    monkeypatch.setattr(serve.os, "cpu_count", lambda: 6)
+
+    assert serve.server_options()["workers"] == 6
+    assert serve.server_options(workers=2, port=9000)["port"] == 9000
+
+
+@pytest.mark.anyio
+async def test_auto_loop_and_parser_fall_back_when_not_installed(monkeypatch):
+    monkeypatch.setattr(serve.importlib.util, "find_spec", lambda name: None)
+
+    assert serve.resolve_loop("auto") == "asyncio"
+    assert serve.resolve_http("auto") == "h11"
+    assert serve.resolve_loop("uvloop") == "uvloop"
+
+
+@pytest.mark.anyio
+async def test_main_tells_workers_their_count(monkeypatch):
+    uvicorn = pytest.importorskip("uvicorn")
+    started = {}
+    monkeypatch.setattr(uvicorn, "run", lambda app, **options: started.update(options))
+    monkeypatch.delenv("TEST_SERVER_WORKERS", raising=False)
+    monkeypatch.setattr(serve.logging, "basicConfig", lambda **kwargs: None)
+
+    serve.main(["--workers", "3"])
+
+    assert started["workers"] == 3
+    assert serve.os.environ.pop("TEST_SERVER_WORKERS") == "3"